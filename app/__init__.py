@@ -2,23 +2,36 @@
 
 from __future__ import annotations
 
+from contextlib import contextmanager
+import hashlib
 import json
+import logging
 from pathlib import Path
 import secrets
 from io import BytesIO
+from threading import Thread
+import time
+from typing import Dict, Iterator, Optional
 import urllib.request
 
-try:  # Optional dependency
-    from PIL import Image  # type: ignore
-except Exception:  # pragma: no cover - Pillow may not be installed
-    Image = None
-
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 
 
 db = SQLAlchemy()
 
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def boot_phase(timings: Dict[str, float], name: str) -> Iterator[None]:
+    """Record how long the ``name`` startup phase took, in milliseconds."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = round((time.perf_counter() - started) * 1000, 2)
+
 
 def load_config() -> dict:
     """Load configuration from ``config.json`` file."""
@@ -27,51 +40,159 @@ def load_config() -> dict:
         return json.load(config_file)
 
 
-def setup_favicon(app: Flask, config: dict) -> None:
-    """Download and convert the logo image to ``favicon.ico`` if possible."""
-    logo_cfg = config.get("frontend", {}).get("logo", {})
-    if not (logo_cfg.get("enabled") and logo_cfg.get("image_url") and Image):
+def build_favicon(static_dir: Path, image_url: str, timeout: float = 10.0) -> None:
+    """Download the logo and convert it to ``favicon.ico``.
+
+    A ``favicon.json`` file next to the icon records the source URL and the
+    SHA-256 of the downloaded bytes, so an unchanged image is not converted
+    again.
+    """
+    try:
+        from PIL import Image  # type: ignore
+    except Exception:  # pragma: no cover - Pillow may not be installed
         return
+    ico_path = static_dir / "favicon.ico"
+    meta_path = static_dir / "favicon.json"
     try:
-        with urllib.request.urlopen(logo_cfg["image_url"]) as resp:
+        with urllib.request.urlopen(image_url, timeout=timeout) as resp:
             data = resp.read()
+        digest = hashlib.sha256(data).hexdigest()
+        meta = {"url": image_url, "sha256": digest}
+        if ico_path.exists() and meta_path.exists():
+            if json.loads(meta_path.read_text(encoding="utf-8")) == meta:
+                return
         img = Image.open(BytesIO(data))
         img = img.convert("RGBA")
-        ico_path = Path(app.root_path) / "static" / "favicon.ico"
         ico_path.parent.mkdir(parents=True, exist_ok=True)
         img.save(ico_path, format="ICO", sizes=[(32, 32)])
+        meta_path.write_text(json.dumps(meta), encoding="utf-8")
     except Exception:
         # Fail silently if anything goes wrong
         pass
 
 
-def create_app() -> Flask:
-    """Create and configure a Flask application instance."""
+def setup_favicon(app: Flask, config: dict) -> None:
+    """Make sure ``favicon.ico`` matches the configured logo.
+
+    ``frontend.logo.favicon`` selects the startup behaviour: ``cached`` (the
+    default) reuses an icon built from the same URL and otherwise builds it in
+    the background, ``background`` always refreshes it in the background,
+    ``sync`` downloads it before the app starts and ``off`` skips it.
+    """
+    logo_cfg = config.get("frontend", {}).get("logo", {})
+    mode = logo_cfg.get("favicon", "cached")
+    image_url = logo_cfg.get("image_url")
+    if mode == "off" or not (logo_cfg.get("enabled") and image_url):
+        return
+    static_dir = Path(app.root_path) / "static"
+    if mode == "cached":
+        try:
+            meta = json.loads((static_dir / "favicon.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            meta = {}
+        if meta.get("url") == image_url and (static_dir / "favicon.ico").exists():
+            return
+    if mode == "sync":
+        build_favicon(static_dir, image_url)
+        return
+    Thread(
+        target=build_favicon, args=(static_dir, image_url), name="favicon", daemon=True
+    ).start()
+
+
+def create_app(config: Optional[dict] = None) -> Flask:
+    """Create and configure a Flask application instance.
+
+    ``config`` replaces the contents of ``config.json`` when given. Startup
+    phase durations are stored in ``app.config["BOOT_TIMINGS"]`` (in
+    milliseconds) and logged once the app is ready.
+    """
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
     app = Flask(__name__)
+    app.config["BOOT_TIMINGS"] = timings
     app.config["SECRET_KEY"] = secrets.token_hex(16)
-    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///bins.db"
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
-    db.init_app(app)
+    with boot_phase(timings, "config"):
+        if config is None:
+            config = load_config()
+        app.config["APP_CONFIG"] = config
+        from .api_keys import api_keys
+
+        api_keys.configure(config.get("api", {}))
+
+        cache_cfg = config.get("cache", {})
+        from .cache import bin_cache
+
+        bin_cache.configure(
+            max_size=int(cache_cfg.get("max_size", 10000)) if cache_cfg.get("enabled", True) else 0,
+            ttl=float(cache_cfg.get("ttl_seconds", 300)),
+        )
+
+        submissions_cfg = config.get("submissions", {})
+        from .ingest import submission_queue
+
+        submission_queue.configure(
+            max_size=int(submissions_cfg.get("max_queue", 10000)),
+            batch_size=int(submissions_cfg.get("batch_size", 500)),
+            max_delay=float(submissions_cfg.get("max_delay_ms", 200)) / 1000,
+            max_retries=int(submissions_cfg.get("max_retries", 5)),
+            retry_delay=float(submissions_cfg.get("retry_delay_ms", 100)) / 1000,
+        )
+
+        from .http_cache import compute_render_version
+
+        app.config["RENDER_VERSION"] = compute_render_version(app)
+
+    with boot_phase(timings, "database"):
+        from .storage import configure_database, install_pragmas
+
+        configure_database(app, config)
+        db.init_app(app)
+        install_pragmas(app, config)
+
+        from .lookup import writer_sync
+
+        writer_sync.interval = float(config.get("database", {}).get("sync_interval_ms", 500)) / 1000
+
+        snapshot_cfg = config.get("snapshot", {})
+        from .snapshot import bin_snapshot
+
+        bin_snapshot.configure(
+            Path(app.instance_path, snapshot_cfg.get("path", "bins.snapshot"))
+            if snapshot_cfg.get("enabled", True)
+            else None,
+            rebuild_delay=float(snapshot_cfg.get("rebuild_delay_ms", 1000)) / 1000,
+        )
+
+        from .presence import bin_presence
+
+        bin_presence.enabled = bool(config.get("presence", {}).get("enabled", True))
+
+    with boot_phase(timings, "favicon"):
+        setup_favicon(app, config)
 
-    config = load_config()
-    app.config["APP_CONFIG"] = config
-    app.config["API_KEY"] = config.get("api", {}).get("api_key", "")
+    with boot_phase(timings, "blueprints"):
+        if config.get("api", {}).get("enabled", False):
+            from .api import api_bp
 
-    setup_favicon(app, config)
+            app.register_blueprint(api_bp)
 
-    if config.get("api", {}).get("enabled", False):
-        from .api import api_bp
+        from .frontend import frontend_bp
+        app.register_blueprint(frontend_bp)
 
-        app.register_blueprint(api_bp)
+        if config.get("admin", {}).get("enabled", False):
+            from .admin import admin_bp
 
-    from .frontend import frontend_bp
-    app.register_blueprint(frontend_bp)
+            app.register_blueprint(admin_bp)
 
-    if config.get("admin", {}).get("enabled", False):
-        from .admin import admin_bp
+    if config.get("metrics", {}).get("enabled", True):
+        with boot_phase(timings, "metrics"):
+            from .monitoring import init_metrics
 
-        app.register_blueprint(admin_bp)
+            init_metrics(app)
 
-    # Placeholder for future blueprints (e.g. Telegram)
+    timings["create_app"] = round((time.perf_counter() - started) * 1000, 2)
+    logger.info("create_app boot timings (ms): %s", timings)
     return app
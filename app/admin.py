@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 from functools import wraps
-from typing import Optional
+import json
+from typing import Any, Dict, Optional, Tuple
 
 from flask import (
     Blueprint,
@@ -12,12 +13,20 @@ from flask import (
     session,
     current_app,
 )
+from sqlalchemy import String, func, select, tuple_, type_coerce
 
+from .lookup import bin_changed, is_valid_bin
 from .models import Bin, Submission
+from .review import REVIEW_FIELDS, approve, consensus_page, reject
+from .search import EXACT_FILTERS, SEARCH_FILTERS, match_expression, search_bins
+from .stats import summary
 from . import db
 
 admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
 
+# Query parameters accepted as exact-match filters on the submissions list
+SUBMISSION_FILTERS = ("bin", "country", "category")
+
 
 def login_required(view):
     """Decorator to require login for admin routes."""
@@ -65,8 +74,8 @@ def dashboard():
     if request.method == "POST":
         action = request.form.get("action")
         bin_code = request.form.get("bin", "").strip()
-        if not bin_code.isdigit() or len(bin_code) != 6:
-            message = "Please enter a valid 6 digit BIN."
+        if not is_valid_bin(bin_code):
+            message = "Please enter a valid 6 to 8 digit BIN."
         elif action == "search":
             record = Bin.query.filter_by(bin=bin_code).first()
             if not record:
@@ -93,6 +102,7 @@ def dashboard():
                     data["max_balance"] = int(max_balance)
                 except ValueError:
                     data["max_balance"] = None
+            created = record is None
             if record:
                 for field, value in data.items():
                     setattr(record, field, value)
@@ -101,27 +111,173 @@ def dashboard():
                 record = Bin(bin=bin_code, **data)
                 db.session.add(record)
             db.session.commit()
+            bin_changed(bin_code, reindex=created)
             message = "Record saved"
         elif action == "delete":
             record = Bin.query.filter_by(bin=bin_code).first()
             if record:
                 db.session.delete(record)
                 db.session.commit()
+                bin_changed(bin_code)
                 message = f"Deleted BIN {bin_code}"
                 record = None
             else:
                 message = "BIN not found"
     return render_template(
-        "admin_dashboard.html", message=message, record=record, colors=colors
+        "admin_dashboard.html",
+        message=message,
+        record=record,
+        stats=summary(10),
+        colors=colors,
     )
 
 
+def _page_size() -> int:
+    cfg = current_app.config.get("APP_CONFIG", {}).get("admin", {})
+    return max(1, int(cfg.get("page_size", 50)))
+
+
+# ``created_at`` as the stored text. Cursors compare against it directly, so
+# rows upgraded from older versions, which hold second precision timestamps,
+# page in the same order they are sorted in.
+_created_text = type_coerce(Submission.created_at, String)
+
+
+def _encode_cursor(submission: Submission) -> str:
+    created_at = db.session.execute(
+        select(_created_text).where(Submission.id == submission.id)
+    ).scalar()
+    return f"{created_at}~{submission.id}"
+
+
+def _decode_cursor(value: str) -> Optional[Tuple[str, int]]:
+    created_at, _, sub_id = value.rpartition("~")
+    try:
+        return (created_at, int(sub_id)) if created_at else None
+    except ValueError:
+        return None
+
+
 @admin_bp.route("/submissions")
 @login_required
 def submissions():
+    """List submissions newest first, one keyset page at a time.
+
+    ``?before=<cursor>`` continues after the last row of the previous page and
+    ``?view=bins`` shows per-BIN counts instead, paged with ``?after=<bin>``.
+    Every page is a bounded index range scan, so rendering time does not grow
+    with the size of the backlog.
+    """
     colors = current_app.config.get("APP_CONFIG", {}).get("frontend", {})
-    submissions = Submission.query.all()
-    return render_template("admin_submissions.html", submissions=submissions, colors=colors)
+    filters = {name: request.args.get(name, "").strip() for name in SUBMISSION_FILTERS}
+    conditions = [getattr(Submission, name) == value for name, value in filters.items() if value]
+    page_size = _page_size()
+    view = "bins" if request.args.get("view") == "bins" else "list"
+    next_args: Optional[Dict[str, Any]] = None
+    rows: list = []
+    if view == "bins":
+        query = db.session.query(
+            Submission.bin,
+            func.count(Submission.id).label("count"),
+            func.max(Submission.created_at).label("latest"),
+        ).filter(*conditions)
+        after = request.args.get("after", "")
+        if after:
+            query = query.filter(Submission.bin > after)
+        rows = query.group_by(Submission.bin).order_by(Submission.bin).limit(page_size + 1).all()
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_args = {"after": rows[-1].bin}
+    else:
+        query = Submission.query.filter(*conditions)
+        cursor = _decode_cursor(request.args.get("before", ""))
+        if cursor is not None:
+            query = query.filter(tuple_(_created_text, Submission.id) < cursor)
+        rows = (
+            query.order_by(Submission.created_at.desc(), Submission.id.desc())
+            .limit(page_size + 1)
+            .all()
+        )
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_args = {"before": _encode_cursor(rows[-1])}
+    active = {name: value for name, value in filters.items() if value}
+    if view == "bins":
+        active["view"] = view
+    next_url = url_for("admin.submissions", **active, **next_args) if next_args else None
+    return render_template(
+        "admin_submissions.html",
+        rows=rows,
+        view=view,
+        filters=filters,
+        next_url=next_url,
+        colors=colors,
+    )
+
+
+@admin_bp.route("/search")
+@login_required
+def search():
+    """Search BIN records by attribute, one ``?cursor=`` page at a time."""
+    colors = current_app.config.get("APP_CONFIG", {}).get("frontend", {})
+    q = request.args.get("q", "").strip()
+    filters = {name: request.args.get(name, "").strip() for name in SEARCH_FILTERS}
+    rows: list = []
+    next_url: Optional[str] = None
+    searched = bool(match_expression(q, filters) or any(filters[name] for name in EXACT_FILTERS))
+    if searched:
+        try:
+            after = max(0, int(request.args.get("cursor", 0)))
+        except ValueError:
+            after = 0
+        page = search_bins(q, filters, after, _page_size())
+        rows = [json.loads(payload) for _, payload in page.rows]
+        if page.next is not None:
+            active = {name: value for name, value in filters.items() if value}
+            if q:
+                active["q"] = q
+            next_url = url_for("admin.search", **active, cursor=page.next)
+    return render_template(
+        "admin_search.html",
+        rows=rows,
+        q=q,
+        filters=filters,
+        searched=searched,
+        next_url=next_url,
+        colors=colors,
+    )
+
+
+@admin_bp.route("/submissions/review", methods=["GET", "POST"])
+@login_required
+def review_submissions():
+    """Show the per-BIN consensus of pending submissions and apply it in bulk."""
+    colors = current_app.config.get("APP_CONFIG", {}).get("frontend", {})
+    message: Optional[str] = None
+    if request.method == "POST":
+        action = request.form.get("action")
+        bins = [bin_code for bin_code in request.form.getlist("bins") if is_valid_bin(bin_code)]
+        if not bins:
+            message = "Select at least one BIN."
+        elif action == "approve":
+            message = f"Approved consensus for {approve(bins)} BINs"
+        elif action == "reject":
+            message = f"Rejected {reject(bins)} submissions for {len(bins)} BINs"
+    page_size = _page_size()
+    after = request.args.get("after", "")
+    results = consensus_page(after, page_size + 1)
+    next_url = None
+    if len(results) > page_size:
+        results = results[:page_size]
+        next_url = url_for("admin.review_submissions", after=results[-1].bin)
+    return render_template(
+        "admin_review.html",
+        results=results,
+        fields=REVIEW_FIELDS,
+        message=message,
+        next_url=next_url,
+        colors=colors,
+    )
 
 
 @admin_bp.route("/submissions/<int:sub_id>", methods=["GET", "POST"])
@@ -134,6 +290,7 @@ def view_submission(sub_id: int):
         action = request.form.get("action")
         if action == "update":
             record = Bin.query.filter_by(bin=submission.bin).first()
+            created = record is None
             if not record:
                 record = Bin(bin=submission.bin)
                 db.session.add(record)
@@ -160,6 +317,7 @@ def view_submission(sub_id: int):
                 setattr(record, field, value)
             db.session.delete(submission)
             db.session.commit()
+            bin_changed(record.bin, reindex=created)
             message = "BIN updated"
         elif action == "delete":
             db.session.delete(submission)
@@ -2,11 +2,29 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict, List
+import csv
+import io
+import json
+import math
+import time
+import zlib
+from typing import Any, Dict, Iterator, List
 
-from flask import Blueprint, Response, jsonify, request, current_app
+from flask import Blueprint, Response, g, jsonify, request, current_app, stream_with_context
+from sqlalchemy import select
+from werkzeug.exceptions import RequestEntityTooLarge
 
-from .models import Bin, Submission
+from .api_keys import api_keys
+from .cache import bin_cache
+from .changes import changes_since
+from .http_cache import add_validators, is_not_modified, not_modified
+from .lookup import bin_changed, find_bin_entry, is_valid_bin, is_valid_lookup, match_bin
+from .ingest import record_submission, submission_queue
+from .models import Bin, encode_payload, fill_payloads
+from .pan import check_pans
+from .search import EXACT_FILTERS, SEARCH_FILTERS, match_expression, search_bins
+from .stats import summary
+from .storage import read_connection
 from . import db
 
 
@@ -14,31 +32,307 @@ api_bp = Blueprint("api", __name__, url_prefix="/api")
 
 # Endpoints that do not require authentication even when an API key is set
 PUBLIC_ENDPOINTS = {"api.submit_report"}
+# Read-only endpoints that use POST only to carry a request body
+READ_ONLY_ENDPOINTS = {"api.batch_lookup", "api.check_cards"}
 
 
 @api_bp.before_request
 def require_api_key() -> Response | None:
-    """Authenticate requests or restrict methods based on API key config."""
+    """Authenticate and throttle requests, or restrict methods when no keys are set."""
     if request.endpoint in PUBLIC_ENDPOINTS:
         return None
-    api_key: str = current_app.config.get("API_KEY", "")
-    if api_key:
-        header_key = request.headers.get("x-api-key")
-        if header_key != api_key:
+    if api_keys.enabled:
+        key = api_keys.authenticate(request.headers.get("x-api-key"))
+        if key is None:
             return jsonify({"error": "Unauthorized"}), 401
+        api_keys.start(current_app._get_current_object())
+        reason, retry_after = api_keys.consume(key)
+        if reason is not None:
+            response = jsonify({"error": reason})
+            response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+            return response, 429
+        g.api_key = key
+        return None
+    if request.endpoint in READ_ONLY_ENDPOINTS:
         return None
     if request.method not in {"GET", "HEAD", "OPTIONS"}:
         return jsonify({"error": "Unauthorized"}), 401
     return None
 
 
+@api_bp.get("/usage")
+def key_usage() -> Response:
+    """Report today's request count and limits for the calling API key."""
+    key = g.get("api_key")
+    if key is None:
+        return jsonify({"error": "No API key configured"}), 404
+    return jsonify(api_keys.usage(key))
+
+
 @api_bp.get("/bin/<string:bin_code>")
 def get_bin(bin_code: str) -> Response:
-    """Retrieve a BIN record by its first six digits."""
-    record = Bin.query.filter_by(bin=bin_code).first()
-    if record:
-        return jsonify(record.as_dict())
-    return jsonify({"error": "BIN not found"}), 404
+    """Retrieve the most specific BIN record for a 6-8 digit BIN or card number."""
+    if not is_valid_lookup(bin_code):
+        return jsonify({"error": "Invalid BIN"}), 400
+    entry = find_bin_entry(bin_code)
+    if entry is None:
+        return jsonify({"error": "BIN not found"}), 404
+    if is_not_modified(entry.etag, entry.updated_at):
+        return not_modified(entry.etag, entry.updated_at, "api")
+    response = Response(entry.payload, mimetype="application/json")
+    return add_validators(response, entry.etag, entry.updated_at, "api")
+
+
+def _batch_config() -> Dict[str, Any]:
+    """Return batch lookup limits from ``config.json`` with defaults applied."""
+    cfg = current_app.config.get("APP_CONFIG", {}).get("api", {}).get("batch", {})
+    return {
+        "max_bins": int(cfg.get("max_bins", 50000)),
+        "max_body_bytes": int(cfg.get("max_body_bytes", 1048576)),
+        "chunk_size": max(1, int(cfg.get("chunk_size", 500))),
+        "log_chunk_timing": bool(cfg.get("log_chunk_timing", False)),
+    }
+
+
+def _read_batch_bins(key: str, max_bytes: int) -> List[str] | None:
+    """Parse BINs from a JSON array, ``{key: [...]}`` or newline-delimited body.
+
+    Raises ``RequestEntityTooLarge`` for a body over ``max_bytes``, whether
+    it declares a Content-Length or arrives chunked.
+    """
+    # Reading stops one byte past the limit, which is how a body that is too
+    # large is told from one that fits exactly
+    request.max_content_length = max_bytes + 1
+    if len(request.get_data()) > max_bytes:
+        raise RequestEntityTooLarge()
+    if request.is_json:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            data = data.get(key)
+        if not isinstance(data, list):
+            return None
+        return [str(item).strip() for item in data]
+    body = request.get_data(as_text=True)
+    return [line.strip() for line in body.splitlines() if line.strip()]
+
+
+@api_bp.post("/bins/batch")
+def batch_lookup() -> Response:
+    """Resolve many BINs at once and stream the results as NDJSON."""
+    cfg = _batch_config()
+    try:
+        bins = _read_batch_bins("bins", cfg["max_body_bytes"])
+    except RequestEntityTooLarge:
+        return jsonify({"error": "Request body too large"}), 413
+    if bins is None:
+        return jsonify({"error": "Expected a JSON array or newline-delimited BINs"}), 400
+    if len(bins) > cfg["max_bins"]:
+        return jsonify({"error": f"At most {cfg['max_bins']} BINs per request"}), 413
+
+    chunk_size = cfg["chunk_size"]
+    log_timing = cfg["log_chunk_timing"]
+    logger = current_app.logger
+
+    def generate() -> Iterator[str]:
+        for offset in range(0, len(bins), chunk_size):
+            started = time.perf_counter()
+            chunk = bins[offset : offset + chunk_size]
+            matches = {code: match_bin(code) for code in chunk if is_valid_lookup(code)}
+            wanted = {code for code in matches.values() if code is not None}
+            found: Dict[str, str] = {}
+            if wanted:
+                with read_connection() as conn:
+                    rows = conn.execute(select(Bin.bin, Bin.payload).where(Bin.bin.in_(wanted)))
+                    found = fill_payloads(conn, dict(rows.all()))
+            lines = []
+            for code in chunk:
+                matched = matches.get(code)
+                if matched in found:
+                    # Splice the stored payload in without decoding it
+                    lines.append(f'{{"bin": {json.dumps(code)}, "found": true, "data": {found[matched]}}}')
+                    continue
+                if code in matches:
+                    entry = {"bin": code, "found": False, "error": "BIN not found"}
+                else:
+                    entry = {"bin": code, "found": False, "error": "Invalid BIN"}
+                lines.append(json.dumps(entry))
+            yield "\n".join(lines) + "\n"
+            if log_timing:
+                logger.info(
+                    "batch chunk %d: %d BINs, %d found in %.2f ms",
+                    offset // chunk_size,
+                    len(chunk),
+                    len(found),
+                    (time.perf_counter() - started) * 1000,
+                )
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+@api_bp.post("/pans/check")
+def check_cards() -> Response:
+    """Luhn-check many card numbers, detect their brand and attach their BIN record.
+
+    Card numbers are answered masked and never logged or stored.
+    """
+    cfg = _batch_config()
+    try:
+        pans = _read_batch_bins("pans", cfg["max_body_bytes"])
+    except RequestEntityTooLarge:
+        return jsonify({"error": "Request body too large"}), 413
+    if pans is None:
+        return jsonify({"error": "Expected a JSON array or newline-delimited card numbers"}), 400
+    if len(pans) > cfg["max_bins"]:
+        return jsonify({"error": f"At most {cfg['max_bins']} card numbers per request"}), 413
+
+    def generate() -> Iterator[str]:
+        index = 0
+        for results in check_pans(pans, cfg["chunk_size"]):
+            lines = []
+            for result in results:
+                head = json.dumps(
+                    {
+                        "index": index,
+                        "pan": result.masked,
+                        "valid": result.valid,
+                        "brand": result.brand,
+                        "bin": result.bin,
+                        "found": result.payload is not None,
+                    }
+                )
+                if result.masked is None:
+                    lines.append(f'{head[:-1]}, "error": "Invalid card number"}}')
+                else:
+                    lines.append(f'{head[:-1]}, "data": {result.payload or "null"}}}')
+                index += 1
+            yield "\n".join(lines) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+EXPORT_BATCH_SIZE = 1000
+
+
+def _export_rows(columns: List[str]) -> Iterator[List[Dict[str, Any]]]:
+    """Yield batches of BIN rows from a server-side cursor on a read connection."""
+    table = Bin.__table__
+    query = select(*(table.c[name] for name in columns)).order_by(table.c.id)
+    with read_connection() as conn:
+        result = conn.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for partition in result.mappings().partitions():
+            yield [dict(row) for row in partition]
+
+
+@api_bp.get("/bins/export")
+def export_bins() -> Response:
+    """Stream the full BIN table as NDJSON or CSV, optionally gzip-compressed."""
+    fmt = request.args.get("format", "ndjson").lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": "format must be one of: ndjson, csv"}), 400
+    compress = request.args.get("gzip", "").lower() in {"1", "true", "yes"}
+    columns = [
+        column.name for column in Bin.__table__.columns if column.name not in Bin.internal_columns
+    ]
+
+    def encode() -> Iterator[str]:
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=columns, lineterminator="\n")
+            writer.writeheader()
+            yield buffer.getvalue()
+            for batch in _export_rows(columns):
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows(batch)
+                yield buffer.getvalue()
+        else:
+            for batch in _export_rows(columns + ["payload"]):
+                yield "".join(
+                    (row.pop("payload") or encode_payload(row)) + "\n" for row in batch
+                )
+
+    def generate() -> Iterator[bytes]:
+        if not compress:
+            for text in encode():
+                yield text.encode("utf-8")
+            return
+        compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+        for text in encode():
+            yield compressor.compress(text.encode("utf-8")) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+    filename = f"bins.{fmt}" + (".gz" if compress else "")
+    mimetype = "application/gzip" if compress else EXPORT_FORMATS[fmt]
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}"
+    return response
+
+
+@api_bp.get("/bins/changes")
+def bin_changes() -> Response:
+    """List inserts, updates and deletes of BIN records after a cursor, oldest first."""
+    cfg = current_app.config.get("APP_CONFIG", {}).get("changes", {})
+    max_page_size = int(cfg.get("max_page_size", 10000))
+    try:
+        since = int(request.args.get("since", 0))
+        limit = int(request.args.get("limit", cfg.get("page_size", 1000)))
+    except ValueError:
+        return jsonify({"error": "since and limit must be integers"}), 400
+    if since < 0 or limit < 1:
+        return jsonify({"error": "since must be >= 0 and limit >= 1"}), 400
+    body = changes_since(since, min(limit, max_page_size))
+    if body is None:
+        return jsonify({"error": "Cursor expired, start again from since=0"}), 410
+    return Response(body, mimetype="application/json")
+
+
+@api_bp.get("/bins/search")
+def search() -> Response:
+    """Find BIN records by issuer, company, distributor, country, category or type."""
+    cfg = current_app.config.get("APP_CONFIG", {}).get("search", {})
+    max_page_size = int(cfg.get("max_page_size", 500))
+    q = request.args.get("q", "").strip()
+    filters = {name: request.args.get(name, "").strip() for name in SEARCH_FILTERS}
+    if not match_expression(q, filters) and not any(filters[name] for name in EXACT_FILTERS):
+        return jsonify({"error": "Provide q or at least one filter"}), 400
+    try:
+        after = int(request.args.get("cursor", 0))
+        limit = int(request.args.get("limit", cfg.get("page_size", 50)))
+    except ValueError:
+        return jsonify({"error": "cursor and limit must be integers"}), 400
+    if after < 0 or limit < 1:
+        return jsonify({"error": "cursor must be >= 0 and limit >= 1"}), 400
+    page = search_bins(q, filters, after, min(limit, max_page_size))
+    # Splice the stored payloads in without decoding them
+    results = ", ".join(payload for _, payload in page.rows)
+    return Response(
+        f'{{"results": [{results}], "next": {json.dumps(page.next)}}}',
+        mimetype="application/json",
+    )
+
+
+@api_bp.get("/stats")
+def stats() -> Response:
+    """Report BIN counts per country, category, type and issuer and pending submissions."""
+    cfg = current_app.config.get("APP_CONFIG", {}).get("stats", {})
+    try:
+        limit = int(request.args.get("limit", cfg.get("top_values", 20)))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    return jsonify(summary(max(1, min(limit, int(cfg.get("max_values", 1000))))))
+
+
+@api_bp.get("/cache/stats")
+def cache_stats() -> Response:
+    """Report lookup cache counters for capacity planning."""
+    return jsonify(bin_cache.stats())
+
+
+@api_bp.get("/submissions/queue")
+def submission_queue_stats() -> Response:
+    """Report submission queue depth, write counters and commit latency."""
+    return jsonify(submission_queue.stats())
 
 
 @api_bp.post("/bin")
@@ -50,6 +344,8 @@ def create_bin() -> Response:
     required_fields = ["bin", "company", "country"]
     if not all(field in data and data[field] for field in required_fields):
         return jsonify({"error": "Missing required fields"}), 400
+    if not is_valid_bin(str(data["bin"])):
+        return jsonify({"error": "Invalid BIN"}), 400
     if Bin.query.filter_by(bin=data["bin"]).first():
         return jsonify({"error": "BIN already exists"}), 400
     fields = [
@@ -69,6 +365,7 @@ def create_bin() -> Response:
     new_bin = Bin(**{field: data.get(field) for field in fields})
     db.session.add(new_bin)
     db.session.commit()
+    bin_changed(new_bin.bin)
     return jsonify(new_bin.as_dict()), 201
 
 
@@ -98,24 +395,26 @@ def update_bin(bin_code: str) -> Response:
         if field in data:
             setattr(record, field, data[field])
     db.session.commit()
+    bin_changed(bin_code, reindex=False)
     return jsonify(record.as_dict())
 
 
 @api_bp.delete("/bin/<string:bin_code>")
 def delete_bin(bin_code: str) -> Response:
-    """Delete a BIN record by its first six digits."""
+    """Delete a BIN record by its stored BIN."""
     record = Bin.query.filter_by(bin=bin_code).first()
     if not record:
         return jsonify({"error": "BIN not found"}), 404
     db.session.delete(record)
     db.session.commit()
+    bin_changed(bin_code)
     return jsonify({"message": f"Deleted BIN {bin_code}"})
 
 
 @api_bp.post("/report/<string:bin_code>")
 def submit_report(bin_code: str) -> Response:
     """Accept user submissions for BIN corrections."""
-    if not bin_code.isdigit() or len(bin_code) != 6:
+    if not is_valid_bin(bin_code):
         return jsonify({"error": "Invalid BIN"}), 400
     data: Dict[str, Any] | None = request.get_json()
     if data is None:
@@ -140,7 +439,12 @@ def submit_report(bin_code: str) -> Response:
             values["max_balance"] = int(max_balance)
         except (TypeError, ValueError):
             values["max_balance"] = None
-    submission = Submission(bin=bin_code, **values)
-    db.session.add(submission)
-    db.session.commit()
-    return jsonify(submission.as_dict()), 201
+    values["bin"] = bin_code
+    status = record_submission(values)
+    if status == 429:
+        response = jsonify({"error": "Too many pending submissions, try again later"})
+        response.headers["Retry-After"] = "1"
+        return response, 429
+    if status == 503:
+        return jsonify({"error": "Submission queue unavailable"}), 503
+    return jsonify(values), status
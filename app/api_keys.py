@@ -0,0 +1,260 @@
+"""API key authentication with per-key rate limits and daily quotas.
+
+Keys are indexed by their SHA-256 digest so plaintext keys never need to be
+kept in memory or config. Every key has a token bucket and a daily request
+quota. Their counters live in an anonymous shared memory mapping created
+when the keys are configured, which ``serve.py`` does before forking, so
+all worker processes draw on the same bucket and quota. Usage counters are
+flushed to the ``api_key_usage`` table in batches by a background thread,
+and today's totals are reloaded from it on startup so restarts do not
+reset quotas.
+"""
+
+from __future__ import annotations
+
+import atexit
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+import hashlib
+import logging
+import mmap
+import multiprocessing
+from threading import Event, Lock, Thread
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from flask import Flask
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+
+from . import db
+from .models import ApiKeyUsage
+
+logger = logging.getLogger(__name__)
+
+
+def hash_key(key: str) -> str:
+    """Return the hex SHA-256 digest used to index ``key``."""
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def seconds_until_tomorrow() -> float:
+    now = datetime.now(timezone.utc)
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), timezone.utc)
+    return (tomorrow - now).total_seconds()
+
+
+# Shared counters of every key, in this order, as doubles
+TOKENS, UPDATED, DAY, USED = range(4)
+FIELDS = 4
+
+
+@dataclass
+class ApiKey:
+    """Limits of one API key and the offset of its shared counters.
+
+    A ``rate`` or ``daily_quota`` of ``0`` means unlimited.
+    """
+
+    name: str
+    rate: float = 0.0
+    burst: float = 0.0
+    daily_quota: int = 0
+    slot: int = field(default=0, repr=False)
+
+
+def _shared_counters(count: int) -> memoryview:
+    # Anonymous mappings are shared with processes forked afterwards
+    return memoryview(mmap.mmap(-1, max(count, 1) * FIELDS * 8)).cast("d")
+
+
+class ApiKeyStore:
+    """In-memory index of API keys with batched usage persistence."""
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._keys: Dict[str, ApiKey] = {}
+        self._counters = _shared_counters(0)
+        self._shared_lock = multiprocessing.Lock()
+        self._pending: Dict[Tuple[str, date], int] = {}
+        self._stopping = Event()
+        self._thread: Optional[Thread] = None
+        self._engine = None
+        self.flush_interval = 10.0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any key is configured, i.e. requests must authenticate."""
+        return bool(self._keys)
+
+    def configure(self, api_cfg: Dict[str, Any]) -> None:
+        """Load keys from the ``api`` config section.
+
+        ``api.keys`` entries take ``name`` plus ``key`` or ``key_sha256`` and
+        optional ``rate_per_second``, ``burst`` and ``daily_quota``; missing
+        limits fall back to ``api.rate_limit``. A non-empty ``api.api_key`` is
+        registered as the key named ``default``.
+        """
+        defaults = api_cfg.get("rate_limit", {})
+        entries = list(api_cfg.get("keys", []))
+        if api_cfg.get("api_key"):
+            entries.insert(0, {"name": "default", "key": api_cfg["api_key"]})
+        keys: Dict[str, ApiKey] = {}
+        counters = _shared_counters(len(entries))
+        now = time.monotonic()
+        today = utc_today().toordinal()
+        for entry in entries:
+            digest = entry.get("key_sha256") or hash_key(entry["key"])
+            rate = float(entry.get("rate_per_second", defaults.get("rate_per_second", 0)))
+            burst = float(entry.get("burst", defaults.get("burst", 0))) or max(rate, 1.0)
+            slot = len(keys) * FIELDS
+            keys[digest.lower()] = ApiKey(
+                name=entry.get("name") or digest[:12],
+                rate=rate,
+                burst=burst,
+                daily_quota=int(entry.get("daily_quota", defaults.get("daily_quota", 0))),
+                slot=slot,
+            )
+            counters[slot + TOKENS] = burst
+            counters[slot + UPDATED] = now
+            counters[slot + DAY] = today
+        with self._lock:
+            self._keys = keys
+            self._counters = counters
+            self.flush_interval = float(api_cfg.get("usage_flush_seconds", 10))
+
+    def authenticate(self, key: Optional[str]) -> Optional[ApiKey]:
+        """Return the configured key matching the presented ``key``, if any."""
+        if not key:
+            return None
+        return self._keys.get(hash_key(key))
+
+    def consume(self, key: ApiKey) -> Tuple[Optional[str], float]:
+        """Account one request for ``key``.
+
+        Returns ``(None, 0)`` when the request may proceed, otherwise the
+        reason it was throttled and the seconds to wait before retrying.
+        """
+        today = utc_today()
+        # ``time.monotonic`` is a system-wide clock, comparable across processes
+        now = time.monotonic()
+        counters, slot = self._counters, key.slot
+        with self._shared_lock:
+            if counters[slot + DAY] != today.toordinal():
+                counters[slot + DAY] = today.toordinal()
+                counters[slot + USED] = 0
+            if key.daily_quota and counters[slot + USED] >= key.daily_quota:
+                return "Daily quota exceeded", seconds_until_tomorrow()
+            if key.rate:
+                tokens = min(
+                    key.burst, counters[slot + TOKENS] + (now - counters[slot + UPDATED]) * key.rate
+                )
+                counters[slot + UPDATED] = now
+                if tokens < 1:
+                    counters[slot + TOKENS] = tokens
+                    return "Rate limit exceeded", (1 - tokens) / key.rate
+                counters[slot + TOKENS] = tokens - 1
+            counters[slot + USED] += 1
+        with self._lock:
+            pending_key = (key.name, today)
+            self._pending[pending_key] = self._pending.get(pending_key, 0) + 1
+        return None, 0.0
+
+    def start(self, app: Flask) -> None:
+        """Load today's usage and start the flush thread, once per process."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            with app.app_context():
+                self._engine = db.engine
+            self._load_usage()
+            self._stopping.clear()
+            self._thread = Thread(target=self._run, name="api-usage-flush", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Stop the flush thread and write out pending counters."""
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(self.flush_interval + 5)
+
+    def _load_usage(self) -> None:
+        today = utc_today()
+        by_name = {key.name: key for key in self._keys.values()}
+        try:
+            with self._engine.connect() as conn:
+                rows = conn.execute(
+                    select(ApiKeyUsage.key_name, ApiKeyUsage.requests).where(ApiKeyUsage.day == today)
+                )
+                for name, requests in rows:
+                    key = by_name.get(name)
+                    if key is not None:
+                        self._restore(key, requests)
+        except Exception:
+            logger.exception("Could not load API key usage")
+
+    def _restore(self, key: ApiKey, requests: int) -> None:
+        # Workers load the stored total one after another while others may
+        # already count requests, so never lower the shared counter
+        counters, slot = self._counters, key.slot
+        today = utc_today().toordinal()
+        with self._shared_lock:
+            if counters[slot + DAY] != today:
+                counters[slot + DAY] = today
+                counters[slot + USED] = 0
+            counters[slot + USED] = max(counters[slot + USED], requests)
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    def flush(self) -> int:
+        """Write pending usage counters in one transaction; returns rows written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending or self._engine is None:
+            return 0
+        rows = [
+            {"key_name": name, "day": day, "requests": count}
+            for (name, day), count in pending.items()
+        ]
+        stmt = insert(ApiKeyUsage.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["key_name", "day"],
+            set_={"requests": ApiKeyUsage.__table__.c.requests + stmt.excluded.requests},
+        )
+        try:
+            with self._engine.begin() as conn:
+                conn.execute(stmt, rows)
+        except Exception:
+            logger.exception("Failed to flush API key usage")
+            with self._lock:
+                for pending_key, count in pending.items():
+                    self._pending[pending_key] = self._pending.get(pending_key, 0) + count
+            return 0
+        return len(rows)
+
+    def usage(self, key: ApiKey) -> Dict[str, Any]:
+        """Return today's usage and remaining allowance for ``key``."""
+        counters, slot = self._counters, key.slot
+        with self._shared_lock:
+            current = counters[slot + DAY] == utc_today().toordinal()
+            used = int(counters[slot + USED]) if current else 0
+        return {
+            "name": key.name,
+            "requests_today": used,
+            "daily_quota": key.daily_quota or None,
+            "remaining_today": max(key.daily_quota - used, 0) if key.daily_quota else None,
+            "rate_per_second": key.rate or None,
+            "burst": key.burst if key.rate else None,
+        }
+
+
+api_keys = ApiKeyStore()
@@ -0,0 +1,102 @@
+"""Thread-safe in-process cache for serialized BIN records."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from threading import Lock
+import time
+from typing import Any, Dict, Optional, Tuple
+
+
+class BinCache:
+    """Bounded LRU cache with a per-entry TTL and usage counters.
+
+    Values are immutable entries built from ``Bin`` rows. Writers must call
+    :meth:`invalidate` after committing so readers never see stale data for
+    longer than it takes to re-query the database.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300.0) -> None:
+        self._lock = Lock()
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._generation = 0
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def configure(self, max_size: int, ttl: float) -> None:
+        """Apply new limits and drop all cached entries."""
+        with self._lock:
+            self.max_size = max_size
+            self.ttl = ttl
+            self._data.clear()
+            self._generation += 1
+
+    def token(self) -> int:
+        """Return the current generation to pass to :meth:`set` after a read."""
+        return self._generation
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for ``key`` or ``None`` on a miss."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, value = entry
+            if self.ttl > 0 and expires < time.monotonic():
+                del self._data[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, token: Optional[int] = None) -> None:
+        """Store ``value`` unless an invalidation happened since ``token``."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if token is not None and token != self._generation:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        """Remove ``key`` and discard any in-flight reads that may be stale."""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove every cached entry."""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters useful for sizing the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+bin_cache = BinCache()
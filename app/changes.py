@@ -0,0 +1,133 @@
+"""Change feed over the ``bin_changes`` log.
+
+Triggers append one row per insert, update or delete of a BIN (see
+``app.schema.CHANGE_LOG``); the row id is the cursor clients pass back to
+``GET /api/bins/changes``. Changes carry the current record rather than
+the one at the time of the change, so a client that applies them in order
+ends up with the current table.
+
+Compaction keeps the log bounded. Entries older than the retention period
+that a later entry for the same BIN supersedes are dropped, which loses
+nothing for clients. Old deletions are dropped too; their highest id
+becomes the *horizon*, and a client whose cursor is below it can no longer
+be brought up to date incrementally and must start again from ``0``. The
+log then still holds the latest entry of every stored BIN, so a full sync
+from ``0`` needs no separate export.
+"""
+
+from __future__ import annotations
+
+from datetime import timedelta
+import json
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, exists, func, select
+from sqlalchemy.dialects.sqlite import insert
+
+from . import db
+from .models import Bin, BinChange, DataVersion, fill_payloads, utcnow
+from .storage import read_connection
+
+HORIZON = "bin_changes_horizon"
+
+
+def _horizon(conn) -> int:
+    return conn.execute(select(DataVersion.version).where(DataVersion.name == HORIZON)).scalar() or 0
+
+
+def changes_since(since: int, limit: int) -> Optional[str]:
+    """Return up to ``limit`` changes after cursor ``since`` as a JSON document.
+
+    Returns ``None`` when ``since`` lies before the compaction horizon.
+    Stored payloads are spliced into the response without being decoded.
+    """
+    log = BinChange.__table__
+    bins = Bin.__table__
+    query = (
+        select(log.c.id, log.c.bin, log.c.op, log.c.version, log.c.changed_at, bins.c.payload, bins.c.id)
+        .outerjoin(bins, bins.c.bin == log.c.bin)
+        .where(log.c.id > since)
+        .order_by(log.c.id)
+        .limit(limit + 1)
+    )
+    with read_connection() as conn:
+        if since and since < _horizon(conn):
+            return None
+        rows = conn.execute(query).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        stored = {row[1]: row[5] for row in rows if row[6] is not None}
+        payloads = fill_payloads(conn, stored)
+    lines: List[str] = []
+    for cursor, bin_code, op, version, changed_at, _, row_id in rows:
+        data = "null" if op == "delete" or row_id is None else payloads[bin_code]
+        head = json.dumps(
+            {
+                "cursor": cursor,
+                "bin": bin_code,
+                "op": op,
+                "version": version,
+                "changed_at": changed_at.isoformat(timespec="milliseconds") + "Z",
+            }
+        )
+        lines.append(f'{head[:-1]}, "data": {data}}}')
+    next_cursor = rows[-1][0] if rows else since
+    return (
+        f'{{"changes": [{", ".join(lines)}], "next": {next_cursor}, '
+        f'"has_more": {json.dumps(has_more)}}}'
+    )
+
+
+def latest_cursor() -> int:
+    """Return the cursor of the newest logged change, ``0`` for an empty log."""
+    with read_connection() as conn:
+        return conn.execute(select(func.max(BinChange.id))).scalar() or 0
+
+
+def changed_bins(since: int, limit: int) -> Optional[Tuple[int, List[str]]]:
+    """Return the newest cursor and the distinct BINs changed after ``since``.
+
+    Returns ``None`` when ``since`` lies before the compaction horizon or
+    more than ``limit`` changes were logged after it.
+    """
+    log = BinChange.__table__
+    with read_connection() as conn:
+        if since < _horizon(conn):
+            return None
+        rows = conn.execute(
+            select(log.c.id, log.c.bin).where(log.c.id > since).order_by(log.c.id).limit(limit + 1)
+        ).all()
+    if len(rows) > limit:
+        return None
+    return (rows[-1].id if rows else since), list(dict.fromkeys(row.bin for row in rows))
+
+
+def compact_changes(retention_days: float) -> Dict[str, int]:
+    """Drop superseded entries and deletions older than ``retention_days``.
+
+    Returns the number of entries removed of each kind and the new horizon.
+    """
+    log = BinChange.__table__
+    newer = log.alias("newer")
+    cutoff = utcnow() - timedelta(days=retention_days)
+    with db.engine.begin() as conn:
+        superseded = conn.execute(
+            delete(log).where(
+                log.c.changed_at < cutoff,
+                exists().where(newer.c.bin == log.c.bin, newer.c.id > log.c.id),
+            )
+        ).rowcount
+        old_deletes = (log.c.op == "delete", log.c.changed_at < cutoff)
+        last_delete = conn.execute(select(func.max(log.c.id)).where(*old_deletes)).scalar()
+        tombstones = 0
+        if last_delete is not None:
+            tombstones = conn.execute(delete(log).where(*old_deletes)).rowcount
+            stmt = insert(DataVersion.__table__).values(name=HORIZON, version=last_delete)
+            conn.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=["name"],
+                    set_={"version": func.max(DataVersion.__table__.c.version, stmt.excluded.version)},
+                )
+            )
+        horizon = _horizon(conn)
+    return {"superseded": superseded, "deletions": tombstones, "horizon": horizon}
@@ -2,73 +2,138 @@
 
 from __future__ import annotations
 
-from flask import Blueprint, render_template, request, current_app, abort, url_for, redirect
-
-from . import db
-
-from .models import Bin, Submission
+from typing import Any, Dict, Optional
+
+from flask import (
+    Blueprint,
+    render_template,
+    request,
+    current_app,
+    abort,
+    url_for,
+    redirect,
+    make_response,
+)
+
+from .http_cache import add_validators, is_not_modified, not_modified
+from .ingest import record_submission
+from .lookup import BinEntry, find_bin, find_bin_entry, is_valid_bin, is_valid_lookup
 
 frontend_bp = Blueprint("frontend", __name__)
 
 
-@frontend_bp.route("/", methods=["GET", "POST"])
-def index():
-    """Display search form and optionally BIN information."""
-    bin_info = None
-    error = None
-    searched_bin = None
-    if request.method == "POST":
-        bin_code = request.form.get("bin", "").strip()
-        if not bin_code.isdigit() or len(bin_code) != 6:
-            error = "Please enter a valid 6 digit BIN."
-        else:
-            record = Bin.query.filter_by(bin=bin_code).first()
-            if record:
-                bin_info = record.as_dict()
-                # Replace None values with a friendly message
-                for key, value in bin_info.items():
-                    if value is None or value == "":
-                        bin_info[key] = "Not Available"
-                # Hide prepaid-specific fields when not a prepaid card
-                if bin_info.get("category", "").lower() != "prepaid":
-                    for field in ["reloadable", "international", "max_balance", "company"]:
-                        bin_info.pop(field, None)
-            else:
-                error = "BIN not found."
-        searched_bin = bin_code
-    cfg = current_app.config.get("APP_CONFIG", {}).get("frontend", {})
-    colors = {
-        "primary_color": cfg.get("primary_color", "#007BFF"),
-        "secondary_color": cfg.get("secondary_color", "#0056b3"),
-    }
-    site_name = cfg.get("site_name", "BIN Lookup")
-    logo = cfg.get("logo", {})
-    description = cfg.get("description", "")
-    disclaimer_enabled = cfg.get("disclaimer_enabled", False)
-
+def _page_context() -> Dict[str, Any]:
+    """Return template variables from the ``frontend`` config, built once per app."""
+    context = current_app.config.get("FRONTEND_CONTEXT")
+    if context is None:
+        cfg = current_app.config.get("APP_CONFIG", {}).get("frontend", {})
+        context = {
+            "colors": {
+                "primary_color": cfg.get("primary_color", "#007BFF"),
+                "secondary_color": cfg.get("secondary_color", "#0056b3"),
+            },
+            "site_name": cfg.get("site_name", "BIN Lookup"),
+            "logo": cfg.get("logo", {}),
+            "description": cfg.get("description", ""),
+            "disclaimer_enabled": cfg.get("disclaimer_enabled", False),
+        }
+        current_app.config["FRONTEND_CONTEXT"] = context
+    return context
+
+
+def display_info(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Prepare a serialized BIN record for display."""
+    bin_info = dict(data)
+    # Replace None values with a friendly message
+    for key, value in bin_info.items():
+        if value is None or value == "":
+            bin_info[key] = "Not Available"
+    # Hide prepaid-specific fields when not a prepaid card
+    if bin_info.get("category", "").lower() != "prepaid":
+        for field in ["reloadable", "international", "max_balance", "company"]:
+            bin_info.pop(field, None)
+    return bin_info
+
+
+def render_index(
+    bin_info: Optional[Dict[str, Any]] = None,
+    error: Optional[str] = None,
+    searched_bin: Optional[str] = None,
+) -> str:
+    """Render the search page, optionally with a result or an error."""
     return render_template(
         "index.html",
         bin_info=bin_info,
         error=error,
-        colors=colors,
-        site_name=site_name,
-        logo=logo,
-        description=description,
-        disclaimer_enabled=disclaimer_enabled,
         searched_bin=searched_bin,
+        **_page_context(),
     )
 
 
+def render_bin_page(data: Dict[str, Any]) -> str:
+    """Render the result page for a serialized BIN record."""
+    bin_info = display_info(data)
+    return render_index(bin_info=bin_info, searched_bin=bin_info["bin"])
+
+
+def page_etag(entry: BinEntry) -> str:
+    """ETag of a rendered BIN page; changes with the record and on deploys."""
+    return f"{entry.etag}-{current_app.config.get('RENDER_VERSION', '')}"
+
+
+@frontend_bp.route("/", methods=["GET", "POST"])
+def index():
+    """Display the search form and the result of a POSTed search.
+
+    ``GET /?bin=<digits>`` redirects to the cacheable ``/bin/<digits>``
+    permalink.
+    """
+    if request.method == "GET":
+        bin_code = request.args.get("bin", "").strip()
+        if not bin_code:
+            return render_index()
+        if not is_valid_lookup(bin_code):
+            return render_index(error="Please enter a valid 6 to 8 digit BIN or card number.")
+        # Only the BIN part is used for matching; keep card numbers out of URLs
+        return redirect(url_for("frontend.bin_page", bin_code=bin_code[:8]), 301)
+
+    bin_code = request.form.get("bin", "").strip()
+    if not is_valid_lookup(bin_code):
+        return render_index(error="Please enter a valid 6 to 8 digit BIN or card number.")
+    entry = find_bin_entry(bin_code)
+    if entry is None:
+        # Never echo more than the BIN part of a card number
+        return render_index(error="BIN not found.", searched_bin=bin_code[:8])
+    return render_bin_page(entry.data)
+
+
+@frontend_bp.get("/bin/<bin_code>")
+def bin_page(bin_code: str):
+    """Permalink for a BIN, with validators so browsers and CDNs can cache it."""
+    if not is_valid_lookup(bin_code):
+        return render_index(error="Please enter a valid 6 to 8 digit BIN or card number."), 404
+    if len(bin_code) > 8:
+        return redirect(url_for("frontend.bin_page", bin_code=bin_code[:8]), 301)
+    entry = find_bin_entry(bin_code)
+    if entry is None:
+        return render_index(error="BIN not found.", searched_bin=bin_code), 404
+    etag = page_etag(entry)
+    if is_not_modified(etag, entry.updated_at):
+        return not_modified(etag, entry.updated_at, "frontend")
+    response = make_response(render_bin_page(entry.data))
+    return add_validators(response, etag, entry.updated_at, "frontend")
+
+
 @frontend_bp.route("/report/<bin_code>", methods=["GET", "POST"])
 def report(bin_code: str):
     """Allow users to submit corrections for a BIN."""
-    if not bin_code.isdigit() or len(bin_code) != 6:
+    if not is_valid_bin(bin_code):
         abort(404)
 
-    record = Bin.query.filter_by(bin=bin_code).first()
-    bin_info = record.as_dict() if record else {}
+    bin_info = find_bin(bin_code) or {}
 
     message = None
+    status = 200
     if request.method == "POST":
         fields = [
             "category",
@@ -89,39 +154,31 @@ def report(bin_code: str):
                 data["max_balance"] = int(data["max_balance"])
             except ValueError:
                 data["max_balance"] = None
-        submission = Submission(bin=bin_code, **data)
-        db.session.add(submission)
-        db.session.commit()
-        return redirect(url_for("frontend.report", bin_code=bin_code, message="1"))
-
-    message_flag = request.args.get("message")
-    if message_flag:
+        data["bin"] = bin_code
+        status = record_submission(data)
+        if status < 400:
+            return redirect(url_for("frontend.report", bin_code=bin_code, message="1"))
+        message = "We are receiving too many submissions right now. Please try again shortly."
+    elif request.args.get("message"):
         message = "Thank you for your submission."
 
-    cfg = current_app.config.get("APP_CONFIG", {}).get("frontend", {})
-    colors = {
-        "primary_color": cfg.get("primary_color", "#007BFF"),
-        "secondary_color": cfg.get("secondary_color", "#0056b3"),
-    }
-    return render_template(
-        "report.html", bin_code=bin_code, colors=colors, message=message, bin_info=bin_info
+    html = render_template(
+        "report.html",
+        bin_code=bin_code,
+        colors=_page_context()["colors"],
+        message=message,
+        bin_info=bin_info,
     )
+    return html, status
 
 
 @frontend_bp.route("/api-docs")
 def api_docs():
     """Render API documentation for public endpoints."""
-    cfg = current_app.config.get("APP_CONFIG", {}).get("frontend", {})
-    colors = {
-        "primary_color": cfg.get("primary_color", "#007BFF"),
-        "secondary_color": cfg.get("secondary_color", "#0056b3"),
-    }
-    site_name = cfg.get("site_name", "BIN Lookup")
+    context = _page_context()
     domain = current_app.config.get("APP_CONFIG", {}).get("custom_domain")
     if not domain:
         domain = request.host_url.rstrip("/")
     return render_template(
-        "api_docs.html", colors=colors, site_name=site_name, domain=domain
+        "api_docs.html", colors=context["colors"], site_name=context["site_name"], domain=domain
     )
-
-
@@ -0,0 +1,63 @@
+"""HTTP validators and ``Cache-Control`` handling for BIN responses."""
+
+from __future__ import annotations
+
+from datetime import datetime, timezone
+import hashlib
+import json
+from pathlib import Path
+from typing import Optional
+
+from flask import Flask, Response, current_app, request
+
+DEFAULT_CACHE_CONTROL = {
+    "api": "private, max-age=60",
+    "frontend": "public, max-age=300",
+}
+
+
+def compute_render_version(app: Flask) -> str:
+    """Fingerprint the config and templates so HTML ETags change on deploy."""
+    digest = hashlib.sha1(
+        json.dumps(app.config.get("APP_CONFIG", {}), sort_keys=True).encode("utf-8")
+    )
+    for template in sorted(Path(app.root_path, "templates").glob("*.html")):
+        digest.update(template.read_bytes())
+    return digest.hexdigest()[:10]
+
+
+def cache_control(kind: str) -> str:
+    """Return the configured ``Cache-Control`` value for ``api`` or ``frontend``."""
+    cfg = current_app.config.get("APP_CONFIG", {}).get("http_cache", {})
+    return cfg.get(kind, DEFAULT_CACHE_CONTROL[kind])
+
+
+def _aware(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def is_not_modified(etag: str, last_modified: Optional[datetime]) -> bool:
+    """Return ``True`` if the request's validators match the current version."""
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    since = request.if_modified_since
+    modified = _aware(last_modified)
+    return bool(since and modified and modified <= since)
+
+
+def add_validators(
+    response: Response, etag: str, last_modified: Optional[datetime], kind: str
+) -> Response:
+    """Attach ``ETag``, ``Last-Modified`` and ``Cache-Control`` headers."""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = _aware(last_modified)
+    response.headers["Cache-Control"] = cache_control(kind)
+    return response
+
+
+def not_modified(etag: str, last_modified: Optional[datetime], kind: str) -> Response:
+    """Build an empty ``304 Not Modified`` response carrying the validators."""
+    return add_validators(Response(status=304), etag, last_modified, kind)
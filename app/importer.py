@@ -0,0 +1,391 @@
+"""Streaming import pipeline for binlist-style BIN datasets.
+
+Rows flow through generators (read -> normalize -> chunk) and are upserted
+in one transaction per chunk, so memory use does not grow with input size.
+"""
+
+from __future__ import annotations
+
+import csv
+import gzip
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, List, Optional
+
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.dialects.sqlite import insert
+
+from . import db
+from .models import Bin, encode_payload, utcnow
+from .prefix_index import key_range
+
+BIN_COLUMNS = [
+    "bin",
+    "range_start",
+    "range_end",
+    "category",
+    "reloadable",
+    "international",
+    "max_balance",
+    "company",
+    "country",
+    "customer_service",
+    "distributor",
+    "issuer",
+    "type",
+    "website_url",
+]
+
+# Source keys tried in order for every column. Nested JSON objects are
+# flattened with ``_`` first, so binlist.net's ``bank.name`` becomes ``bank_name``.
+FIELD_ALIASES: Dict[str, List[str]] = {
+    "bin": ["bin", "iin", "bin_code"],
+    "range_start": ["range_start", "iin_start"],
+    "range_end": ["range_end", "iin_end"],
+    "category": ["category"],
+    "reloadable": ["reloadable"],
+    "international": ["international"],
+    "max_balance": ["max_balance"],
+    "company": ["company"],
+    "country": ["alpha_3", "country_alpha3", "country", "alpha_2", "country_alpha2", "country_name"],
+    "customer_service": ["customer_service", "bank_phone", "phone"],
+    "distributor": ["distributor"],
+    "issuer": ["issuer", "bank_name", "bank"],
+    "type": ["type"],
+    "website_url": ["website_url", "bank_url", "url"],
+}
+
+CATEGORIES = {"debit": "Debit", "credit": "Credit", "prepaid": "Prepaid"}
+
+READ_CHUNK = 65536
+
+
+def open_input(path: str) -> IO[str]:
+    """Open ``path`` for text reading; ``-`` is stdin and ``.gz`` is decompressed."""
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def detect_format(path: str) -> str:
+    """Guess the input format from the file extension."""
+    suffixes = [suffix.lower() for suffix in Path(path).suffixes if suffix.lower() != ".gz"]
+    suffix = suffixes[-1] if suffixes else ""
+    if suffix in {".ndjson", ".jsonl"}:
+        return "ndjson"
+    if suffix == ".json":
+        return "json"
+    return "csv"
+
+
+def iter_csv(handle: IO[str]) -> Iterator[Dict[str, Any]]:
+    """Yield CSV rows as dictionaries keyed by the header row."""
+    yield from csv.DictReader(handle)
+
+
+def iter_ndjson(handle: IO[str]) -> Iterator[Dict[str, Any]]:
+    """Yield one JSON object per non-empty line."""
+    for line in handle:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_json_array(handle: IO[str]) -> Iterator[Dict[str, Any]]:
+    """Yield the objects of a top-level JSON array without loading it whole."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    eof = False
+    started = False
+    while True:
+        buffer = buffer.lstrip()
+        if not started:
+            if not buffer and not eof:
+                chunk = handle.read(READ_CHUNK)
+                eof = not chunk
+                buffer += chunk
+                continue
+            if not buffer.startswith("["):
+                raise ValueError("JSON input must be an array of objects")
+            buffer = buffer[1:]
+            started = True
+            continue
+        if buffer.startswith(","):
+            buffer = buffer[1:]
+            continue
+        if buffer.startswith("]"):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = handle.read(READ_CHUNK)
+            eof = not chunk
+            buffer += chunk
+            continue
+        buffer = buffer[end:]
+        yield item
+
+
+READERS: Dict[str, Callable[[IO[str]], Iterator[Dict[str, Any]]]] = {
+    "csv": iter_csv,
+    "ndjson": iter_ndjson,
+    "json": iter_json_array,
+}
+
+
+def _flatten(row: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+    flat: Dict[str, Any] = {}
+    for key, value in row.items():
+        name = f"{prefix}{str(key).strip().lower()}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}_"))
+        else:
+            flat[name] = value
+    return flat
+
+
+def _clean(value: Any) -> Any:
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+
+def _to_int(value: Any) -> Optional[int]:
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return int(str(value).replace(",", "").replace("$", "").split(".")[0])
+    except ValueError:
+        return None
+
+
+def _key_bound(value: Any, side: int) -> Optional[int]:
+    """Map an IIN range bound of any length onto the eight digit key space.
+
+    ``side`` 0 gives the first key starting with the bound's digits and 1
+    the last, so ``400119`` as an end covers up to ``40011999``.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    digits = "".join(ch for ch in str(value).split(".")[0] if ch.isdigit())
+    return key_range(digits)[side] if digits else None
+
+
+def _truthy(value: Any) -> bool:
+    return str(value).strip().lower() in {"1", "true", "yes", "y"}
+
+
+def _digits(value: Any) -> str:
+    return "".join(ch for ch in str(value or "") if ch.isdigit())
+
+
+def normalize_row(raw: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Map a source row onto ``Bin`` columns.
+
+    Rows without a BIN, such as those of binlist/data's ``ranges.csv``, are
+    stored under the start of their range, padded to six digits. Returns
+    ``None`` if the row has no valid BIN or an explicit range that does not
+    cover it.
+    """
+    flat = _flatten(raw)
+    row: Dict[str, Any] = {}
+    for column, aliases in FIELD_ALIASES.items():
+        row[column] = next(
+            (_clean(flat[alias]) for alias in aliases if _clean(flat.get(alias)) is not None),
+            None,
+        )
+
+    code = _digits(row["bin"])
+    if not code and row["range_start"] is not None:
+        code = _digits(str(row["range_start"]).split(".")[0]).ljust(6, "0")
+        if row["range_end"] is None:
+            # A range given by its start alone covers every key it prefixes
+            row["range_end"] = row["range_start"]
+    if not 6 <= len(code) <= 8:
+        return None
+    row["bin"] = code
+    row["max_balance"] = _to_int(row["max_balance"])
+    own_start, own_end = key_range(code)
+    start, end = _key_bound(row["range_start"], 0), _key_bound(row["range_end"], 1)
+    if start is None or end is None:
+        start, end = own_start, own_end
+    elif start > end or start > own_start or end < own_end:
+        # The range must cover the BIN it is stored under
+        return None
+    row["range_start"], row["range_end"] = start, end
+
+    if row["type"]:
+        row["type"] = str(row["type"]).title()
+    category = str(row["category"] or "").lower()
+    if _truthy(flat.get("prepaid")) or category == "prepaid":
+        row["category"] = "Prepaid"
+    elif category in CATEGORIES:
+        row["category"] = CATEGORIES[category]
+    elif row["type"] in {"Debit", "Credit"}:
+        row["category"] = row["type"]
+    if row["company"] is None:
+        row["company"] = row["issuer"]
+    if row["distributor"] is None and row["category"] != "Prepaid":
+        row["distributor"] = row["company"]
+    if row["country"]:
+        row["country"] = str(row["country"]).upper()
+    return row
+
+
+def chunked(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Group ``rows`` into lists of at most ``size`` items."""
+    chunk: List[Dict[str, Any]] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def upsert_statement(table=None, merge: bool = False):
+    """Build an ``INSERT ... ON CONFLICT(bin) DO UPDATE`` statement.
+
+    With ``merge`` set, empty incoming values keep the stored ones instead of
+    clearing them.
+    """
+    table = Bin.__table__ if table is None else table
+    stmt = insert(table)
+    updates = {}
+    for column in BIN_COLUMNS:
+        if column == "bin":
+            continue
+        incoming = stmt.excluded[column]
+        updates[column] = func.coalesce(incoming, table.c[column]) if merge else incoming
+    updates["version"] = table.c.version + 1
+    updates["updated_at"] = stmt.excluded.updated_at
+    # Merged rows are re-encoded by ``rebuild_payloads`` after the upsert
+    updates["payload"] = None if merge else stmt.excluded.payload
+    return stmt.on_conflict_do_update(index_elements=["bin"], set_=updates)
+
+
+def import_rows(
+    rows: Iterable[Dict[str, Any]],
+    chunk_size: int = 5000,
+    merge: bool = False,
+    table=None,
+    progress: Optional[Callable[[int, int, float], None]] = None,
+) -> Dict[str, Any]:
+    """Normalize and upsert ``rows`` in chunked transactions.
+
+    ``progress`` is called after every chunk with the number of rows written,
+    the number of rows skipped and the elapsed seconds.
+    """
+    stmt = upsert_statement(table, merge)
+    counts = {"written": 0, "skipped": 0}
+
+    def normalized() -> Iterator[Dict[str, Any]]:
+        for raw in rows:
+            row = normalize_row(raw)
+            if row is None:
+                counts["skipped"] += 1
+                continue
+            yield row
+
+    started = time.perf_counter()
+    for chunk in chunked(normalized(), chunk_size):
+        now = utcnow()
+        for row in chunk:
+            row["payload"] = encode_payload({column: row[column] for column in BIN_COLUMNS})
+            row["updated_at"] = now
+        with db.engine.begin() as conn:
+            conn.execute(stmt, chunk)
+            if merge:
+                rebuild_payloads(conn, table, [row["bin"] for row in chunk])
+        counts["written"] += len(chunk)
+        if progress:
+            progress(counts["written"], counts["skipped"], time.perf_counter() - started)
+    elapsed = time.perf_counter() - started
+    return {
+        "written": counts["written"],
+        "skipped": counts["skipped"],
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(counts["written"] / elapsed) if elapsed else 0,
+    }
+
+
+def rebuild_payloads(
+    conn,
+    table=None,
+    bins: Optional[List[str]] = None,
+    batch_size: int = 5000,
+    commit: bool = False,
+    missing_only: bool = False,
+) -> int:
+    """Re-encode the stored JSON payload of ``bins``, or of every row.
+
+    Rows are processed one batch at a time on the given connection; with
+    ``commit`` set each batch is committed on its own so the write lock is
+    held only briefly. ``missing_only`` skips rows that have a payload.
+    Returns the number of rows rewritten.
+    """
+    table = Bin.__table__ if table is None else table
+    columns = [table.c[column] for column in BIN_COLUMNS]
+    update = (
+        table.update()
+        .where(table.c.id == bindparam("row_id"))
+        .values(payload=bindparam("new_payload"))
+    )
+    if bins is not None:
+        batches = (bins[offset : offset + batch_size] for offset in range(0, len(bins), batch_size))
+    else:
+        batches = None
+    rewritten = 0
+    last_id = 0
+    while True:
+        query = select(table.c.id, *columns)
+        if batches is not None:
+            wanted = next(batches, None)
+            if wanted is None:
+                break
+            query = query.where(table.c.bin.in_(wanted))
+        else:
+            query = query.where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+        if missing_only:
+            query = query.where(table.c.payload.is_(None))
+        rows = conn.execute(query).mappings().all()
+        if not rows and batches is None:
+            break
+        params = []
+        for row in rows:
+            data = dict(row)
+            row_id = data.pop("id")
+            last_id = max(last_id, row_id)
+            params.append({"row_id": row_id, "new_payload": encode_payload(data)})
+        if params:
+            conn.execute(update, params)
+            if commit:
+                conn.commit()
+        rewritten += len(params)
+    return rewritten
+
+
+def import_file(path: str, fmt: Optional[str] = None, **kwargs: Any) -> Dict[str, Any]:
+    """Stream ``path`` through :func:`import_rows`."""
+    reader = READERS[fmt or detect_format(path)]
+    handle = open_input(path)
+    try:
+        return import_rows(reader(handle), **kwargs)
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+
+def print_progress(written: int, skipped: int, elapsed: float, stream: IO[str] = sys.stderr) -> None:
+    """Print a one-line progress report with the current throughput."""
+    rate = written / elapsed if elapsed else 0.0
+    stream.write(f"\r{written} rows imported, {skipped} skipped, {rate:,.0f} rows/s")
+    stream.flush()
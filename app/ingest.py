@@ -0,0 +1,214 @@
+"""Buffered, group-committed ingestion of user submissions.
+
+Public report endpoints put submissions on a bounded in-process queue. A
+background writer drains it, drops identical duplicates and inserts each
+batch in a single transaction, so a burst of reports costs one fsync per
+batch instead of one per report. Clients were already told their report
+was accepted, so a batch that fails to commit (the writer connection is
+busy, ``SQLITE_BUSY``) is retried with exponential backoff before it is
+given up on.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import queue
+from threading import Event, Lock, Thread
+import time
+from typing import Any, Dict, List, Optional
+
+from flask import Flask, current_app
+
+from . import db
+from .metrics import HistogramVec, registry
+from .models import Submission, utcnow
+
+logger = logging.getLogger(__name__)
+
+COMMIT_LATENCY = registry.register(
+    HistogramVec(
+        "submission_commit_seconds",
+        "Time taken to write one batch of queued submissions.",
+        [],
+    )
+)
+
+
+class SubmissionQueue:
+    """Bounded queue of submission rows drained by a single writer thread."""
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        batch_size: int = 500,
+        max_delay: float = 0.2,
+        max_retries: int = 5,
+        retry_delay: float = 0.1,
+    ) -> None:
+        self._lock = Lock()
+        # Guards the counters, which request threads and the writer update
+        self._counts_lock = Lock()
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(max_size)
+        self._stopping = Event()
+        self._thread: Optional[Thread] = None
+        self._engine = None
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.commit_latency = COMMIT_LATENCY.labels()
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.collapsed = 0
+        self.retried = 0
+        self.failed = 0
+
+    def configure(
+        self,
+        max_size: int,
+        batch_size: int,
+        max_delay: float,
+        max_retries: int = 5,
+        retry_delay: float = 0.1,
+    ) -> None:
+        """Apply new limits; only allowed before the writer has started."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._queue = queue.Queue(max_size)
+            self.batch_size = max(1, batch_size)
+            self.max_delay = max_delay
+            self.max_retries = max(0, max_retries)
+            self.retry_delay = retry_delay
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stopping.is_set()
+
+    def start(self, app: Flask) -> None:
+        """Start the writer thread for ``app`` unless it is already running."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            with app.app_context():
+                self._engine = db.engine
+            self._stopping.clear()
+            self._thread = Thread(target=self._run, name="submission-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def submit(self, values: Dict[str, Any]) -> bool:
+        """Queue one submission row; return ``False`` if the queue is full."""
+        try:
+            self._queue.put_nowait(values)
+        except queue.Full:
+            self._count(rejected=1)
+            return False
+        self._count(accepted=1)
+        return True
+
+    def _count(self, **amounts: int) -> None:
+        with self._counts_lock:
+            for name, amount in amounts.items():
+                setattr(self, name, getattr(self, name) + amount)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Flush queued submissions and stop the writer."""
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+
+    def _run(self) -> None:
+        while not (self._stopping.is_set() and self._queue.empty()):
+            try:
+                first = self._queue.get(timeout=self.max_delay)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        unique: Dict[tuple, Dict[str, Any]] = {}
+        for values in batch:
+            key = tuple(sorted((k, v) for k, v in values.items() if k != "created_at"))
+            unique.setdefault(key, values)
+        rows = list(unique.values())
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                with self._engine.begin() as conn:
+                    conn.execute(Submission.__table__.insert(), rows)
+            except Exception:
+                if attempt == self.max_retries:
+                    self._count(failed=len(rows))
+                    logger.exception(
+                        "Failed to write %d queued submissions after %d attempts",
+                        len(rows),
+                        attempt + 1,
+                    )
+                    return
+                delay = self.retry_delay * 2**attempt
+                logger.warning(
+                    "Failed to write %d queued submissions, retrying in %.1fs",
+                    len(rows),
+                    delay,
+                    exc_info=True,
+                )
+                self._count(retried=1)
+                time.sleep(delay)
+                continue
+            self.commit_latency.observe(time.perf_counter() - started)
+            self._count(written=len(rows), collapsed=len(batch) - len(rows))
+            return
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth, throughput counters and commit latency."""
+        return {
+            "running": self.running,
+            "depth": self._queue.qsize(),
+            "max_size": self._queue.maxsize,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "written": self.written,
+            "collapsed": self.collapsed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "commit_latency": self.commit_latency.summary(),
+        }
+
+
+submission_queue = SubmissionQueue()
+
+
+def record_submission(values: Dict[str, Any]) -> int:
+    """Store a submission for the current app and return an HTTP status.
+
+    With the queue enabled this answers 202 once the row is queued, 429 when
+    the queue is full and 503 when the writer is not running. With it
+    disabled the row is committed immediately and 201 is returned.
+    """
+    app = current_app._get_current_object()
+    values = {**values, "created_at": utcnow()}
+    cfg = app.config.get("APP_CONFIG", {}).get("submissions", {})
+    if not cfg.get("queue_enabled", True):
+        db.session.add(Submission(**values))
+        db.session.commit()
+        return 201
+    submission_queue.start(app)
+    if not submission_queue.running:
+        return 503
+    if not submission_queue.submit(values):
+        return 429
+    return 202
@@ -0,0 +1,289 @@
+"""Shared BIN read path used by the API, frontend and Telegram bot."""
+
+from __future__ import annotations
+
+from datetime import datetime
+import json
+from threading import Lock
+import time
+from typing import Any, Dict, NamedTuple, Optional
+
+from flask import current_app
+
+from . import db
+from .cache import bin_cache
+from .changes import changed_bins, latest_cursor
+from .models import Bin, DataVersion, encode_payload, payload_digest
+from .prefix_index import key_range, prefix_index
+from .presence import bin_presence
+from .snapshot import bin_snapshot, read_versions
+from .storage import read_connection
+
+_index_lock = Lock()
+_presence_lock = Lock()
+
+
+class WriterSync:
+    """Drop cached lookups when another process has written to ``bins``.
+
+    Every write bumps ``data_versions.bins`` through a trigger. At most once
+    per ``interval`` seconds a reader compares it with the last value seen
+    and, when it moved, clears the lookup cache and patches the prefix index
+    and presence bitmap with the BINs logged in ``bin_changes`` since the
+    last check. More than ``max_patch`` changes, or a cursor the log was
+    compacted past, drop both for a rebuild instead. On the first check the
+    bitmap is compared with the value it was built from, since it may have
+    been loaded in the server master before the workers were forked. The
+    compiled snapshot, if enabled, is re-checked against the same value and
+    the database id. A negative interval disables the check after the first
+    one, for single-process deployments.
+    """
+
+    def __init__(self, interval: float = 0.5) -> None:
+        self._lock = Lock()
+        self.interval = interval
+        self.checked = 0.0
+        self.version: Optional[int] = None
+        # ``bin_changes`` id up to which changes were applied
+        self.cursor = 0
+        self.max_patch = 100
+
+    def check(self) -> None:
+        if self.version is not None and (
+            self.interval < 0 or time.monotonic() - self.checked < self.interval
+        ):
+            return
+        # Readers that find a check in progress carry on with what they have
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            generation = bin_snapshot.generation
+            if self.version is None:
+                # Read before the version: a write in between is applied
+                # again on the next check rather than missed
+                self.cursor = latest_cursor()
+            with read_connection() as conn:
+                database_id, version = read_versions(conn)
+            if self.version is None:
+                if bin_presence.data_version not in (None, version):
+                    bin_presence.invalidate()
+            elif version != self.version:
+                bin_cache.clear()
+                self._apply_changes()
+            self.version = version
+            self.checked = time.monotonic()
+            bin_snapshot.refresh(current_app._get_current_object(), version, generation, database_id)
+        finally:
+            self._lock.release()
+
+    def _apply_changes(self) -> None:
+        changed = changed_bins(self.cursor, self.max_patch)
+        if changed is None:
+            self.cursor = latest_cursor()
+            prefix_index.invalidate()
+            bin_presence.invalidate()
+            return
+        self.cursor, codes = changed
+        for code in codes:
+            _update_ranges(code)
+
+
+writer_sync = WriterSync()
+
+
+class BinEntry(NamedTuple):
+    """Pre-encoded BIN record together with its write version."""
+
+    bin: str
+    payload: str
+    version: int
+    updated_at: Optional[datetime]
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        """Decode the payload into a fresh dictionary the caller may modify."""
+        return json.loads(self.payload)
+
+    @property
+    def etag(self) -> str:
+        """Strong entity tag identifying this version of the record.
+
+        Includes a digest of the payload: a BIN deleted and created again
+        starts over at version 1 but must not match validators of the old
+        record.
+        """
+        return f"{self.bin}-{self.version}-{payload_digest(self.payload)}"
+
+
+def is_valid_bin(bin_code: str) -> bool:
+    """Return ``True`` if ``bin_code`` can be stored as a BIN (6-8 digits)."""
+    return bin_code.isdigit() and 6 <= len(bin_code) <= 8
+
+
+def is_valid_lookup(value: str) -> bool:
+    """Return ``True`` if ``value`` is a 6-8 digit BIN or a full card number."""
+    return value.isdigit() and 6 <= len(value) <= 19
+
+
+def _ensure_index() -> None:
+    """Rebuild the prefix index from the database if it is dirty.
+
+    That is before the first lookup and after a bulk write by another
+    process; single writes patch it in place, see :func:`bin_changed`.
+    """
+    if not prefix_index.dirty:
+        return
+    with _index_lock:
+        if not prefix_index.dirty:
+            return
+        version = prefix_index.version
+        query = (
+            db.select(Bin.range_start, Bin.range_end, Bin.bin)
+            .where(Bin.range_start.isnot(None), Bin.range_end.isnot(None))
+            .order_by(Bin.range_start, Bin.range_end.desc())
+        )
+        with read_connection() as conn:
+            rows = conn.execute(query.execution_options(yield_per=10000))
+            prefix_index.build(rows, version)
+
+
+def load_presence() -> None:
+    """Rebuild the presence bitmap from the database if it is dirty.
+
+    Called at startup so misses are rejected from the first request; later
+    rebuilds happen on the lookup path. Readers that find a rebuild in
+    progress do without the bitmap rather than wait for it.
+    """
+    if not bin_presence.enabled or not bin_presence.dirty:
+        return
+    if not _presence_lock.acquire(blocking=False):
+        return
+    try:
+        version = bin_presence.version
+        query = db.select(Bin.range_start, Bin.range_end).where(
+            Bin.range_start.isnot(None), Bin.range_end.isnot(None)
+        )
+        with read_connection() as conn:
+            # Read before the rows: a write in between only makes the
+            # recorded version look older, which triggers another rebuild
+            data_version = conn.execute(
+                db.select(DataVersion.version).where(DataVersion.name == "bins")
+            ).scalar()
+            rows = conn.execute(query.execution_options(yield_per=10000))
+            bin_presence.build(rows, version, data_version)
+    finally:
+        _presence_lock.release()
+
+
+def _excluded(value: str) -> bool:
+    """Return ``True`` if the presence bitmap proves ``value`` has no match."""
+    load_presence()
+    return bin_presence.excludes(value)
+
+
+def _update_ranges(bin_code: str) -> None:
+    """Patch the prefix index and presence bitmap after ``bin_code`` was inserted or deleted."""
+    with read_connection() as conn:
+        row = conn.execute(
+            db.select(Bin.range_start, Bin.range_end).where(Bin.bin == bin_code)
+        ).first()
+        if row is not None and row.range_start is not None and row.range_end is not None:
+            prefix_index.put(bin_code, row.range_start, row.range_end)
+            if bin_presence.enabled:
+                bin_presence.add(row.range_start, row.range_end)
+            return
+        prefix_index.discard(bin_code)
+        if not bin_presence.enabled:
+            return
+        # Deleted: recompute its prefixes from the ranges still overlapping them
+        low, high = key_range(bin_code)
+        block_low, block_high = low - low % 100, high - high % 100 + 99
+        remaining = conn.execute(
+            db.select(Bin.range_start, Bin.range_end).where(
+                Bin.range_start <= block_high, Bin.range_end >= block_low
+            )
+        ).all()
+    bin_presence.reset(block_low, block_high, remaining)
+
+
+def match_bin(value: str) -> Optional[str]:
+    """Return the stored BIN that most specifically covers ``value``."""
+    if not is_valid_lookup(value):
+        return None
+    writer_sync.check()
+    if _excluded(value):
+        return None
+    snapshot = bin_snapshot.current()
+    if snapshot is not None:
+        position = snapshot.match(value)
+        return None if position is None else snapshot.bin_at(position)
+    _ensure_index()
+    return prefix_index.match(value)
+
+
+def find_bin_entry(value: str) -> Optional[BinEntry]:
+    """Return the cached entry for the record most specifically covering ``value``.
+
+    The entry is shared with other readers and must not be modified.
+    """
+    if not is_valid_lookup(value):
+        return None
+    writer_sync.check()
+    if _excluded(value):
+        return None
+    token = bin_cache.token()
+    snapshot = bin_snapshot.current()
+    if snapshot is not None:
+        position = snapshot.match(value)
+        if position is None:
+            return None
+        bin_code = snapshot.bin_at(position)
+        cached = bin_cache.get(bin_code)
+        if cached is not None:
+            return cached
+        entry = BinEntry(*snapshot.record(position))
+        bin_cache.set(bin_code, entry, token)
+        return entry
+    bin_code = match_bin(value)
+    if bin_code is None:
+        return None
+    cached = bin_cache.get(bin_code)
+    if cached is not None:
+        return cached
+    token = bin_cache.token()
+    with read_connection() as conn:
+        row = conn.execute(
+            db.select(Bin.payload, Bin.version, Bin.updated_at).where(Bin.bin == bin_code)
+        ).first()
+    if row is None:
+        return None
+    payload = row.payload
+    if payload is None:
+        # Row written before payloads existed; see ``manage.py rebuild-payloads``
+        record = Bin.query.filter_by(bin=bin_code).first()
+        payload = encode_payload(record.as_dict())
+    entry = BinEntry(bin_code, payload, row.version or 1, row.updated_at)
+    bin_cache.set(bin_code, entry, token)
+    return entry
+
+
+def find_bin(value: str) -> Optional[Dict[str, Any]]:
+    """Return the most specific serialized BIN record for ``value`` or ``None``.
+
+    ``value`` may be a 6-8 digit BIN or a full card number. The returned
+    dictionary is a copy and may be modified by the caller.
+    """
+    entry = find_bin_entry(value)
+    return entry.data if entry else None
+
+
+def bin_changed(bin_code: str, reindex: bool = True) -> None:
+    """Invalidate read-side state after ``bin_code`` was written and committed.
+
+    Pass ``reindex=False`` when only descriptive fields changed and the set of
+    stored BIN ranges is unaffected.
+    """
+    bin_cache.invalidate(bin_code)
+    bin_snapshot.invalidate(current_app._get_current_object())
+    if reindex:
+        _update_ranges(bin_code)
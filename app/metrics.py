@@ -0,0 +1,367 @@
+"""Lightweight in-process metrics with Prometheus text exposition.
+
+Under ``serve.py`` every process also writes its samples to a file of its
+own (see :class:`SampleFiles`), and ``/metrics`` merges those of all
+workers and the bot process into one exposition.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+import json
+import logging
+import os
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, Prometheus style; the implicit last bucket is +Inf
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+# ``(name_suffix, labels, value)`` as produced by a family's ``samples()``
+Sample = Tuple[str, Dict[str, Any], float]
+
+
+class Histogram:
+    """Thread-safe histogram of observed durations."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self._lock = Lock()
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """Record one observation."""
+        position = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self._counts[position] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """Return ``(upper_bound, cumulative_count)`` pairs ending with ``+Inf``."""
+        with self._lock:
+            counts = list(self._counts)
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q: float) -> float:
+        """Estimate the ``q`` quantile as the upper bound of its bucket."""
+        buckets = self.cumulative()
+        total = buckets[-1][1]
+        if not total:
+            return 0.0
+        target = q * total
+        for bound, count in buckets:
+            if count >= target:
+                return bound
+        return buckets[-1][0]
+
+    def summary(self) -> Dict[str, float]:
+        """Return count, mean and bucket-resolution p50/p95/p99 in milliseconds."""
+        count = self.count
+        return {
+            "count": count,
+            "mean_ms": round(self.sum / count * 1000, 3) if count else 0.0,
+            "p50_ms": self.quantile(0.5) * 1000,
+            "p95_ms": self.quantile(0.95) * 1000,
+            "p99_ms": self.quantile(0.99) * 1000,
+        }
+
+
+class HistogramVec:
+    """Family of histograms sharing a name and distinguished by label values."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = Lock()
+        self._children: Dict[Tuple[str, ...], Histogram] = {}
+
+    def labels(self, *values: str) -> Histogram:
+        """Return the histogram for ``values``, creating it on first use."""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, Histogram(self.buckets))
+        return child
+
+    def items(self) -> Iterator[Tuple[Tuple[str, ...], Histogram]]:
+        """Iterate over ``(label_values, histogram)`` pairs."""
+        with self._lock:
+            children = list(self._children.items())
+        return iter(children)
+
+    def samples(self) -> Iterator[Sample]:
+        for values, histogram in self.items():
+            labels = dict(zip(self.labelnames, values))
+            for bound, count in histogram.cumulative():
+                yield "_bucket", {**labels, "le": _format_value(bound)}, count
+            yield "_sum", labels, histogram.sum
+            yield "_count", labels, histogram.count
+
+
+class CounterVec:
+    """Family of monotonically increasing counters distinguished by label values."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *values: str, amount: float = 1) -> None:
+        """Add ``amount`` to the counter for ``values``."""
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def samples(self) -> Iterator[Sample]:
+        with self._lock:
+            values = list(self._values.items())
+        for label_values, value in values:
+            yield "", dict(zip(self.labelnames, label_values)), value
+
+
+class CallbackMetric:
+    """Gauge or counter whose samples are read from ``collect`` at scrape time.
+
+    ``collect`` returns ``(label_values, value)`` pairs, so existing counters
+    elsewhere in the app can be exposed without double bookkeeping.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], Iterable[Tuple[Tuple[str, ...], float]]],
+        kind: str = "gauge",
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+        self.kind = kind
+
+    def samples(self) -> Iterator[Sample]:
+        for label_values, value in self.collect():
+            yield "", dict(zip(self.labelnames, label_values)), value
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value) if isinstance(value, float) else str(int(value))
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class Registry:
+    """Collection of metric families exposed together."""
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._families: Dict[str, Any] = {}
+
+    def register(self, family: Any) -> Any:
+        """Add ``family``, returning an already registered one of the same name."""
+        with self._lock:
+            return self._families.setdefault(family.name, family)
+
+    def families(self) -> List[Any]:
+        with self._lock:
+            return list(self._families.values())
+
+    def render(self) -> str:
+        """Return every family in the Prometheus text exposition format."""
+        return _render(
+            (family.name, family.documentation, family.kind, family.samples())
+            for family in self.families()
+        )
+
+
+def _render(families: Iterable[Tuple[str, str, str, Iterable[Sample]]]) -> str:
+    lines: List[str] = []
+    for name, documentation, kind, samples in families:
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} {kind}")
+        for suffix, labels, value in samples:
+            lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SampleFiles:
+    """Samples of every process of a prefork deployment, merged at scrape time.
+
+    Each process writes its samples to ``<directory>/<pid>.json`` every
+    ``interval`` seconds and when it stops. :meth:`render` combines this
+    process's live samples with the latest files of the others: counters
+    and histograms are summed, so they keep counting what exited workers
+    served, and gauges get a ``pid`` label and are dropped once their
+    process is gone. Without a directory only this process is rendered.
+    """
+
+    def __init__(self, registry: Registry) -> None:
+        self.registry = registry
+        self.directory: Optional[Path] = None
+        self.interval = 1.0
+        self._pid: Optional[int] = None
+        self._stopping = Event()
+        self._thread: Optional[Thread] = None
+
+    def configure(self, directory: Optional[Path], interval: float = 1.0) -> None:
+        """Share samples through ``directory``, or only render this process for ``None``."""
+        self.directory = directory
+        self.interval = interval
+
+    def clear(self) -> None:
+        """Remove the files of earlier runs, before any process starts writing."""
+        if self.directory is None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for path in self.directory.glob("*.json"):
+            path.unlink(missing_ok=True)
+
+    def start(self) -> None:
+        """Start writing this process's samples, once per process."""
+        if self.directory is None or self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._stopping.clear()
+        self._thread = Thread(target=self._run, name="metrics-samples", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the writer thread and write the final samples."""
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and self._pid == os.getpid():
+            thread.join(self.interval + 5)
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.interval):
+            self.write()
+        self.write()
+
+    def _families(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": family.name,
+                "documentation": family.documentation,
+                "kind": family.kind,
+                "samples": list(family.samples()),
+            }
+            for family in self.registry.families()
+        ]
+
+    def write(self) -> None:
+        """Replace this process's file with its current samples."""
+        if self.directory is None:
+            return
+        families = self._families()
+        path = self.directory / f"{os.getpid()}.json"
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        try:
+            tmp_path.write_text(json.dumps({"families": families}), encoding="utf-8")
+            os.replace(tmp_path, path)
+        except OSError:
+            logger.exception("Could not write metric samples to %s", path)
+
+    def render(self) -> str:
+        """Return the samples of every process in the Prometheus text format."""
+        if self.directory is None:
+            return self.registry.render()
+        pid = os.getpid()
+        merged: Dict[str, Dict[str, Any]] = {}
+
+        def add(source: int, families: Iterable[Dict[str, Any]], running: bool) -> None:
+            for family in families:
+                entry = merged.setdefault(family["name"], {**family, "samples": {}})
+                gauge = entry["kind"] == "gauge"
+                if gauge and not running:
+                    continue
+                for suffix, labels, value in family["samples"]:
+                    if gauge:
+                        labels = {**labels, "pid": source}
+                    key = (suffix, tuple(labels.items()))
+                    entry["samples"][key] = entry["samples"].get(key, 0) + value
+
+        add(pid, self._families(), True)
+        for path in sorted(self.directory.glob("*.json")):
+            try:
+                source = int(path.stem)
+            except ValueError:
+                continue
+            if source == pid:
+                continue
+            try:
+                families = json.loads(path.read_text(encoding="utf-8"))["families"]
+            except (OSError, ValueError, KeyError):
+                continue
+            add(source, families, _running(source))
+        return _render(
+            (
+                name,
+                entry["documentation"],
+                entry["kind"],
+                ((suffix, dict(labels), value) for (suffix, labels), value in entry["samples"].items()),
+            )
+            for name, entry in merged.items()
+        )
+
+
+registry = Registry()
+sample_files = SampleFiles(registry)
@@ -1,9 +1,16 @@
 """Database models for the BIN lookup application."""  # :contentReference[oaicite:0]{index=0}
 
 from __future__ import annotations
-from typing import Optional
+from datetime import date, datetime, timezone
+import hashlib
+import json
+from typing import Any, Dict, Mapping, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import object_session
 
 from . import db
+from .prefix_index import key_range
 
 
 class Bin(db.Model):
@@ -12,7 +19,10 @@ class Bin(db.Model):
     __tablename__ = "bins"
 
     id: int = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    bin: str = db.Column(db.String(6), unique=True, nullable=False)
+    bin: str = db.Column(db.String(8), unique=True, nullable=False)
+    # Inclusive bounds in the eight digit key space, derived from ``bin`` when unset
+    range_start: Optional[int] = db.Column(db.Integer, nullable=True, index=True)
+    range_end: Optional[int] = db.Column(db.Integer, nullable=True)
     category: Optional[str] = db.Column(db.String(50), nullable=True)
     reloadable: Optional[str] = db.Column(db.String(50), nullable=True)
     international: Optional[str] = db.Column(db.String(50), nullable=True)
@@ -24,23 +34,109 @@ class Bin(db.Model):
     issuer: Optional[str] = db.Column(db.String(100), nullable=True)
     type: Optional[str] = db.Column(db.String(50), nullable=True)
     website_url: Optional[str] = db.Column(db.String(200), nullable=True)
+    # Bumped on every write; used for HTTP validators and cache keys
+    version: int = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    updated_at: Optional[datetime] = db.Column(db.DateTime, nullable=True)
+    # Pre-encoded JSON of ``as_dict()``, rebuilt on every write
+    payload: Optional[str] = db.Column(db.Text, nullable=True)
+
+    # Bookkeeping and lookup columns left out of the public representation
+    internal_columns = frozenset(
+        {"id", "range_start", "range_end", "version", "updated_at", "payload"}
+    )
 
     def as_dict(self) -> dict:
-        """Return a dictionary representation of the BIN record without the internal ID."""
+        """Return a dictionary representation of the BIN record without internal columns."""
         return {
             column.name: getattr(self, column.name)
             for column in self.__table__.columns
-            if column.name != "id"
+            if column.name not in self.internal_columns
         }
 
 
+# Exact, case-insensitive filters of attribute search (see ``app.search``);
+# rows come out of these in id order, which the search cursor relies on
+db.Index(
+    "ix_bins_country_category_type",
+    Bin.country.collate("NOCASE"),
+    Bin.category.collate("NOCASE"),
+    Bin.type.collate("NOCASE"),
+)
+db.Index("ix_bins_category_type", Bin.category.collate("NOCASE"), Bin.type.collate("NOCASE"))
+
+
+def encode_payload(data: Mapping[str, Any]) -> str:
+    """Encode a serialized BIN record the way it is served by the API.
+
+    Internal columns in ``data`` are left out.
+    """
+    public = {key: value for key, value in data.items() if key not in Bin.internal_columns}
+    return json.dumps(public, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def fill_payloads(conn, payloads: Dict[str, Optional[str]]) -> Dict[str, str]:
+    """Encode the payloads missing from ``payloads``, a ``{bin: payload}`` dict.
+
+    Rows written without the ORM, or before payloads were stored, have
+    none; they are read back with one query on ``conn`` and encoded.
+    Returns ``payloads``, updated in place.
+    """
+    missing = [code for code, payload in payloads.items() if payload is None]
+    if missing:
+        table = Bin.__table__
+        columns = [column for column in table.columns if column.name not in Bin.internal_columns]
+        for row in conn.execute(select(*columns).where(table.c.bin.in_(missing))).mappings():
+            payloads[row["bin"]] = encode_payload(row)
+    return payloads
+
+
+def payload_digest(payload: str) -> str:
+    """Return a short fingerprint of an encoded record, for validators and manifests."""
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def utcnow() -> datetime:
+    """Return the current UTC time as a naive datetime, as stored in SQLite."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+@event.listens_for(Bin, "before_insert")
+def _before_insert(mapper, connection, target: Bin) -> None:
+    """Derive range bounds and stamp the first version of a new record."""
+    if target.bin and (target.range_start is None or target.range_end is None):
+        target.range_start, target.range_end = key_range(target.bin)
+    target.version = target.version or 1
+    target.updated_at = utcnow()
+    target.payload = encode_payload(target.as_dict())
+
+
+@event.listens_for(Bin, "before_update")
+def _before_update(mapper, connection, target: Bin) -> None:
+    """Bump the version of a record whose columns actually changed."""
+    session = object_session(target)
+    if session is not None and not session.is_modified(target, include_collections=False):
+        return
+    if target.bin and (target.range_start is None or target.range_end is None):
+        target.range_start, target.range_end = key_range(target.bin)
+    target.version = (target.version or 0) + 1
+    target.updated_at = utcnow()
+    target.payload = encode_payload(target.as_dict())
+
+
 class Submission(db.Model):
     """User submitted BIN corrections."""
 
     __tablename__ = "submissions"
+    # Composite indexes back the admin filters; SQLite appends ``id`` to each,
+    # so they also serve the ``(created_at, id)`` keyset order
+    __table_args__ = (
+        db.Index("ix_submissions_bin_created_at", "bin", "created_at"),
+        db.Index("ix_submissions_country_created_at", "country", "created_at"),
+        db.Index("ix_submissions_category_created_at", "category", "created_at"),
+    )
 
     id: int = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    bin: str = db.Column(db.String(6), nullable=False)
+    bin: str = db.Column(db.String(8), nullable=False)
     category: Optional[str] = db.Column(db.String(50), nullable=True)
     reloadable: Optional[str] = db.Column(db.String(50), nullable=True)
     international: Optional[str] = db.Column(db.String(50), nullable=True)
@@ -52,6 +148,7 @@ class Submission(db.Model):
     issuer: Optional[str] = db.Column(db.String(100), nullable=True)
     type: Optional[str] = db.Column(db.String(50), nullable=True)
     website_url: Optional[str] = db.Column(db.String(200), nullable=True)
+    created_at: Optional[datetime] = db.Column(db.DateTime, nullable=True, default=utcnow, index=True)
 
     def as_dict(self) -> dict:
         """Return a dict representation of the submission."""
@@ -60,3 +157,64 @@ class Submission(db.Model):
             for column in self.__table__.columns
             if column.name != "id"
         }
+
+
+class DataVersion(db.Model):
+    """Per-table change counters bumped by triggers, see ``app.schema.TRIGGERS``.
+
+    Other processes poll these to notice writes they did not make themselves.
+    """
+
+    __tablename__ = "data_versions"
+
+    name: str = db.Column(db.String(50), primary_key=True)
+    version: int = db.Column(db.Integer, nullable=False, default=0)
+
+
+class BinChange(db.Model):
+    """One insert, update or delete of a ``bins`` row, see ``app.schema.CHANGE_LOG``.
+
+    Rows are written by triggers, so every writer is covered, and read back
+    in ``id`` order by ``GET /api/bins/changes``.
+    """
+
+    __tablename__ = "bin_changes"
+    __table_args__ = (
+        db.Index("ix_bin_changes_bin_id", "bin", "id"),
+        # Never reuse the id of a compacted row, clients use ids as cursors
+        {"sqlite_autoincrement": True},
+    )
+
+    id: int = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    bin: str = db.Column(db.String(8), nullable=False)
+    # ``insert``, ``update`` or ``delete``
+    op: str = db.Column(db.String(6), nullable=False)
+    version: Optional[int] = db.Column(db.Integer, nullable=True)
+    changed_at: datetime = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class BinStat(db.Model):
+    """Number of BINs per attribute value, and of pending submissions.
+
+    Kept current by triggers (see ``app.schema.STATS``) so reading the
+    summary never scans ``bins`` or ``submissions``. Missing values are
+    counted under ``""``.
+    """
+
+    __tablename__ = "bin_stats"
+    __table_args__ = (db.Index("ix_bin_stats_dimension_count", "dimension", "count"),)
+
+    # ``total``, ``country``, ``category``, ``type``, ``issuer`` or ``submissions``
+    dimension: str = db.Column(db.String(20), primary_key=True)
+    value: str = db.Column(db.String(100), primary_key=True)
+    count: int = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ApiKeyUsage(db.Model):
+    """Requests served per API key and UTC day, flushed from memory in batches."""
+
+    __tablename__ = "api_key_usage"
+
+    key_name: str = db.Column(db.String(100), primary_key=True)
+    day: date = db.Column(db.Date, primary_key=True)
+    requests: int = db.Column(db.Integer, nullable=False, default=0)
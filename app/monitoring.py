@@ -0,0 +1,208 @@
+"""Request, SQL and resource metrics exposed at ``/metrics``.
+
+Instrumentation is a couple of ``perf_counter`` calls and one locked bucket
+increment per request or statement, cheap enough to leave enabled under
+full load. The state and lifetime counters of connection pools, the
+submission queue, the lookup cache, the BIN snapshot and the presence
+bitmap are read only when ``/metrics`` is scraped. The endpoint only
+answers clients in ``metrics.allowed_networks``.
+"""
+
+from __future__ import annotations
+
+from ipaddress import ip_address, ip_network
+import time
+from typing import Any, Callable, Dict, Iterator, Sequence, Tuple
+
+from flask import Flask, Response, current_app, g, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import db
+from .cache import bin_cache
+from .ingest import submission_queue
+from .metrics import CallbackMetric, CounterVec, Histogram, HistogramVec, registry, sample_files
+from .presence import bin_presence
+from .snapshot import bin_snapshot
+
+REQUEST_LATENCY = registry.register(
+    HistogramVec(
+        "http_request_duration_seconds",
+        "Time spent in Flask views until the response is returned.",
+        ["blueprint", "endpoint", "method"],
+    )
+)
+REQUESTS = registry.register(
+    CounterVec(
+        "http_requests_total",
+        "HTTP requests served, by endpoint and status code.",
+        ["blueprint", "endpoint", "method", "status"],
+    )
+)
+SQL_LATENCY = registry.register(
+    HistogramVec(
+        "sql_statement_seconds",
+        "Time spent executing SQL statements, by engine and statement type.",
+        ["bind", "statement"],
+    )
+)
+
+SQL_VERBS = {"select", "insert", "update", "delete", "with", "pragma"}
+
+# Clients allowed to scrape ``/metrics`` unless ``metrics.allowed_networks`` is set
+DEFAULT_METRICS_NETWORKS = ["127.0.0.0/8", "::1/128"]
+
+# Engines of the app being monitored, keyed by bind label
+_engines: Dict[str, Engine] = {}
+
+
+def _bind_label(key) -> str:
+    return "writer" if key is None else str(key)
+
+
+def _before_request() -> None:
+    g._metrics_started = time.perf_counter()
+
+
+def _after_request(response: Response) -> Response:
+    started = g.pop("_metrics_started", None)
+    if started is None:
+        return response
+    blueprint = request.blueprint or "app"
+    endpoint = request.endpoint or "unmatched"
+    REQUEST_LATENCY.labels(blueprint, endpoint, request.method).observe(time.perf_counter() - started)
+    REQUESTS.inc(blueprint, endpoint, request.method, str(response.status_code))
+    return response
+
+
+def _instrument_engine(engine: Engine, bind: str) -> None:
+    histograms: Dict[str, Histogram] = {}
+
+    # The start time lives on the execution context, which is dropped with a
+    # statement that raises, rather than on a per-connection stack that
+    # only ``after_cursor_execute`` would pop
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        elapsed = time.perf_counter() - context._metrics_started
+        words = statement.split(None, 1)
+        verb = words[0].lower() if words else "other"
+        if verb not in SQL_VERBS:
+            verb = "other"
+        histogram = histograms.get(verb)
+        if histogram is None:
+            histogram = histograms.setdefault(verb, SQL_LATENCY.labels(bind, verb))
+        histogram.observe(elapsed)
+
+
+def _pool_stats() -> Iterator[Tuple[Tuple[str, str], float]]:
+    for bind, engine in _engines.items():
+        pool = engine.pool
+        for name in ("size", "checkedout", "overflow", "checkedin"):
+            method = getattr(pool, name, None)
+            if method is not None:
+                yield (bind, name), method()
+
+
+def _stats(
+    stats: Callable[[], Dict[str, Any]], names: Sequence[str]
+) -> Callable[[], Iterator[Tuple[Tuple[str], float]]]:
+    def collect() -> Iterator[Tuple[Tuple[str], float]]:
+        values = stats()
+        for name in names:
+            yield (name,), values[name]
+
+    return collect
+
+
+def _register_stats(
+    name: str,
+    stats: Callable[[], Dict[str, Any]],
+    gauges: Sequence[str],
+    gauge_help: str,
+    counters: Sequence[str],
+    counter_help: str,
+) -> None:
+    """Expose the state in ``stats()`` as gauge ``name`` and its totals as counter ``name_total``."""
+    registry.register(CallbackMetric(name, gauge_help, ["stat"], _stats(stats, gauges)))
+    registry.register(
+        CallbackMetric(
+            f"{name}_total", counter_help, ["stat"], _stats(stats, counters), kind="counter"
+        )
+    )
+
+
+registry.register(
+    CallbackMetric("db_pool_connections", "SQLAlchemy pool state per engine.", ["bind", "state"], _pool_stats)
+)
+_register_stats(
+    "submission_queue",
+    submission_queue.stats,
+    ["depth"],
+    "Submissions waiting to be written.",
+    ["accepted", "rejected", "written", "collapsed", "retried", "failed"],
+    "Submissions accepted, rejected, written, collapsed, retried and failed.",
+)
+_register_stats(
+    "lookup_cache",
+    bin_cache.stats,
+    ["size"],
+    "Entries in the lookup cache.",
+    ["hits", "misses", "evictions", "invalidations"],
+    "Lookup cache hits, misses, evictions and invalidations.",
+)
+_register_stats(
+    "bin_snapshot",
+    bin_snapshot.stats,
+    ["records", "data_version", "usable"],
+    "Mapped BIN snapshot records, data version and whether it is in use.",
+    ["rebuilds"],
+    "BIN snapshot rebuilds.",
+)
+_register_stats(
+    "bin_presence",
+    bin_presence.stats,
+    ["prefixes", "usable"],
+    "Prefixes set in the presence bitmap and whether it is in use.",
+    ["rejected", "rebuilds"],
+    "Lookups the presence bitmap answered as not found, and its rebuilds.",
+)
+
+
+def metrics() -> Response:
+    """Serve every registered metric in the Prometheus text format.
+
+    Under ``serve.py`` the samples of the other processes are merged in,
+    see :class:`~app.metrics.SampleFiles`.
+    """
+    try:
+        client = ip_address(request.remote_addr or "")
+    except ValueError:
+        return jsonify({"error": "Forbidden"}), 403
+    # IPv4 clients of a dual-stack socket arrive as ``::ffff:a.b.c.d``
+    client = getattr(client, "ipv4_mapped", None) or client
+    if not any(client in network for network in current_app.config["METRICS_NETWORKS"]):
+        return jsonify({"error": "Forbidden"}), 403
+    return Response(sample_files.render(), mimetype="text/plain; version=0.0.4")
+
+
+def init_metrics(app: Flask) -> None:
+    """Instrument ``app`` and its engines and register the ``/metrics`` route."""
+    cfg = app.config.get("APP_CONFIG", {}).get("metrics", {})
+    app.config["METRICS_NETWORKS"] = [
+        ip_network(network, strict=False)
+        for network in cfg.get("allowed_networks", DEFAULT_METRICS_NETWORKS)
+    ]
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    with app.app_context():
+        engines = dict(db.engines)
+    _engines.clear()
+    for key, engine in engines.items():
+        bind = _bind_label(key)
+        _engines[bind] = engine
+        _instrument_engine(engine, bind)
+    app.add_url_rule("/metrics", "metrics", metrics)
@@ -0,0 +1,138 @@
+"""Batch card number (PAN) validation, brand detection and BIN lookup.
+
+Luhn checks and IIN brand detection run over a whole batch at once as
+NumPy array operations. Full card numbers only ever
+live in memory for the duration of a call: results carry a masked number
+(first six and last four digits) and nothing here logs or stores them.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+from .lookup import match_bin
+from .models import Bin, fill_payloads
+from .storage import read_connection
+
+PAN_MIN_DIGITS = 12
+PAN_MAX_DIGITS = 19
+
+# IIN ranges on the first six digits, most specific first; the first match wins
+BRAND_RANGES: Tuple[Tuple[str, int, int], ...] = (
+    ("amex", 340000, 349999),
+    ("amex", 370000, 379999),
+    ("diners", 300000, 305999),
+    ("diners", 309500, 309599),
+    ("diners", 360000, 369999),
+    ("diners", 380000, 399999),
+    ("jcb", 352800, 358999),
+    ("visa", 400000, 499999),
+    ("mir", 220000, 220499),
+    ("mastercard", 222100, 272099),
+    ("mastercard", 510000, 559999),
+    ("discover", 601100, 601199),
+    ("discover", 622126, 622925),
+    ("discover", 644000, 659999),
+    ("unionpay", 620000, 629999),
+    ("maestro", 500000, 509999),
+    ("maestro", 560000, 589999),
+    ("maestro", 639000, 639999),
+    ("maestro", 670000, 679999),
+)
+
+_SEPARATORS = re.compile(r"[\s-]")
+
+
+class PanResult(NamedTuple):
+    """Outcome for one card number of a batch, without the full number."""
+
+    masked: Optional[str]
+    valid: bool
+    brand: Optional[str]
+    bin: Optional[str]
+    payload: Optional[str]
+
+
+def normalize(pan: str) -> Optional[str]:
+    """Return ``pan`` without spaces and dashes if it is 12-19 digits, else ``None``."""
+    digits = _SEPARATORS.sub("", pan)
+    if digits.isdigit() and PAN_MIN_DIGITS <= len(digits) <= PAN_MAX_DIGITS:
+        return digits
+    return None
+
+
+def mask(digits: str) -> str:
+    """Keep the first six and last four digits of a card number."""
+    return f"{digits[:6]}{'*' * (len(digits) - 10)}{digits[-4:]}"
+
+
+def check_numbers(numbers: List[str]) -> Tuple[List[bool], List[Optional[str]]]:
+    """Return the Luhn validity and brand of already normalized card numbers."""
+    if not numbers:
+        return [], []
+    count = len(numbers)
+    # Right-aligned for Luhn: padding zeros on the left do not change the sum
+    right = np.frombuffer(
+        "".join(number.rjust(PAN_MAX_DIGITS, "0") for number in numbers).encode("ascii"),
+        dtype=np.uint8,
+    ).reshape(count, PAN_MAX_DIGITS) - 48
+    doubled = right[:, -2::-2] * 2
+    doubled = np.where(doubled > 9, doubled - 9, doubled)
+    total = right[:, ::-2].sum(axis=1, dtype=np.int64) + doubled.sum(axis=1, dtype=np.int64)
+    valid = total % 10 == 0
+
+    prefixes = np.frombuffer(
+        "".join(number[:6] for number in numbers).encode("ascii"), dtype=np.uint8
+    ).reshape(count, 6) - 48
+    prefix = prefixes.astype(np.int64) @ np.array([100000, 10000, 1000, 100, 10, 1], dtype=np.int64)
+    brand_index = np.full(count, -1, dtype=np.int64)
+    for position, (_, low, high) in reversed(list(enumerate(BRAND_RANGES))):
+        brand_index[(prefix >= low) & (prefix <= high)] = position
+    brands = [BRAND_RANGES[index][0] if index >= 0 else None for index in brand_index.tolist()]
+    return valid.tolist(), brands
+
+
+def check_pans(pans: Sequence[str], chunk_size: int = 500) -> Iterator[List[PanResult]]:
+    """Validate ``pans`` and join them to their most specific BIN record.
+
+    Yields results in input order, ``chunk_size`` at a time. Each chunk
+    resolves its distinct BINs with a single query.
+    """
+    normalized = [normalize(pan) for pan in pans]
+    numbers = [number for number in normalized if number is not None]
+    valid, brands = check_numbers(numbers)
+    checked = iter(zip(valid, brands))
+    for offset in range(0, len(normalized), chunk_size):
+        chunk = normalized[offset : offset + chunk_size]
+        matches: Dict[int, Optional[str]] = {}
+        outcome: List[Tuple[bool, Optional[str]]] = []
+        for position, number in enumerate(chunk):
+            if number is None:
+                outcome.append((False, None))
+                continue
+            outcome.append(next(checked))
+            matches[position] = match_bin(number)
+        wanted = {code for code in matches.values() if code is not None}
+        found: Dict[str, Optional[str]] = {}
+        if wanted:
+            with read_connection() as conn:
+                rows = conn.execute(select(Bin.bin, Bin.payload).where(Bin.bin.in_(wanted)))
+                found = fill_payloads(conn, dict(rows.all()))
+        results = []
+        for position, number in enumerate(chunk):
+            is_valid, brand = outcome[position]
+            code = matches.get(position)
+            results.append(
+                PanResult(
+                    masked=mask(number) if number is not None else None,
+                    valid=is_valid,
+                    brand=brand,
+                    bin=code if code in found else None,
+                    payload=found.get(code) if code is not None else None,
+                )
+            )
+        yield results
@@ -0,0 +1,191 @@
+"""Longest-prefix-match index over BIN ranges.
+
+Every ``Bin`` row covers an inclusive range of eight digit keys: a six digit
+BIN ``123456`` covers ``12345600``-``12345699`` while an eight digit BIN covers
+exactly one key. Imported datasets may also store explicit ``range_start`` and
+``range_end`` bounds. Ranges are expected to nest like prefixes do, so the most
+specific match for a key is the innermost range containing it.
+"""
+
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_right
+from threading import Lock
+from typing import Iterable, List, Optional, Tuple
+
+KEY_DIGITS = 8
+
+
+def key_range(digits: str) -> Tuple[int, int]:
+    """Return the inclusive key range covered by a 6-8 digit prefix.
+
+    Longer inputs such as full card numbers are truncated to their first
+    :data:`KEY_DIGITS` digits.
+    """
+    prefix = digits[:KEY_DIGITS]
+    return int(prefix.ljust(KEY_DIGITS, "0")), int(prefix.ljust(KEY_DIGITS, "9"))
+
+
+class PrefixIndex:
+    """Sorted interval index answering most-specific-range queries.
+
+    Intervals are kept sorted by ``(start, -end)`` and each one records how
+    many positions back its nearest enclosing interval is (``0`` for none).
+    A query bisects to the last interval starting at or before the key and
+    walks up the enclosing chain, which is at most a few steps deep for
+    prefix data.
+
+    Single BINs are added and removed with :meth:`put` and :meth:`discard`.
+    Relative links only change inside the enclosing ranges of the affected
+    position, so a change relinks that neighbourhood instead of rebuilding
+    the whole index.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._starts = array("q")
+        self._ends = array("q")
+        self._gaps = array("q")
+        self._bins: List[str] = []
+        self._version = 1
+        self._built_version = 0
+        self.rebuilds = 0
+
+    @property
+    def version(self) -> int:
+        """Counter bumped by :meth:`invalidate`, passed back to :meth:`build`."""
+        return self._version
+
+    @property
+    def dirty(self) -> bool:
+        return self._built_version != self._version
+
+    def __len__(self) -> int:
+        return len(self._bins)
+
+    def invalidate(self) -> None:
+        """Mark the index for rebuilding before the next query."""
+        with self._lock:
+            self._version += 1
+
+    def build(self, rows: Iterable[Tuple[int, int, str]], version: Optional[int] = None) -> None:
+        """Replace the index with ``(range_start, range_end, bin)`` rows.
+
+        ``version`` should be read before querying the rows so an invalidation
+        that races with the rebuild keeps the index dirty.
+        """
+        ordered = sorted(rows, key=lambda row: (row[0], -row[1]))
+        starts = array("q")
+        ends = array("q")
+        gaps = array("q")
+        bins: List[str] = []
+        stack: List[int] = []
+        for position, (start, end, code) in enumerate(ordered):
+            while stack and ends[stack[-1]] < start:
+                stack.pop()
+            gaps.append(position - stack[-1] if stack else 0)
+            stack.append(position)
+            starts.append(start)
+            ends.append(end)
+            bins.append(code)
+        with self._lock:
+            self._starts, self._ends, self._gaps, self._bins = starts, ends, gaps, bins
+            self._built_version = self._version if version is None else version
+            self.rebuilds += 1
+
+    def put(self, code: str, start: int, end: int) -> None:
+        """Add BIN ``code`` covering keys ``start``-``end``, replacing its old range."""
+        with self._lock:
+            self._change(lambda: self._splice(code, (start, end)))
+
+    def discard(self, code: str) -> None:
+        """Remove BIN ``code`` if it is indexed."""
+        with self._lock:
+            self._change(lambda: self._splice(code, None))
+
+    def _change(self, apply) -> None:
+        # A clean index is patched and stays clean, a dirty one is left to
+        # the rebuild, which must not end clean if it started before this
+        # change.
+        clean = not self.dirty
+        self._version += 1
+        if clean:
+            apply()
+            self._built_version = self._version
+
+    def _find(self, code: str) -> Optional[int]:
+        """Return the position of BIN ``code``, or ``None`` if it is not indexed."""
+        # A BIN's range covers its own keys, so it is on the enclosing
+        # chain of its first key, a few steps from the bisection
+        position = bisect_right(self._starts, key_range(code)[0]) - 1
+        while position >= 0:
+            if self._bins[position] == code:
+                return position
+            gap = self._gaps[position]
+            position = position - gap if gap else -1
+        return None
+
+    def _splice(self, code: str, interval: Optional[Tuple[int, int]]) -> None:
+        """Move ``code`` to ``interval``, or remove it for ``None``, in place.
+
+        Called with the lock held, which :meth:`match` holds too.
+        """
+        starts, ends, gaps, bins = self._starts, self._ends, self._gaps, self._bins
+        position = self._find(code)
+        if position is not None:
+            limit = ends[position]
+            del starts[position], ends[position], gaps[position], bins[position]
+            _relink(starts, ends, gaps, position, limit)
+        if interval is not None:
+            start, end = interval
+            position = bisect_right(starts, start)
+            while position > 0 and starts[position - 1] == start and ends[position - 1] < end:
+                position -= 1
+            starts.insert(position, start)
+            ends.insert(position, end)
+            gaps.insert(position, 0)
+            bins.insert(position, code)
+            _relink(starts, ends, gaps, position, end)
+
+    def match(self, digits: str) -> Optional[str]:
+        """Return the BIN of the most specific range covering ``digits``."""
+        low, high = key_range(digits)
+        with self._lock:
+            starts, ends, gaps = self._starts, self._ends, self._gaps
+            position = bisect_right(starts, low) - 1
+            while position >= 0:
+                if ends[position] >= high:
+                    return self._bins[position]
+                gap = gaps[position]
+                position = position - gap if gap else -1
+        return None
+
+
+def _relink(starts: array, ends: array, gaps: array, position: int, limit: int) -> None:
+    """Recompute the links of the intervals from ``position`` on after a change.
+
+    ``limit`` is the end of the interval inserted or removed at ``position``.
+    Only intervals starting inside it or inside one of the ranges enclosing
+    ``position`` can have had their nearest enclosing interval change; the
+    walk starts from the enclosing chain of the interval before ``position``,
+    which is the stack :meth:`PrefixIndex.build` would hold there.
+    """
+    stack: List[int] = []
+    previous = position - 1
+    while previous >= 0:
+        stack.append(previous)
+        limit = max(limit, ends[previous])
+        gap = gaps[previous]
+        previous = previous - gap if gap else -1
+    stack.reverse()
+    while position < len(starts) and starts[position] <= limit:
+        start = starts[position]
+        while stack and ends[stack[-1]] < start:
+            stack.pop()
+        gaps[position] = position - stack[-1] if stack else 0
+        stack.append(position)
+        position += 1
+
+
+prefix_index = PrefixIndex()
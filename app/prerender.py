@@ -0,0 +1,106 @@
+"""Pre-render BIN permalink pages to static HTML files.
+
+Pages are written as ``<output>/bin/<bin>.html`` so a web server can answer
+``/bin/<bin>`` without touching the app. ``<output>/manifest.json`` records
+a digest of the record each page was rendered from; later runs only
+re-render BINs whose record changed and delete pages of removed BINs. A change to
+the templates or config (the app's ``RENDER_VERSION``) re-renders all pages.
+"""
+
+from __future__ import annotations
+
+import calendar
+import json
+import os
+from pathlib import Path
+import time
+from typing import Any, Callable, Dict, Optional
+
+from flask import current_app
+from sqlalchemy import select
+
+from .frontend import render_bin_page
+from .models import Bin, fill_payloads, payload_digest
+from .storage import read_connection
+
+MANIFEST = "manifest.json"
+
+
+def _load_manifest(output: Path) -> Dict[str, Any]:
+    try:
+        with open(output / MANIFEST, "r", encoding="utf-8") as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_atomic(path: Path, content: str) -> None:
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as tmp_file:
+        tmp_file.write(content)
+    os.replace(tmp_path, path)
+
+
+def prerender(
+    output: Path,
+    full: bool = False,
+    batch_size: int = 5000,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, Any]:
+    """Bring the static pages under ``output`` up to date with the ``bins`` table.
+
+    Must run inside an application context. Returns counts of rendered,
+    unchanged and removed pages.
+    """
+    started = time.perf_counter()
+    pages_dir = output / "bin"
+    pages_dir.mkdir(parents=True, exist_ok=True)
+    render_version = current_app.config.get("RENDER_VERSION", "")
+    manifest = _load_manifest(output)
+    if full or manifest.get("render_version") != render_version:
+        previous: Dict[str, str] = {}
+    else:
+        previous = manifest.get("pages", {})
+    stale = set(manifest.get("pages", {}))
+    pages: Dict[str, str] = {}
+    rendered = unchanged = 0
+
+    query = select(Bin.bin, Bin.payload, Bin.updated_at).execution_options(yield_per=batch_size)
+    with current_app.test_request_context(), read_connection() as conn:
+        for partition in conn.execute(query).partitions():
+            payloads = fill_payloads(conn, {row.bin: row.payload for row in partition})
+            for bin_code, _, updated_at in partition:
+                stale.discard(bin_code)
+                payload = payloads[bin_code]
+                # Keyed on content, not version: a re-created BIN starts over at 1
+                digest = payload_digest(payload)
+                pages[bin_code] = digest
+                path = pages_dir / f"{bin_code}.html"
+                if previous.get(bin_code) == digest and path.exists():
+                    unchanged += 1
+                    continue
+                _write_atomic(path, render_bin_page(json.loads(payload)))
+                if updated_at is not None:
+                    # Lets the web server send a matching Last-Modified
+                    mtime = calendar.timegm(updated_at.timetuple())
+                    os.utime(path, (mtime, mtime))
+                rendered += 1
+                if progress and rendered % batch_size == 0:
+                    progress(rendered, unchanged)
+
+    for bin_code in stale:
+        try:
+            (pages_dir / f"{bin_code}.html").unlink()
+        except FileNotFoundError:
+            pass
+
+    _write_atomic(
+        output / MANIFEST,
+        json.dumps({"render_version": render_version, "pages": pages}, separators=(",", ":")),
+    )
+    return {
+        "rendered": rendered,
+        "unchanged": unchanged,
+        "removed": len(stale),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
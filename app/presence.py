@@ -0,0 +1,155 @@
+"""Existence bitmap over six digit BIN prefixes.
+
+One bit per six digit prefix (1,000,000 bits, 125 KB) records whether any
+stored range overlaps the keys starting with that prefix. A range covering
+a lookup always overlaps the block of the lookup's first six digits, so a
+clear bit proves a miss for BINs and full card numbers alike and lookups
+can answer "not found" without querying anything. A set bit only means a
+match is possible; the prefix index or snapshot then decides.
+"""
+
+from __future__ import annotations
+
+from threading import Lock
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+PREFIX_DIGITS = 6
+# Eight digit keys per six digit prefix, see ``app.prefix_index.KEY_DIGITS``
+BLOCK = 100
+SIZE = 10**PREFIX_DIGITS
+
+
+def _fill(bits: bytearray, first: int, last: int, value: bool) -> None:
+    """Set or clear bits ``first``-``last`` inclusive."""
+    while first <= last and first % 8:
+        _put(bits, first, value)
+        first += 1
+    while last >= first and (last + 1) % 8:
+        _put(bits, last, value)
+        last -= 1
+    if first <= last:
+        bits[first // 8 : (last + 1) // 8] = (b"\xff" if value else b"\x00") * ((last + 1 - first) // 8)
+
+
+def _put(bits: bytearray, position: int, value: bool) -> None:
+    if value:
+        bits[position >> 3] |= 1 << (position & 7)
+    else:
+        bits[position >> 3] &= ~(1 << (position & 7)) & 0xFF
+
+
+def _blocks(start: int, end: int) -> Tuple[int, int]:
+    """Return the first and last prefix overlapped by keys ``start``-``end``."""
+    return max(0, start // BLOCK), min(SIZE - 1, end // BLOCK)
+
+
+class PresenceBitmap:
+    """Bitset of six digit prefixes overlapped by at least one stored range.
+
+    Built from every ``(range_start, range_end)`` pair and then updated in
+    place as BINs are written. Like :class:`~app.prefix_index.PrefixIndex`
+    it carries a version: :meth:`invalidate` marks it dirty and a dirty
+    bitmap rejects nothing until it has been rebuilt.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._bits = bytearray(SIZE // 8)
+        self._version = 1
+        self._built_version = 0
+        self.enabled = True
+        # ``data_versions.bins`` the bitmap was last built from
+        self.data_version: Optional[int] = None
+        self.rejected = 0
+        self.rebuilds = 0
+
+    @property
+    def version(self) -> int:
+        """Counter bumped by every change, passed back to :meth:`build`."""
+        return self._version
+
+    @property
+    def dirty(self) -> bool:
+        return self._built_version != self._version
+
+    def invalidate(self) -> None:
+        """Mark the bitmap for rebuilding before it is used again."""
+        with self._lock:
+            self._version += 1
+
+    def build(
+        self, ranges: Iterable[Tuple[int, int]], version: int, data_version: Optional[int] = None
+    ) -> None:
+        """Replace the bitmap with the prefixes overlapped by ``ranges``.
+
+        ``version`` should be read before querying the ranges so a change
+        that races with the rebuild keeps the bitmap dirty. ``data_version``
+        is the database's ``data_versions.bins`` the ranges were read at.
+        """
+        bits = bytearray(SIZE // 8)
+        for start, end in ranges:
+            first, last = _blocks(start, end)
+            if first == last:
+                bits[first >> 3] |= 1 << (first & 7)
+            else:
+                _fill(bits, first, last, True)
+        with self._lock:
+            self._bits = bits
+            self._built_version = version
+            self.data_version = data_version
+            self.rebuilds += 1
+
+    def add(self, start: int, end: int) -> None:
+        """Record a stored range covering keys ``start``-``end``."""
+        with self._lock:
+            self._change(lambda bits: _fill(bits, *_blocks(start, end), True))
+
+    def reset(self, start: int, end: int, ranges: Iterable[Tuple[int, int]]) -> None:
+        """Recompute the prefixes of keys ``start``-``end`` after a deletion.
+
+        ``ranges`` are the stored ranges still overlapping those keys.
+        """
+        first, last = _blocks(start, end)
+        remaining = [_blocks(*pair) for pair in ranges]
+        with self._lock:
+
+            def apply(bits: bytearray) -> None:
+                _fill(bits, first, last, False)
+                for low, high in remaining:
+                    _fill(bits, max(first, low), min(last, high), True)
+
+            self._change(apply)
+
+    def _change(self, apply) -> None:
+        # A clean bitmap is patched in place and stays clean; a dirty one is
+        # about to be rebuilt, and bumping the version makes a rebuild that
+        # is already running, and may have missed this change, stay dirty.
+        clean = not self.dirty
+        self._version += 1
+        if clean:
+            apply(self._bits)
+            self._built_version = self._version
+
+    def excludes(self, digits: str) -> bool:
+        """Return ``True`` if no stored range can cover ``digits``."""
+        if not self.enabled or self.dirty:
+            return False
+        position = int(digits[:PREFIX_DIGITS])
+        if self._bits[position >> 3] & (1 << (position & 7)):
+            return False
+        self.rejected += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            bits = self._bits
+            usable = self.enabled and not self.dirty
+        return {
+            "prefixes": bin(int.from_bytes(bits, "big")).count("1") if usable else 0,
+            "usable": int(usable),
+            "rejected": self.rejected,
+            "rebuilds": self.rebuilds,
+        }
+
+
+bin_presence = PresenceBitmap()
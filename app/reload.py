@@ -0,0 +1,179 @@
+"""Whole-dataset reloads that never take the BIN table offline.
+
+A new dataset is imported into the ``bins_shadow`` table first, where it
+is checked before anything visible changes. The swap then runs as one
+write transaction: the live table is copied to ``bins_previous`` and the
+differences to the shadow table are applied to ``bins``, deleting BINs
+the dataset dropped and upserting the ones it added or changed. Readers
+keep seeing the old data until the transaction commits (SQLite's WAL
+mode never blocks them) and the new data all at once afterwards.
+
+Applying differences instead of renaming tables keeps every trigger on
+``bins`` in play, so the change log, the search index, the statistics and
+``data_versions`` follow the reload like any other write, and unchanged
+rows keep their ids and versions. Serving processes notice the new data
+version and drop their caches, prefix index, presence bitmap and snapshot.
+
+Rolling back swaps ``bins_previous`` in the same way, so it can be undone
+by rolling back again. It is not instant: like a reload it copies the
+whole live table and compares every row, and it writes the rows that
+differ.
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+import time
+from typing import Any, Dict, Iterator, Optional
+
+from sqlalchemy import MetaData, Table, exists, func, inspect, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateTable
+
+from . import db
+from .importer import BIN_COLUMNS, import_file, upsert_statement
+from .models import Bin
+
+SHADOW_TABLE = "bins_shadow"
+PREVIOUS_TABLE = "bins_previous"
+
+
+class ReloadError(Exception):
+    """Raised when a dataset fails validation or there is nothing to roll back to."""
+
+
+def _table(name: str) -> Table:
+    """Return a table with the columns of ``bins`` and none of its indexes.
+
+    The inline ``UNIQUE(bin)`` constraint stays, which the upserts need.
+    """
+    table = Bin.__table__.to_metadata(MetaData(), name=name)
+    table.indexes.clear()
+    return table
+
+
+def _recreate(conn, table: Table) -> None:
+    conn.exec_driver_sql(f"DROP TABLE IF EXISTS {table.name}")
+    conn.execute(CreateTable(table))
+
+
+@contextmanager
+def _write_transaction() -> Iterator[Connection]:
+    """Yield a connection inside one transaction that holds the write lock.
+
+    pysqlite only opens transactions before DML, so without an explicit
+    ``BEGIN`` the ``DROP TABLE`` and ``CREATE TABLE`` of a swap would each
+    commit on their own.
+    """
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        yield conn
+
+
+def _drop_shadow() -> None:
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {SHADOW_TABLE}")
+
+
+def _count(conn, table: Table) -> int:
+    return conn.execute(select(func.count()).select_from(table)).scalar()
+
+
+def validate(conn, shadow: Table, max_shrink: float) -> Dict[str, int]:
+    """Check the shadow table before it is swapped in.
+
+    Refuses an empty dataset, rows without a usable key range and a dataset
+    smaller than ``1 - max_shrink`` times the live one.
+    """
+    rows = _count(conn, shadow)
+    current = _count(conn, Bin.__table__)
+    if not rows:
+        raise ReloadError("The new dataset is empty")
+    broken = conn.execute(
+        select(func.count())
+        .select_from(shadow)
+        .where(
+            (shadow.c.range_start.is_(None))
+            | (shadow.c.range_end.is_(None))
+            | (shadow.c.range_start > shadow.c.range_end)
+        )
+    ).scalar()
+    if broken:
+        raise ReloadError(f"{broken} rows of the new dataset have no valid key range")
+    if rows < current * (1 - max_shrink):
+        raise ReloadError(
+            f"The new dataset has {rows} rows against {current} live ones, more than "
+            f"{max_shrink:.0%} fewer; force the reload to swap it in anyway"
+        )
+    return {"rows": rows, "current": current}
+
+
+def swap(conn: Connection, source: Table) -> Dict[str, int]:
+    """Make ``bins`` hold exactly the rows of ``source``.
+
+    The replaced rows are kept in ``bins_previous``. Run it inside
+    :func:`_write_transaction` so it commits or fails as a whole. Returns
+    the number of BINs deleted and written.
+    """
+    bins = Bin.__table__
+    previous = _table(PREVIOUS_TABLE)
+    data = [column for column in BIN_COLUMNS if column != "bin"]
+    _recreate(conn, previous)
+    conn.execute(previous.insert().from_select([c.name for c in bins.c], select(bins)))
+    deleted = conn.execute(bins.delete().where(~exists().where(source.c.bin == bins.c.bin))).rowcount
+    # Only rows whose serialized form differs are written, so unchanged
+    # BINs keep their version and no change is logged for them
+    changed = select(
+        source.c.bin, *(source.c[name] for name in data), source.c.payload, source.c.updated_at
+    ).where(~exists().where(bins.c.bin == source.c.bin, bins.c.payload == source.c.payload))
+    written = conn.execute(
+        upsert_statement().from_select(["bin", *data, "payload", "updated_at"], changed)
+    ).rowcount
+    return {"deleted": deleted, "written": written}
+
+
+def reload_bins(
+    path: str,
+    fmt: Optional[str] = None,
+    chunk_size: int = 5000,
+    max_shrink: float = 0.1,
+    force: bool = False,
+    progress=None,
+) -> Dict[str, Any]:
+    """Import ``path`` into the shadow table, validate it and swap it in."""
+    started = time.perf_counter()
+    shadow = _table(SHADOW_TABLE)
+    with db.engine.begin() as conn:
+        _recreate(conn, shadow)
+    try:
+        result = import_file(path, fmt=fmt, chunk_size=chunk_size, table=shadow, progress=progress)
+        with db.engine.connect() as conn:
+            counts = validate(conn, shadow, 1.0 if force else max_shrink)
+        with _write_transaction() as conn:
+            changes = swap(conn, shadow)
+    finally:
+        _drop_shadow()
+    return {
+        **counts,
+        **changes,
+        "skipped": result["skipped"],
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def rollback_bins() -> Dict[str, Any]:
+    """Swap ``bins_previous`` back in; the replaced rows become the new previous.
+
+    Everything happens in one transaction, so a failed rollback leaves both
+    datasets as they were.
+    """
+    started = time.perf_counter()
+    with _write_transaction() as conn:
+        if not inspect(conn).has_table(PREVIOUS_TABLE):
+            raise ReloadError("There is no previous dataset to roll back to")
+        # Renaming frees the name for the rows being replaced without a copy
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {SHADOW_TABLE}")
+        conn.exec_driver_sql(f"ALTER TABLE {PREVIOUS_TABLE} RENAME TO {SHADOW_TABLE}")
+        changes = swap(conn, _table(SHADOW_TABLE))
+        conn.exec_driver_sql(f"DROP TABLE {SHADOW_TABLE}")
+    return {**changes, "seconds": round(time.perf_counter() - started, 3)}
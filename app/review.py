@@ -0,0 +1,154 @@
+"""Consensus review of pending user submissions.
+
+Submissions are grouped per BIN and, for every field, the most frequently
+reported value wins. The vote counting happens in one aggregate query so a
+page of hundreds of BINs costs a single round trip, and approving or
+rejecting a selection is one transaction.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Tuple
+
+from sqlalchemy import text
+
+from . import db
+from .lookup import bin_changed
+from .models import Bin, Submission
+
+# Submission fields that can be carried over to a ``Bin`` record
+REVIEW_FIELDS = (
+    "category",
+    "reloadable",
+    "international",
+    "max_balance",
+    "company",
+    "country",
+    "customer_service",
+    "distributor",
+    "issuer",
+    "type",
+    "website_url",
+)
+
+
+@dataclass
+class Vote:
+    """Winning value of one field and how many submissions agree on it."""
+
+    value: Any
+    count: int
+    total: int
+
+
+@dataclass
+class Consensus:
+    """Aggregated submissions for one BIN."""
+
+    bin: str
+    submissions: int
+    fields: Dict[str, Vote] = field(default_factory=dict)
+
+    def values(self) -> Dict[str, Any]:
+        """Return the winning value of every field that received votes."""
+        return {name: vote.value for name, vote in self.fields.items()}
+
+
+def _consensus_sql() -> str:
+    votes = " UNION ALL ".join(
+        f"SELECT bin, '{name}' AS field, {name} AS value, count(*) AS votes "
+        f"FROM submissions WHERE bin IN (SELECT bin FROM page) AND {name} IS NOT NULL "
+        f"GROUP BY bin, {name}"
+        for name in REVIEW_FIELDS
+    )
+    return (
+        "WITH page AS ({page}), "
+        f"votes AS ({votes}), "
+        "ranked AS (SELECT bin, field, value, votes, "
+        "row_number() OVER (PARTITION BY bin, field ORDER BY votes DESC, value) AS position, "
+        "sum(votes) OVER (PARTITION BY bin, field) AS total FROM votes) "
+        "SELECT page.bin, page.submissions, ranked.field, ranked.value, ranked.votes, ranked.total "
+        "FROM page LEFT JOIN ranked ON ranked.bin = page.bin AND ranked.position = 1 "
+        "ORDER BY page.bin"
+    )
+
+
+PAGE_SQL = (
+    "SELECT bin, count(*) AS submissions FROM submissions WHERE bin > :after "
+    "GROUP BY bin ORDER BY bin LIMIT :limit"
+)
+SELECTED_SQL = "SELECT bin, count(*) AS submissions FROM submissions WHERE bin IN ({bins}) GROUP BY bin"
+
+
+def _collect(rows: Iterable[Tuple]) -> List[Consensus]:
+    results: Dict[str, Consensus] = {}
+    for bin_code, submissions, name, value, votes, total in rows:
+        entry = results.setdefault(bin_code, Consensus(bin_code, submissions))
+        if name is not None:
+            entry.fields[name] = Vote(value, votes, total)
+    return list(results.values())
+
+
+def consensus_page(after: str = "", limit: int = 100) -> List[Consensus]:
+    """Return consensus for up to ``limit`` BINs with submissions, after ``after``."""
+    sql = _consensus_sql().format(page=PAGE_SQL)
+    rows = db.session.execute(text(sql), {"after": after, "limit": limit})
+    return _collect(rows)
+
+
+def consensus_for(bins: List[str]) -> List[Consensus]:
+    """Return consensus for the given BINs that have pending submissions."""
+    if not bins:
+        return []
+    params = {f"b{i}": bin_code for i, bin_code in enumerate(bins)}
+    page = SELECTED_SQL.format(bins=", ".join(f":{key}" for key in params))
+    rows = db.session.execute(text(_consensus_sql().format(page=page)), params)
+    return _collect(rows)
+
+
+def approve(bins: List[str]) -> int:
+    """Apply the consensus of ``bins`` to their records and consume the submissions.
+
+    The write lock is taken before the votes are counted, so submissions
+    stored meanwhile wait for the transaction that deletes the counted ones
+    and nothing is removed without having been considered. Anything pending
+    in the session is rolled back first, never committed with the approval.
+    Returns the number of BINs written.
+    """
+    if not bins:
+        return 0
+    # The driver only begins a transaction at the first write; take the
+    # lock explicitly, which fails inside a transaction that is already open
+    db.session.rollback()
+    db.session.execute(text("BEGIN IMMEDIATE"))
+    try:
+        results = consensus_for(bins)
+        selected = [entry.bin for entry in results]
+        records = {record.bin: record for record in Bin.query.filter(Bin.bin.in_(selected))}
+        created = set()
+        for entry in results:
+            record = records.get(entry.bin)
+            if record is None:
+                record = Bin(bin=entry.bin)
+                db.session.add(record)
+                created.add(entry.bin)
+            for name, value in entry.values().items():
+                setattr(record, name, value)
+        Submission.query.filter(Submission.bin.in_(selected)).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    for bin_code in selected:
+        bin_changed(bin_code, reindex=bin_code in created)
+    return len(selected)
+
+
+def reject(bins: List[str]) -> int:
+    """Delete every pending submission for ``bins``; returns the rows removed."""
+    if not bins:
+        return 0
+    removed = Submission.query.filter(Submission.bin.in_(bins)).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
@@ -0,0 +1,210 @@
+"""Database creation and in-place upgrades for existing SQLite files."""
+
+from __future__ import annotations
+
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+
+from . import db
+from .importer import rebuild_payloads
+
+# The current time in the text format SQLAlchemy stores ``DateTime`` columns
+# in, so backfilled values compare and sort like the ones it writes
+STORED_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now') || '000'"
+
+logger = logging.getLogger(__name__)
+
+# Statements run after missing columns were added, used to backfill new data
+BACKFILLS = [
+    "UPDATE bins SET range_start = CAST(substr(bin || '00000000', 1, 8) AS INTEGER), "
+    "range_end = CAST(substr(bin || '99999999', 1, 8) AS INTEGER) "
+    "WHERE range_start IS NULL OR range_end IS NULL",
+    "UPDATE bins SET version = 1 WHERE version IS NULL",
+    f"UPDATE bins SET updated_at = {STORED_NOW} WHERE updated_at IS NULL",
+    f"UPDATE submissions SET created_at = {STORED_NOW} WHERE created_at IS NULL",
+]
+
+# A random id stored once, when the database is created or first upgraded,
+# so files derived from it (the BIN snapshot) can tell it from another
+# database whose counters happen to match
+DATABASE_ID = (
+    "INSERT OR IGNORE INTO data_versions (name, version) "
+    "VALUES ('database', abs(random() / 2))"
+)
+
+# Keep ``data_versions.bins`` moving on every write to ``bins``, whatever the
+# writer, so processes holding caches can tell their copy is stale
+TRIGGERS = [
+    "INSERT OR IGNORE INTO data_versions (name, version) VALUES ('bins', 0)",
+    "CREATE TRIGGER IF NOT EXISTS bins_changed_insert AFTER INSERT ON bins BEGIN "
+    "UPDATE data_versions SET version = version + 1 WHERE name = 'bins'; END",
+    "CREATE TRIGGER IF NOT EXISTS bins_changed_update AFTER UPDATE ON bins BEGIN "
+    "UPDATE data_versions SET version = version + 1 WHERE name = 'bins'; END",
+    "CREATE TRIGGER IF NOT EXISTS bins_changed_delete AFTER DELETE ON bins BEGIN "
+    "UPDATE data_versions SET version = version + 1 WHERE name = 'bins'; END",
+]
+
+# Record every insert, update and delete of a ``bins`` row in ``bin_changes``.
+# Updates that leave ``version`` alone (payload re-encoding) are not changes.
+# The last statement logs the existing rows of a database that predates the
+# log, and does nothing once the log has entries.
+CHANGE_LOG = [
+    "CREATE TRIGGER IF NOT EXISTS bins_log_insert AFTER INSERT ON bins BEGIN "
+    "INSERT INTO bin_changes (bin, op, version, changed_at) "
+    "VALUES (NEW.bin, 'insert', NEW.version, strftime('%Y-%m-%d %H:%M:%f', 'now')); END",
+    "CREATE TRIGGER IF NOT EXISTS bins_log_update AFTER UPDATE ON bins "
+    "WHEN NEW.version IS NOT OLD.version OR NEW.bin <> OLD.bin BEGIN "
+    "INSERT INTO bin_changes (bin, op, version, changed_at) "
+    "VALUES (NEW.bin, 'update', NEW.version, strftime('%Y-%m-%d %H:%M:%f', 'now')); END",
+    "CREATE TRIGGER IF NOT EXISTS bins_log_rename AFTER UPDATE OF bin ON bins "
+    "WHEN NEW.bin <> OLD.bin BEGIN "
+    "INSERT INTO bin_changes (bin, op, version, changed_at) "
+    "VALUES (OLD.bin, 'delete', OLD.version, strftime('%Y-%m-%d %H:%M:%f', 'now')); END",
+    "CREATE TRIGGER IF NOT EXISTS bins_log_delete AFTER DELETE ON bins BEGIN "
+    "INSERT INTO bin_changes (bin, op, version, changed_at) "
+    "VALUES (OLD.bin, 'delete', OLD.version, strftime('%Y-%m-%d %H:%M:%f', 'now')); END",
+    "INSERT INTO bin_changes (bin, op, version, changed_at) "
+    "SELECT bin, 'insert', version, COALESCE(updated_at, CURRENT_TIMESTAMP) FROM bins "
+    "WHERE NOT EXISTS (SELECT 1 FROM bin_changes) ORDER BY id",
+]
+
+# Columns covered by the ``bins_fts`` full-text index used by attribute search
+SEARCH_COLUMNS = ("issuer", "company", "distributor", "country", "category", "type")
+
+_columns = ", ".join(SEARCH_COLUMNS)
+_new = ", ".join(f"NEW.{name}" for name in SEARCH_COLUMNS)
+_old = ", ".join(f"OLD.{name}" for name in SEARCH_COLUMNS)
+
+# External-content FTS5 index over ``bins``, kept in sync by triggers
+SEARCH_INDEX = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS bins_fts USING fts5({_columns}, "
+    "content='bins', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS bins_fts_insert AFTER INSERT ON bins BEGIN "
+    f"INSERT INTO bins_fts (rowid, {_columns}) VALUES (NEW.id, {_new}); END",
+    "CREATE TRIGGER IF NOT EXISTS bins_fts_delete AFTER DELETE ON bins BEGIN "
+    f"INSERT INTO bins_fts (bins_fts, rowid, {_columns}) VALUES ('delete', OLD.id, {_old}); END",
+    f"CREATE TRIGGER IF NOT EXISTS bins_fts_update AFTER UPDATE OF {_columns} ON bins BEGIN "
+    f"INSERT INTO bins_fts (bins_fts, rowid, {_columns}) VALUES ('delete', OLD.id, {_old}); "
+    f"INSERT INTO bins_fts (rowid, {_columns}) VALUES (NEW.id, {_new}); END",
+]
+
+# Attributes of ``bins`` counted in ``bin_stats``, besides the ``total`` row
+STAT_DIMENSIONS = ("country", "category", "type", "issuer")
+
+
+def _stat_add(dimension: str, value: str, where: str = "") -> str:
+    return (
+        f"INSERT INTO bin_stats (dimension, value, count) SELECT '{dimension}', {value}, 1 "
+        f"WHERE {where or 'true'} "
+        "ON CONFLICT (dimension, value) DO UPDATE SET count = count + 1;"
+    )
+
+
+def _stat_remove(dimension: str, value: str, where: str = "") -> str:
+    return (
+        f"UPDATE bin_stats SET count = count - 1 WHERE dimension = '{dimension}' "
+        f"AND value = {value}{f' AND {where}' if where else ''};"
+    )
+
+
+# Keep ``bin_stats`` counting rows per attribute value as rows come and go
+STATS = [
+    "CREATE TRIGGER IF NOT EXISTS bins_stats_insert AFTER INSERT ON bins BEGIN "
+    + _stat_add("total", "''")
+    + "".join(_stat_add(name, f"COALESCE(NEW.{name}, '')") for name in STAT_DIMENSIONS)
+    + " END",
+    "CREATE TRIGGER IF NOT EXISTS bins_stats_delete AFTER DELETE ON bins BEGIN "
+    + _stat_remove("total", "''")
+    + "".join(_stat_remove(name, f"COALESCE(OLD.{name}, '')") for name in STAT_DIMENSIONS)
+    + " END",
+    f"CREATE TRIGGER IF NOT EXISTS bins_stats_update AFTER UPDATE OF {', '.join(STAT_DIMENSIONS)} "
+    "ON bins BEGIN "
+    + "".join(
+        _stat_remove(name, f"COALESCE(OLD.{name}, '')", f"OLD.{name} IS NOT NEW.{name}")
+        + _stat_add(name, f"COALESCE(NEW.{name}, '')", f"OLD.{name} IS NOT NEW.{name}")
+        for name in STAT_DIMENSIONS
+    )
+    + " END",
+    "CREATE TRIGGER IF NOT EXISTS submissions_stats_insert AFTER INSERT ON submissions BEGIN "
+    + _stat_add("submissions", "'pending'")
+    + " END",
+    "CREATE TRIGGER IF NOT EXISTS submissions_stats_delete AFTER DELETE ON submissions BEGIN "
+    + _stat_remove("submissions", "'pending'")
+    + " END",
+]
+
+# Recount ``bin_stats`` from scratch, for databases that predate it
+STATS_REFRESH = [
+    "DELETE FROM bin_stats",
+    "INSERT INTO bin_stats (dimension, value, count) SELECT 'total', '', COUNT(*) FROM bins",
+    *(
+        f"INSERT INTO bin_stats (dimension, value, count) "
+        f"SELECT '{name}', COALESCE({name}, ''), COUNT(*) FROM bins GROUP BY 2"
+        for name in STAT_DIMENSIONS
+    ),
+    "INSERT INTO bin_stats (dimension, value, count) "
+    "SELECT 'submissions', 'pending', COUNT(*) FROM submissions",
+]
+
+
+def _create_search_index(engine) -> None:
+    """Create the full-text index and fill it if it did not exist yet."""
+    with engine.begin() as conn:
+        existed = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'bins_fts'")
+        ).first()
+        try:
+            for statement in SEARCH_INDEX:
+                conn.execute(text(statement))
+        except OperationalError:
+            # SQLite built without FTS5; search falls back to LIKE queries
+            logger.warning("FTS5 is not available, BIN search will not use a full-text index")
+            return
+        if not existed:
+            conn.execute(text("INSERT INTO bins_fts (bins_fts) VALUES ('rebuild')"))
+
+
+def upgrade_schema() -> None:
+    """Add columns, indexes and triggers introduced after a database was created."""
+    engine = db.engine
+    added = False
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_sql = f'"{column.name}" {column.type.compile(dialect=engine.dialect)}'
+                if column.server_default is not None:
+                    column_sql += f" DEFAULT {column.server_default.arg}"
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_sql}"))
+                added = True
+        if added:
+            for statement in BACKFILLS:
+                conn.execute(text(statement))
+            # Rows from before payloads were stored would otherwise be
+            # encoded on every read until ``manage.py rebuild-payloads``
+            rebuild_payloads(conn, missing_only=True)
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        for statement in [DATABASE_ID] + TRIGGERS + CHANGE_LOG + STATS:
+            conn.execute(text(statement))
+        if conn.execute(text("SELECT 1 FROM bin_stats LIMIT 1")).first() is None:
+            for statement in STATS_REFRESH:
+                conn.execute(text(statement))
+    _create_search_index(engine)
+
+
+def init_db() -> None:
+    """Create missing tables and bring existing ones up to date."""
+    # Every table lives in the writer's database; the read bind maps the same file
+    db.create_all(bind_key=None)
+    upgrade_schema()
@@ -0,0 +1,109 @@
+"""Attribute search over BIN records.
+
+Free text and the ``issuer``, ``company`` and ``distributor`` filters match
+word prefixes through the ``bins_fts`` full-text index (see
+``app.schema.SEARCH_INDEX``); ``country``, ``category`` and ``type`` match
+whole values, ignoring case, through composite indexes. Results come in
+``id`` order and the last id of a page is the cursor of the next, so every
+page is a bounded index scan however deep the client pages.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import column, or_, select, table, text
+
+from .models import Bin, fill_payloads
+from .schema import SEARCH_COLUMNS
+from .storage import read_connection
+
+# Matched by word prefix through the full-text index
+TEXT_FILTERS = ("issuer", "company", "distributor")
+# Matched as whole values, ignoring case
+EXACT_FILTERS = ("country", "category", "type")
+SEARCH_FILTERS = TEXT_FILTERS + EXACT_FILTERS
+
+_fts = table("bins_fts", column("rowid"))
+_fts_available: Optional[bool] = None
+
+
+class SearchPage(NamedTuple):
+    """One page of search results and the cursor of the next page, if any."""
+
+    rows: List[Tuple[str, str]]
+    next: Optional[int]
+
+
+def _tokens(value: str) -> List[str]:
+    return re.findall(r"\w+", value.lower())
+
+
+def match_expression(q: str, filters: Dict[str, str]) -> str:
+    """Build an FTS5 query requiring every word of ``q`` and the text filters as prefixes."""
+    terms = [f'"{token}"*' for token in _tokens(q)]
+    for name in TEXT_FILTERS:
+        terms.extend(f'{name}:"{token}"*' for token in _tokens(filters.get(name, "")))
+    return " AND ".join(terms)
+
+
+def _like_conditions(q: str, filters: Dict[str, str]) -> list:
+    """Word prefix conditions equivalent to :func:`match_expression`, without FTS5."""
+
+    def prefix(name: str, token: str):
+        field = getattr(Bin, name)
+        return or_(field.ilike(f"{token}%"), field.ilike(f"% {token}%"))
+
+    conditions = [
+        or_(*(prefix(name, token) for name in SEARCH_COLUMNS)) for token in _tokens(q)
+    ]
+    for name in TEXT_FILTERS:
+        conditions.extend(prefix(name, token) for token in _tokens(filters.get(name, "")))
+    return conditions
+
+
+def _has_fts(conn) -> bool:
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = (
+            conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'bins_fts'")
+            ).first()
+            is not None
+        )
+    return _fts_available
+
+
+def search_bins(q: str, filters: Dict[str, str], after: int = 0, limit: int = 50) -> SearchPage:
+    """Return ``(bin, payload)`` of up to ``limit`` matching records with ``id > after``."""
+    bins = Bin.__table__
+    conditions = [
+        bins.c[name].collate("NOCASE") == filters[name].strip()
+        for name in EXACT_FILTERS
+        if filters.get(name, "").strip()
+    ]
+    expression = match_expression(q, filters)
+    with read_connection() as conn:
+        if expression and _has_fts(conn):
+            # Drive the query from the full-text index so the cursor and the
+            # ordering are both answered by FTS5 without a sort
+            query = (
+                select(bins.c.id, bins.c.bin, bins.c.payload)
+                .select_from(_fts.join(bins, bins.c.id == _fts.c.rowid))
+                .where(text("bins_fts MATCH :match").bindparams(match=expression))
+                .where(_fts.c.rowid > after, *conditions)
+                .order_by(_fts.c.rowid)
+            )
+        else:
+            if expression:
+                conditions.extend(_like_conditions(q, filters))
+            query = (
+                select(bins.c.id, bins.c.bin, bins.c.payload)
+                .where(bins.c.id > after, *conditions)
+                .order_by(bins.c.id)
+            )
+        rows = conn.execute(query.limit(limit + 1)).all()
+        payloads = fill_payloads(conn, {row.bin: row.payload for row in rows[:limit]})
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return SearchPage([(row.bin, payloads[row.bin]) for row in rows[:limit]], next_cursor)
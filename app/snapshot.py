@@ -0,0 +1,411 @@
+"""Compiled, memory-mapped snapshot of the ``bins`` table.
+
+The snapshot is a read-only file every worker process maps into memory, so
+all of them share one copy in the page cache instead of each building its
+own prefix index and lookup working set. It holds fixed-width integer
+columns sorted by ``(range_start, -range_end)``, one row per BIN range, and
+a deduplicated pool of JSON tokens for the payload fields. Lookups bisect
+the mapped columns directly and assemble the payload from pooled tokens.
+
+File layout, native byte order, every section aligned to eight bytes::
+
+    header      magic, format, count, keys, pool size, data version,
+                database id, built at
+    starts      uint32[count]   inclusive range start
+    ends        uint32[count]   inclusive range end
+    parents     int32[count]    position of the nearest enclosing range or -1
+    versions    uint32[count]   record version
+    updated     int64[count]    updated_at in microseconds since the epoch
+    refs        uint32[count * keys]  pool index of every pooled payload field
+    offsets     uint32[pool + 1]      start of every pool entry
+    pool        utf-8 bytes
+
+The first ``keys`` pool entries are the pooled payload keys. A snapshot
+records the ``data_versions.bins`` value it was compiled from and the
+random id of the database, ``data_versions.database``, and is only used
+while both still match: a different database at the same path can reach
+the same counter with other rows. Writes mark it stale and a
+background thread compiles a replacement, which is swapped in atomically
+with ``os.replace``; other processes pick it up on their next writer check.
+"""
+
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_right
+import calendar
+from datetime import datetime, timedelta
+import json
+import logging
+import mmap
+import os
+from pathlib import Path
+import struct
+from threading import Event, Lock, Thread
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import Flask
+from sqlalchemy import select
+
+from .models import Bin, DataVersion, utcnow
+from .prefix_index import key_range
+from .storage import read_connection
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"BINSNAP\x00"
+FORMAT = 2
+HEADER = struct.Struct("=8sIIIIqqq")
+NULL_TIME = -(2**63)
+EPOCH = datetime(1970, 1, 1)
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _to_micros(value: Optional[datetime]) -> int:
+    if value is None:
+        return NULL_TIME
+    return calendar.timegm(value.timetuple()) * 1_000_000 + value.microsecond
+
+
+def read_versions(conn) -> Tuple[int, int]:
+    """Return the database id and ``data_versions.bins`` in one query."""
+    rows = dict(
+        conn.execute(
+            select(DataVersion.name, DataVersion.version).where(
+                DataVersion.name.in_(("database", "bins"))
+            )
+        ).all()
+    )
+    return rows.get("database") or 0, rows.get("bins") or 0
+
+
+def compile_snapshot(path: Path, batch_size: int = 10000) -> Dict[str, Any]:
+    """Write a snapshot of the ``bins`` table to ``path``, replacing it atomically.
+
+    Must run inside an application context. Returns the record count, pool
+    size and the database id and data version the snapshot was compiled from.
+    """
+    started = time.perf_counter()
+    keys = sorted(
+        column.name
+        for column in Bin.__table__.columns
+        if column.name not in Bin.internal_columns
+    )
+    pool: Dict[str, int] = {}
+    for key in keys:
+        pool.setdefault(key, len(pool))
+    starts = array("I")
+    ends = array("I")
+    parents = array("i")
+    versions = array("I")
+    updated = array("q")
+    refs = array("I")
+    stack: List[int] = []
+
+    # Pooled from the columns rather than the stored payload, which rows
+    # written with plain SQL lack
+    table = Bin.__table__
+    query = (
+        select(
+            Bin.range_start, Bin.range_end, Bin.version, Bin.updated_at, *(table.c[key] for key in keys)
+        )
+        .where(Bin.range_start.isnot(None), Bin.range_end.isnot(None))
+        .order_by(Bin.range_start, Bin.range_end.desc())
+    )
+    with read_connection() as conn:
+        # Read before the rows: a write in between leaves the snapshot
+        # labelled older than its contents, so it is rebuilt, never trusted
+        database_id, data_version = read_versions(conn)
+        for position, row in enumerate(conn.execute(query.execution_options(yield_per=batch_size))):
+            start, end, version, updated_at = row[:4]
+            while stack and ends[stack[-1]] < start:
+                stack.pop()
+            parents.append(stack[-1] if stack else -1)
+            stack.append(position)
+            starts.append(start)
+            ends.append(end)
+            versions.append(version or 1)
+            updated.append(_to_micros(updated_at))
+            for value in row[4:]:
+                token = json.dumps(value, ensure_ascii=False)
+                index = pool.get(token)
+                if index is None:
+                    index = pool[token] = len(pool)
+                refs.append(index)
+
+    encoded = [token.encode("utf-8") for token in pool]
+    offsets = array("I", [0])
+    for token in encoded:
+        offsets.append(offsets[-1] + len(token))
+    built_at = _to_micros(utcnow())
+    header = HEADER.pack(
+        MAGIC, FORMAT, len(starts), len(keys), len(encoded), data_version, database_id, built_at
+    )
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as tmp_file:
+        for section in (header, starts, ends, parents, versions, updated, refs, offsets):
+            chunk = section if isinstance(section, bytes) else section.tobytes()
+            tmp_file.write(chunk)
+            tmp_file.write(b"\x00" * (_align(len(chunk)) - len(chunk)))
+        for token in encoded:
+            tmp_file.write(token)
+        tmp_file.flush()
+        os.fsync(tmp_file.fileno())
+    os.replace(tmp_path, path)
+    return {
+        "records": len(starts),
+        "pool": len(encoded),
+        "bytes": path.stat().st_size,
+        "data_version": data_version,
+        "database_id": database_id,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+class Snapshot:
+    """Read-only view of a compiled snapshot file.
+
+    Columns are ``memoryview`` casts over the mapping, so lookups copy
+    nothing but the pool tokens of the record they return.
+    """
+
+    def __init__(self, path: Path) -> None:
+        with open(path, "rb") as snapshot_file:
+            stat = os.fstat(snapshot_file.fileno())
+            self._mmap = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        view = memoryview(self._mmap)
+        (
+            magic,
+            fmt,
+            count,
+            key_count,
+            pool_count,
+            self.data_version,
+            self.database_id,
+            built_at,
+        ) = HEADER.unpack_from(view)
+        if magic != MAGIC or fmt != FORMAT:
+            raise ValueError(f"{path} is not a BIN snapshot of format {FORMAT}")
+        self.count = count
+        self.built_at = None if built_at == NULL_TIME else EPOCH + timedelta(microseconds=built_at)
+        offset = _align(HEADER.size)
+
+        def column(code: str, length: int) -> memoryview:
+            nonlocal offset
+            size = struct.calcsize(code) * length
+            values = view[offset : offset + size].cast(code)
+            offset = _align(offset + size)
+            return values
+
+        self._starts = column("I", count)
+        self._ends = column("I", count)
+        self._parents = column("i", count)
+        self._versions = column("I", count)
+        self._updated = column("q", count)
+        self._refs = column("I", count * key_count)
+        self._offsets = column("I", pool_count + 1)
+        self._pool = view[offset : offset + self._offsets[pool_count]]
+        self._width = key_count
+        keys = [self._token(index) for index in range(key_count)]
+        self._bin_ref = keys.index("bin")
+        # Payload fields in encode_payload's sorted key order: (prefix, ref slot)
+        self._layout = sorted((f'"{key}":', slot) for slot, key in enumerate(keys))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def matches(self, database_id: Optional[int], data_version: Optional[int]) -> bool:
+        """Return ``True`` if compiled from this state of this database."""
+        return self.database_id == database_id and self.data_version == data_version
+
+    def _token(self, index: int) -> str:
+        return str(self._pool[self._offsets[index] : self._offsets[index + 1]], "utf-8")
+
+    def match(self, digits: str) -> Optional[int]:
+        """Return the position of the most specific range covering ``digits``."""
+        low, high = key_range(digits)
+        ends, parents = self._ends, self._parents
+        position = bisect_right(self._starts, low) - 1
+        while position >= 0:
+            if ends[position] >= high:
+                return position
+            position = parents[position]
+        return None
+
+    def bin_at(self, position: int) -> str:
+        # Pooled as a JSON string token; BINs are plain digits
+        return self._token(self._refs[position * self._width + self._bin_ref])[1:-1]
+
+    def record(self, position: int) -> Tuple[str, str, int, Optional[datetime]]:
+        """Return ``(bin, payload, version, updated_at)`` for ``position``."""
+        base = position * self._width
+        refs = self._refs
+        parts = []
+        for prefix, slot in self._layout:
+            parts.append(prefix + self._token(refs[base + slot]))
+        updated = self._updated[position]
+        return (
+            self.bin_at(position),
+            "{" + ",".join(parts) + "}",
+            self._versions[position],
+            None if updated == NULL_TIME else EPOCH + timedelta(microseconds=updated),
+        )
+
+
+class SnapshotStore:
+    """The snapshot currently mapped by this process and its rebuild thread.
+
+    A snapshot is served only while it is *usable*: compiled from the data
+    version the last writer check saw, with no local write since. Otherwise
+    lookups fall back to the database and a rebuild is scheduled, debounced
+    by ``rebuild_delay`` so bursts of writes cost one compilation.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._snapshot: Optional[Snapshot] = None
+        self._usable = False
+        self._requested = Event()
+        self._thread: Optional[Thread] = None
+        self._app: Optional[Flask] = None
+        self.path: Optional[Path] = None
+        self.rebuild_delay = 1.0
+        self.generation = 0
+        self.rebuilds = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def configure(self, path: Optional[Path], rebuild_delay: float = 1.0) -> None:
+        """Use the snapshot at ``path``, or disable snapshots when ``None``."""
+        with self._lock:
+            self.path = path
+            self.rebuild_delay = rebuild_delay
+            self._snapshot = None
+            self._usable = False
+
+    def current(self) -> Optional[Snapshot]:
+        """Return the mapped snapshot if it reflects the database, else ``None``."""
+        return self._snapshot if self._usable else None
+
+    def refresh(
+        self,
+        app: Flask,
+        data_version: Optional[int],
+        generation: int,
+        database_id: Optional[int],
+    ) -> None:
+        """Remap a replaced file and re-check it against the database's versions.
+
+        ``generation`` is the value of :attr:`generation` read before
+        ``data_version`` was, so a local write racing the check keeps the
+        snapshot stale.
+        """
+        if self.path is None:
+            return
+        snapshot = self._snapshot
+        try:
+            stat = os.stat(self.path)
+            identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            identity = None
+        if identity is not None and (snapshot is None or snapshot.identity != identity):
+            try:
+                snapshot = Snapshot(self.path)
+            except (OSError, ValueError):
+                logger.exception("Could not map BIN snapshot %s", self.path)
+                snapshot = None
+        usable = snapshot is not None and snapshot.matches(database_id, data_version)
+        with self._lock:
+            self._snapshot = snapshot
+            self._usable = usable and generation == self.generation
+        if not usable:
+            self.request_rebuild(app)
+
+    def invalidate(self, app: Flask) -> None:
+        """Stop serving the snapshot after a local write and schedule a rebuild."""
+        if self.path is None:
+            return
+        with self._lock:
+            self.generation += 1
+            self._usable = False
+        self.request_rebuild(app)
+
+    def request_rebuild(self, app: Flask) -> None:
+        with self._lock:
+            self._app = app
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name="bin-snapshot", daemon=True)
+                self._thread.start()
+        self._requested.set()
+
+    def _run(self) -> None:
+        while True:
+            self._requested.wait()
+            time.sleep(self.rebuild_delay)
+            self._requested.clear()
+            try:
+                with self._app.app_context():
+                    self.rebuild()
+            except Exception:
+                logger.exception("BIN snapshot rebuild failed")
+
+    def rebuild(self) -> Optional[Dict[str, Any]]:
+        """Compile a fresh snapshot unless another process is already doing so.
+
+        Must run inside an application context. Returns the compilation
+        result, or ``None`` if the file on disk was already current or
+        another process holds the build lock.
+        """
+        path = self.path
+        if path is None:
+            return None
+        generation = self.generation
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path.with_name(f"{path.name}.lock"), "a") as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return None
+            with read_connection() as conn:
+                database_id, data_version = read_versions(conn)
+            result = None
+            try:
+                snapshot: Optional[Snapshot] = Snapshot(path)
+            except (OSError, ValueError):
+                snapshot = None
+            if snapshot is None or not snapshot.matches(database_id, data_version):
+                result = compile_snapshot(path)
+                snapshot = Snapshot(path)
+                self.rebuilds += 1
+                logger.info("Compiled BIN snapshot: %s", result)
+        with self._lock:
+            self._snapshot = snapshot
+            self._usable = generation == self.generation and snapshot.matches(database_id, data_version)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "records": len(snapshot) if snapshot else 0,
+            "data_version": snapshot.data_version if snapshot else 0,
+            "usable": int(self._usable),
+            "rebuilds": self.rebuilds,
+        }
+
+
+bin_snapshot = SnapshotStore()
@@ -0,0 +1,51 @@
+"""Summary statistics read from the ``bin_stats`` counters.
+
+Triggers update the counters on every write to ``bins`` and
+``submissions`` (see ``app.schema.STATS``), so a summary is a handful of
+index range reads whatever the size of the tables.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from sqlalchemy import select, text
+
+from . import db
+from .models import BinStat
+from .schema import STAT_DIMENSIONS, STATS_REFRESH
+from .storage import read_connection
+
+
+def summary(limit: int = 20) -> Dict[str, Any]:
+    """Return BIN totals, the pending submission count and the ``limit`` most
+    common values of each dimension, most common first.
+    """
+    stats = BinStat.__table__
+    result: Dict[str, Any] = {}
+    with read_connection() as conn:
+        counters = dict(
+            conn.execute(
+                select(stats.c.dimension, stats.c.count).where(
+                    stats.c.dimension.in_(("total", "submissions"))
+                )
+            ).all()
+        )
+        result["total_bins"] = counters.get("total", 0)
+        result["pending_submissions"] = counters.get("submissions", 0)
+        for name in STAT_DIMENSIONS:
+            rows = conn.execute(
+                select(stats.c.value, stats.c.count)
+                .where(stats.c.dimension == name, stats.c.count > 0)
+                .order_by(stats.c.count.desc(), stats.c.value)
+                .limit(limit)
+            )
+            result[name] = [{"value": value or None, "count": count} for value, count in rows]
+    return result
+
+
+def refresh_stats() -> None:
+    """Recount every counter from the tables, in one transaction."""
+    with db.engine.begin() as conn:
+        for statement in STATS_REFRESH:
+            conn.execute(text(statement))
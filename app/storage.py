@@ -0,0 +1,119 @@
+"""SQLite storage setup: WAL journaling, pragmas and a read/write split.
+
+Writes go through the default Flask-SQLAlchemy engine, whose pool holds a
+single connection so writers are serialized instead of fighting over the
+database lock. Lookups use a separate pool of read-only connections, which
+in WAL mode never wait for the writer.
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+
+from . import db
+
+READ_BIND = "read"
+
+DEFAULT_PRAGMAS: Dict[str, Any] = {
+    "synchronous": "NORMAL",
+    "cache_size": -65536,
+    "mmap_size": 268435456,
+    "busy_timeout": 5000,
+    "temp_store": "MEMORY",
+}
+
+# Pragmas that only matter for connections that write
+WRITER_PRAGMAS = {"synchronous"}
+
+
+def database_uri(path: str, read_only: bool = False) -> str:
+    """Build a SQLAlchemy URL for ``path``, relative to the instance folder."""
+    if read_only:
+        return f"sqlite:///file:{path}?mode=ro&uri=true"
+    return f"sqlite:///{path}"
+
+
+def configure_database(app: Flask, config: dict) -> None:
+    """Set engine URLs and pool options from the ``database`` config section.
+
+    Must run before ``db.init_app(app)``.
+    """
+    db_cfg = config.get("database", {})
+    path = db_cfg.get("path", "bins.db")
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_uri(path)
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "pool_size": 1,
+        "max_overflow": 0,
+        "pool_timeout": float(db_cfg.get("write_timeout", 30)),
+    }
+    read_pool_size = int(db_cfg.get("read_pool_size", 8))
+    binds: Dict[str, Any] = {}
+    if read_pool_size > 0:
+        binds[READ_BIND] = {
+            "url": database_uri(path, read_only=True),
+            "pool_size": read_pool_size,
+            "max_overflow": read_pool_size,
+        }
+    app.config["SQLALCHEMY_BINDS"] = binds
+
+
+def install_pragmas(app: Flask, config: dict) -> None:
+    """Apply journaling and pragma settings to every new connection.
+
+    Must run after ``db.init_app(app)``.
+    """
+    db_cfg = config.get("database", {})
+    pragmas = {**DEFAULT_PRAGMAS, **db_cfg.get("pragmas", {})}
+    wal = db_cfg.get("wal", True)
+    with app.app_context():
+        engines = dict(db.engines)
+    for key, engine in engines.items():
+        writer = key is None
+        statements = [
+            f"PRAGMA {name}={value}"
+            for name, value in pragmas.items()
+            if writer or name not in WRITER_PRAGMAS
+        ]
+        if writer and wal:
+            statements.insert(0, "PRAGMA journal_mode=WAL")
+        _listen_connect(engine, statements)
+
+
+def _listen_connect(engine: Engine, statements: list) -> None:
+    @event.listens_for(engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+
+def read_engine() -> Engine:
+    """Return the read-only engine, or the writer if the split is disabled."""
+    engines = db.engines
+    return engines.get(READ_BIND) or engines[None]
+
+
+@contextmanager
+def read_connection() -> Iterator[Connection]:
+    """Check out a pooled read-only connection for the duration of the block.
+
+    Without a read pool, a session that has already begun a transaction
+    lends its connection instead: it holds the writer pool's only
+    connection until the request ends, so checking out another one would
+    wait for itself. The borrowed connection stays with the session.
+    """
+    if READ_BIND not in db.engines:
+        session = db.session()
+        if session.in_transaction():
+            yield session.connection()
+            return
+    with read_engine().connect() as conn:
+        yield conn
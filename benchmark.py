@@ -0,0 +1,310 @@
+"""Benchmark BIN lookups through the API, frontend, report endpoint and bot.
+
+Seeds a synthetic database of the requested size (kept separate from the
+configured one), replays a reproducible mix of hits and misses against the
+app in-process and reports throughput and p50/p95/p99 latency per workload.
+Results are written as JSON and can be compared against an earlier run to
+flag regressions.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from flask import Flask
+from sqlalchemy import func, select
+
+from app import create_app, db, load_config
+from app.importer import import_rows
+from app.models import Bin
+from app.schema import init_db
+from app.snapshot import bin_snapshot
+
+WORKLOADS = ("api", "frontend", "report", "bot")
+
+CATEGORIES = ("Debit", "Credit", "Prepaid")
+COUNTRIES = ("US", "CA", "GB", "DE", "FR", "BR", "IN", "AU", "JP", "MX")
+COMPANIES = ("Visa", "Mastercard", "American Express", "Discover", "JCB", "UnionPay")
+
+# Seeded BINs are drawn from this eight digit range; misses come from outside it
+HIT_RANGE = (40000000, 59999999)
+MISS_RANGE = (90000000, 99999999)
+
+
+def synthetic_rows(count: int, seed: int) -> Iterator[Dict[str, Any]]:
+    """Yield ``count`` reproducible BIN records."""
+    rng = random.Random(seed)
+    for code in sorted(rng.sample(range(HIT_RANGE[0], HIT_RANGE[1] + 1), count)):
+        category = rng.choice(CATEGORIES)
+        prepaid = category == "Prepaid"
+        yield {
+            "bin": str(code),
+            "category": category,
+            "reloadable": rng.choice(("Yes", "No")) if prepaid else None,
+            "international": rng.choice(("Yes", "No")) if prepaid else None,
+            "max_balance": rng.choice((500, 1000, 2500)) if prepaid else None,
+            "company": rng.choice(COMPANIES),
+            "country": rng.choice(COUNTRIES),
+            "issuer": f"Bank {code % 997}",
+            "type": "Debit" if category != "Credit" else "Credit",
+        }
+
+
+def seed_database(rows: int, seed: int, force: bool) -> List[str]:
+    """Make sure the benchmark database holds exactly ``rows`` synthetic BINs."""
+    existing = db.session.scalar(select(func.count()).select_from(Bin))
+    if force or existing != rows:
+        db.session.query(Bin).delete()
+        db.session.commit()
+        result = import_rows(synthetic_rows(rows, seed), chunk_size=10000)
+        print(f"Seeded {result['written']} rows in {result['seconds']}s", file=sys.stderr)
+    return list(db.session.scalars(select(Bin.bin)))
+
+
+def lookup_codes(bins: List[str], count: int, hit_ratio: float, seed: int) -> List[str]:
+    """Return ``count`` BINs to look up, ``hit_ratio`` of them present in the database."""
+    rng = random.Random(seed)
+    return [
+        rng.choice(bins) if rng.random() < hit_ratio else str(rng.randint(*MISS_RANGE))
+        for _ in range(count)
+    ]
+
+
+def summarize(latencies: List[float], errors: int, seconds: float) -> Dict[str, Any]:
+    """Return throughput and exact latency percentiles in milliseconds."""
+    ordered = sorted(latencies)
+
+    def percentile(q: float) -> float:
+        if not ordered:
+            return 0.0
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "throughput_rps": round(len(ordered) / seconds, 1) if seconds else 0.0,
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3) if ordered else 0.0,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+    }
+
+
+def run_threaded(
+    app: Flask, request: Callable[[Any, str], bool], codes: List[str], concurrency: int
+) -> Dict[str, Any]:
+    """Issue one request per code from ``concurrency`` threads."""
+    batches = [codes[i::concurrency] for i in range(concurrency)]
+
+    def worker(batch: List[str]) -> Tuple[List[float], int]:
+        client = app.test_client()
+        client.environ_base["HTTP_X_API_KEY"] = app.config["APP_CONFIG"]["api"].get("api_key", "")
+        latencies: List[float] = []
+        errors = 0
+        for code in batch:
+            started = time.perf_counter()
+            ok = request(client, code)
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+        return latencies, errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(worker, batches))
+    seconds = time.perf_counter() - started
+    latencies = [value for batch, _ in results for value in batch]
+    return summarize(latencies, sum(errors for _, errors in results), seconds)
+
+
+def api_request(client, code: str) -> bool:
+    response = client.get(f"/api/bin/{code}")
+    return response.status_code in (200, 404)
+
+
+def frontend_request(client, code: str) -> bool:
+    return client.post("/", data={"bin": code}).status_code == 200
+
+
+def report_request(client, code: str) -> bool:
+    response = client.post(f"/api/report/{code}", json={"country": "US", "company": "Benchmark"})
+    return response.status_code in (201, 202)
+
+
+class _StubMessage:
+    async def reply_text(self, text: str, **kwargs: Any) -> None:
+        self.reply = text
+
+
+class _StubUpdate:
+    """Just enough of ``telegram.Update`` for ``lookup_command``."""
+
+    def __init__(self) -> None:
+        self.message = _StubMessage()
+
+
+class _StubContext:
+    def __init__(self, args: List[str]) -> None:
+        self.args = args
+
+
+def run_bot(app: Flask, codes: List[str], concurrency: int) -> Dict[str, Any]:
+    """Call ``telegram_bot.lookup_command`` with stubbed updates, ``concurrency`` at a time."""
+    import telegram_bot
+
+    telegram_bot.flask_app = app
+    workers = int(app.config["APP_CONFIG"].get("telegram", {}).get("db_workers", 4))
+    telegram_bot._db_executor = ThreadPoolExecutor(max_workers=workers)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(code: str, limit: asyncio.Semaphore) -> None:
+        nonlocal errors
+        async with limit:
+            update = _StubUpdate()
+            started = time.perf_counter()
+            try:
+                await telegram_bot.lookup_command(update, _StubContext([code]))
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    async def main() -> None:
+        limit = asyncio.Semaphore(concurrency)
+        await asyncio.gather(*(one(code, limit) for code in codes))
+
+    started = time.perf_counter()
+    try:
+        asyncio.run(main())
+    finally:
+        telegram_bot._db_executor.shutdown(wait=True)
+        telegram_bot._db_executor = None
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Return a description of every workload that regressed beyond ``tolerance``."""
+    regressions = []
+    for name, current in results["workloads"].items():
+        previous = baseline.get("workloads", {}).get(name)
+        if not previous:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            if previous[metric] and current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{name} {metric}: {previous[metric]} -> {current[metric]}")
+        if previous["throughput_rps"] and current["throughput_rps"] < previous["throughput_rps"] * (
+            1 - tolerance
+        ):
+            regressions.append(
+                f"{name} throughput_rps: {previous['throughput_rps']} -> {current['throughput_rps']}"
+            )
+    return regressions
+
+
+def build_config(args: argparse.Namespace) -> Dict[str, Any]:
+    config = copy.deepcopy(load_config())
+    config.setdefault("database", {})["path"] = args.database
+    config.setdefault("api", {})["enabled"] = True
+    config.setdefault("telegram", {})["enabled"] = False
+    config.setdefault("frontend", {}).setdefault("logo", {})["favicon"] = "off"
+    if args.no_cache:
+        config.setdefault("cache", {})["enabled"] = False
+    # Never replace the snapshot of the configured database
+    config.setdefault("snapshot", {})["path"] = f"{args.database}.snapshot"
+    if args.no_snapshot:
+        config["snapshot"]["enabled"] = False
+    return config
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000, help="synthetic BINs to seed (default 100000)")
+    parser.add_argument("--database", default="benchmark.db", help="SQLite file, relative to the instance folder")
+    parser.add_argument("--reseed", action="store_true", help="rebuild the database even if it has --rows BINs")
+    parser.add_argument("--requests", type=int, default=5000, help="requests per workload")
+    parser.add_argument("--warmup", type=int, default=200, help="untimed requests before each workload")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--hit-ratio", type=float, default=0.9, help="share of lookups for stored BINs")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for data and request mix")
+    parser.add_argument("--workloads", default=",".join(WORKLOADS), help="comma separated subset of %(default)s")
+    parser.add_argument("--no-cache", action="store_true", help="disable the in-process lookup cache")
+    parser.add_argument("--no-snapshot", action="store_true", help="read lookups from SQLite instead of the snapshot")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown before flagging (default 0.10)")
+    args = parser.parse_args()
+
+    workloads = [name.strip() for name in args.workloads.split(",") if name.strip()]
+    unknown = set(workloads) - set(WORKLOADS)
+    if unknown:
+        parser.error(f"unknown workloads: {', '.join(sorted(unknown))}")
+
+    app = create_app(build_config(args))
+    with app.app_context():
+        init_db()
+        bins = seed_database(args.rows, args.seed, args.reseed)
+        # Measure the steady state rather than the first rebuild after seeding
+        bin_snapshot.rebuild()
+
+    runners: Dict[str, Callable[[Flask, List[str], int], Dict[str, Any]]] = {
+        "api": lambda app, codes, n: run_threaded(app, api_request, codes, n),
+        "frontend": lambda app, codes, n: run_threaded(app, frontend_request, codes, n),
+        "report": lambda app, codes, n: run_threaded(app, report_request, codes, n),
+        "bot": run_bot,
+    }
+    results: Dict[str, Any] = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "rows": args.rows,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "hit_ratio": args.hit_ratio,
+            "seed": args.seed,
+            "cache": not args.no_cache,
+            "snapshot": not args.no_snapshot,
+        },
+        "workloads": {},
+    }
+    for offset, name in enumerate(workloads):
+        codes = lookup_codes(bins, args.warmup + args.requests, args.hit_ratio, args.seed + offset)
+        if args.warmup:
+            runners[name](app, codes[: args.warmup], args.concurrency)
+        summary = runners[name](app, codes[args.warmup :], args.concurrency)
+        results["workloads"][name] = summary
+        print(
+            f"{name:<9} {summary['throughput_rps']:>9} req/s  p50 {summary['p50_ms']}ms  "
+            f"p95 {summary['p95_ms']}ms  p99 {summary['p99_ms']}ms  errors {summary['errors']}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(results, output, indent=2)
+            output.write("\n")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} of the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
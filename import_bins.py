@@ -0,0 +1,43 @@
+"""Bulk import BIN records from CSV, JSON or NDJSON files."""
+
+from __future__ import annotations
+
+import argparse
+import sys
+
+from app import create_app
+from app.importer import READERS, import_file, print_progress
+from app.schema import init_db
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("path", help="input file, optionally .gz compressed, or - for stdin")
+    parser.add_argument("--format", choices=sorted(READERS), help="input format (default: from extension)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="rows per transaction")
+    parser.add_argument(
+        "--merge",
+        action="store_true",
+        help="keep stored values where the input leaves a field empty",
+    )
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        init_db()
+        result = import_file(
+            args.path,
+            fmt=args.format,
+            chunk_size=args.chunk_size,
+            merge=args.merge,
+            progress=print_progress,
+        )
+    sys.stderr.write("\n")
+    print(
+        f"Imported {result['written']} rows ({result['skipped']} skipped) "
+        f"in {result['seconds']}s, {result['rows_per_second']} rows/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
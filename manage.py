@@ -0,0 +1,187 @@
+"""Maintenance commands for the BIN lookup database."""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import sys
+import time
+
+from flask import current_app
+
+from app import create_app, db
+from app.changes import compact_changes
+from app.importer import READERS, print_progress, rebuild_payloads
+from app.prerender import prerender
+from app.reload import ReloadError, reload_bins, rollback_bins
+from app.schema import init_db
+from app.snapshot import bin_snapshot, compile_snapshot
+from app.stats import refresh_stats
+
+
+def rebuild_payloads_command(args: argparse.Namespace) -> None:
+    """Re-encode the pre-serialized JSON payload of every BIN record."""
+    started = time.perf_counter()
+    with db.engine.connect() as conn:
+        total = rebuild_payloads(conn, batch_size=args.batch_size, commit=True)
+    print(f"Rebuilt {total} payloads in {time.perf_counter() - started:.2f}s")
+
+
+def prerender_command(args: argparse.Namespace) -> None:
+    """Render static HTML for every BIN, re-rendering only changed records."""
+    output = Path(current_app.instance_path, args.output)
+
+    def progress(rendered: int, unchanged: int) -> None:
+        sys.stderr.write(f"\rrendered {rendered}, unchanged {unchanged}")
+        sys.stderr.flush()
+
+    result = prerender(output, full=args.full, progress=progress)
+    sys.stderr.write("\n")
+    print(
+        f"Rendered {result['rendered']} pages, {result['unchanged']} unchanged, "
+        f"{result['removed']} removed in {result['seconds']}s ({output})"
+    )
+
+
+def compile_snapshot_command(args: argparse.Namespace) -> None:
+    """Compile the bins table into the memory-mapped snapshot used for lookups."""
+    path = Path(current_app.instance_path, args.output) if args.output else bin_snapshot.path
+    if path is None:
+        sys.exit("Snapshots are disabled (snapshot.enabled); pass --output to compile one anyway")
+    result = compile_snapshot(path)
+    print(
+        f"Compiled {result['records']} records, {result['pool']} pooled strings, "
+        f"{result['bytes']} bytes at data version {result['data_version']} "
+        f"in {result['seconds']}s ({path})"
+    )
+
+
+def compact_changes_command(args: argparse.Namespace) -> None:
+    """Drop superseded and expired entries from the BIN change log."""
+    retention_days = args.retention_days
+    if retention_days is None:
+        config = current_app.config.get("APP_CONFIG", {})
+        retention_days = float(config.get("changes", {}).get("retention_days", 30))
+    result = compact_changes(retention_days)
+    print(
+        f"Removed {result['superseded']} superseded entries and {result['deletions']} "
+        f"deletions; cursors below {result['horizon']} must resync from 0"
+    )
+
+
+def refresh_stats_command(args: argparse.Namespace) -> None:
+    """Recount the summary statistics from the bins and submissions tables."""
+    started = time.perf_counter()
+    refresh_stats()
+    print(f"Refreshed statistics in {time.perf_counter() - started:.2f}s")
+
+
+def _compile_after_swap() -> None:
+    # Serving processes would rebuild it too; compiling here lets them map
+    # the new data as soon as they notice the swap
+    if bin_snapshot.path is not None:
+        result = compile_snapshot(bin_snapshot.path)
+        print(f"Compiled snapshot of {result['records']} records in {result['seconds']}s")
+
+
+def reload_bins_command(args: argparse.Namespace) -> None:
+    """Replace the whole BIN dataset with a file, without interrupting lookups."""
+    config = current_app.config.get("APP_CONFIG", {})
+    try:
+        result = reload_bins(
+            args.path,
+            fmt=args.format,
+            chunk_size=args.chunk_size,
+            max_shrink=float(config.get("reload", {}).get("max_shrink", 0.1)),
+            force=args.force,
+            progress=print_progress,
+        )
+    except ReloadError as exc:
+        sys.stderr.write("\n")
+        sys.exit(f"Reload aborted, nothing was changed: {exc}")
+    sys.stderr.write("\n")
+    print(
+        f"Swapped in {result['rows']} BINs (was {result['current']}): {result['written']} "
+        f"added or changed, {result['deleted']} deleted, {result['skipped']} input rows "
+        f"skipped in {result['seconds']}s; undo with rollback-bins"
+    )
+    _compile_after_swap()
+
+
+def rollback_bins_command(args: argparse.Namespace) -> None:
+    """Swap the dataset replaced by the last reload back in; takes as long as a reload."""
+    try:
+        result = rollback_bins()
+    except ReloadError as exc:
+        sys.exit(str(exc))
+    print(
+        f"Rolled back: {result['written']} BINs restored or changed, {result['deleted']} "
+        f"deleted in {result['seconds']}s"
+    )
+    _compile_after_swap()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = commands.add_parser("rebuild-payloads", help=rebuild_payloads_command.__doc__)
+    rebuild.add_argument("--batch-size", type=int, default=5000, help="rows per transaction")
+    rebuild.set_defaults(handler=rebuild_payloads_command)
+
+    static = commands.add_parser("prerender", help=prerender_command.__doc__)
+    static.add_argument(
+        "--output",
+        default="prerendered",
+        help="output directory, relative to the instance folder (default: prerendered)",
+    )
+    static.add_argument("--full", action="store_true", help="re-render every page")
+    static.set_defaults(handler=prerender_command)
+
+    snapshot = commands.add_parser("compile-snapshot", help=compile_snapshot_command.__doc__)
+    snapshot.add_argument(
+        "--output",
+        help="snapshot file, relative to the instance folder (default: snapshot.path)",
+    )
+    snapshot.set_defaults(handler=compile_snapshot_command)
+
+    compact = commands.add_parser("compact-changes", help=compact_changes_command.__doc__)
+    compact.add_argument(
+        "--retention-days",
+        type=float,
+        help="keep entries younger than this (default: changes.retention_days)",
+    )
+    compact.set_defaults(handler=compact_changes_command)
+
+    stats = commands.add_parser("refresh-stats", help=refresh_stats_command.__doc__)
+    stats.set_defaults(handler=refresh_stats_command)
+
+    reload = commands.add_parser("reload-bins", help=reload_bins_command.__doc__)
+    reload.add_argument("path", help="input file, optionally .gz compressed, or - for stdin")
+    reload.add_argument("--format", choices=sorted(READERS), help="input format (default: from extension)")
+    reload.add_argument("--chunk-size", type=int, default=5000, help="rows per import transaction")
+    reload.add_argument(
+        "--force",
+        action="store_true",
+        help="swap the dataset in even if it is much smaller than the live one",
+    )
+    reload.set_defaults(handler=reload_bins_command)
+
+    rollback = commands.add_parser(
+        "rollback-bins",
+        help=rollback_bins_command.__doc__,
+        description="Swap the dataset replaced by the last reload or rollback back in. This is "
+        "not instant: like a reload it copies the live table and compares every row while "
+        "holding the write lock, so it takes time proportional to the size of the table.",
+    )
+    rollback.set_defaults(handler=rollback_bins_command)
+
+    args = parser.parse_args()
+    app = create_app()
+    with app.app_context():
+        init_db()
+        args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,20 +2,31 @@
 
 from __future__ import annotations
 
-from app import create_app, db
 from threading import Thread
-from telegram_bot import run_bot, stop_bot
+
+from app import boot_phase, create_app
+from app.lookup import load_presence
+from app.schema import init_db
 
 app = create_app()
-with app.app_context():
-    db.create_all()
+timings = app.config["BOOT_TIMINGS"]
+with boot_phase(timings, "init_db"), app.app_context():
+    init_db()
+with boot_phase(timings, "presence"), app.app_context():
+    load_presence()
 
 cfg = app.config.get("APP_CONFIG", {})
 bot_thread: Thread | None = None
 if cfg.get("telegram", {}).get("enabled"):
-    bot_thread = Thread(target=run_bot)
+    # Imported lazily so the telegram package is only loaded when it is used
+    with boot_phase(timings, "telegram_import"):
+        from telegram_bot import run_bot, stop_bot
+
+    bot_thread = Thread(target=run_bot, args=(app,))
     bot_thread.start()
 
+app.logger.info("Boot timings (ms): %s", timings)
+
 if __name__ == "__main__":
     try:
         app.run("0.0.0.0")
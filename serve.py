@@ -0,0 +1,168 @@
+"""Production entry point: prefork WSGI workers plus one Telegram bot process.
+
+The app is created, the schema upgraded and the BIN presence bitmap
+loaded once in the master, then gunicorn forks ``server.workers`` worker
+processes. Each worker drops the SQLite connections inherited from the
+master and opens its own. When the bot is enabled it runs in a single
+dedicated process owned by the master, so scaling the workers never starts
+a second poller. SIGTERM or SIGINT stop the workers gracefully, flushing
+queued submissions and API key usage, and then stop the bot.
+
+API key buckets and quotas are shared by the workers through memory
+mapped before the fork. Every process, the bot's included, writes its
+metric samples to ``instance/metrics`` so that ``/metrics`` covers all
+of them, whichever worker answers.
+
+Use ``run.py`` for development; this script needs ``gunicorn`` and a
+POSIX system.
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+from pathlib import Path
+import signal
+import sys
+from typing import Any, Dict, Optional
+
+from flask import Flask
+
+from app import create_app, db
+from app.lookup import load_presence
+from app.metrics import sample_files
+from app.schema import init_db
+
+logger = logging.getLogger(__name__)
+
+
+def run_bot_process(metrics_dir: Optional[str] = None, metrics_interval: float = 1.0) -> None:
+    """Run the Telegram bot in the current process until SIGTERM or SIGINT.
+
+    With ``metrics_dir`` its metric samples are shared with the workers.
+    """
+    from telegram_bot import run_bot
+
+    if metrics_dir:
+        sample_files.configure(Path(metrics_dir), metrics_interval)
+        sample_files.start()
+    try:
+        run_bot(stop_signals=(signal.SIGINT, signal.SIGTERM))
+    finally:
+        sample_files.stop()
+
+
+def dispose_engines(app: Flask, close: bool = True) -> None:
+    """Empty the connection pools.
+
+    After a fork pass ``close=False`` so connections still owned by the
+    parent are forgotten rather than closed.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=close)
+
+
+def server_options(app: Flask) -> Dict[str, Any]:
+    """Build gunicorn settings from the ``server`` config section."""
+    config = app.config.get("APP_CONFIG", {})
+    server_cfg = config.get("server", {})
+    workers = int(server_cfg.get("workers", 0)) or os.cpu_count() or 1
+    threads = max(1, int(server_cfg.get("threads", 1)))
+    graceful_timeout = int(server_cfg.get("graceful_timeout", 30))
+    bot_enabled = bool(config.get("telegram", {}).get("enabled"))
+    # Spawned, not forked, so the bot starts from a clean interpreter
+    context = multiprocessing.get_context("spawn")
+
+    def post_fork(server, worker) -> None:
+        dispose_engines(app, close=False)
+        sample_files.start()
+
+    def worker_exit(server, worker) -> None:
+        from app.api_keys import api_keys
+        from app.ingest import submission_queue
+
+        submission_queue.stop()
+        api_keys.stop()
+        sample_files.stop()
+
+    def when_ready(server) -> None:
+        if not bot_enabled:
+            return
+        directory = sample_files.directory
+        server.bot_process = context.Process(
+            target=run_bot_process,
+            args=(str(directory) if directory else None, sample_files.interval),
+            name="telegram-bot",
+        )
+        server.bot_process.start()
+        logger.info("Telegram bot running in process %s", server.bot_process.pid)
+
+    def on_exit(server) -> None:
+        process = getattr(server, "bot_process", None)
+        if process is None or not process.is_alive():
+            return
+        process.terminate()
+        process.join(graceful_timeout)
+        if process.is_alive():
+            logger.warning("Telegram bot did not stop in %ss, killing it", graceful_timeout)
+            process.kill()
+            process.join()
+
+    return {
+        "bind": server_cfg.get("bind", "0.0.0.0:5000"),
+        "workers": workers,
+        "threads": threads,
+        "worker_class": "gthread" if threads > 1 else "sync",
+        "timeout": int(server_cfg.get("timeout", 30)),
+        "graceful_timeout": graceful_timeout,
+        "keepalive": int(server_cfg.get("keepalive", 5)),
+        "preload_app": True,
+        "accesslog": server_cfg.get("access_log") or None,
+        "post_fork": post_fork,
+        "worker_exit": worker_exit,
+        "when_ready": when_ready,
+        "on_exit": on_exit,
+    }
+
+
+def main() -> None:
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        sys.exit("serve.py needs gunicorn (pip install gunicorn); use run.py for development")
+
+    class ProductionServer(BaseApplication):
+        """Gunicorn application serving an already created Flask app."""
+
+        def __init__(self, app: Flask, options: Dict[str, Any]) -> None:
+            self.application = app
+            self.options = options
+            super().__init__()
+
+        def load_config(self) -> None:
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self) -> Flask:
+            return self.application
+
+    logging.basicConfig(level=logging.INFO)
+    app = create_app()
+    metrics_cfg = app.config.get("APP_CONFIG", {}).get("metrics", {})
+    if metrics_cfg.get("enabled", True):
+        sample_files.configure(
+            Path(app.instance_path, "metrics"), float(metrics_cfg.get("flush_seconds", 1))
+        )
+        sample_files.clear()
+    with app.app_context():
+        init_db()
+        # Built once in the master and shared with the workers by the fork
+        load_presence()
+    dispose_engines(app)
+    ProductionServer(app, server_options(app)).run()
+
+
+if __name__ == "__main__":
+    main()
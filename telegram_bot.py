@@ -3,8 +3,12 @@
 from __future__ import annotations
 
 import asyncio
-from typing import List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
 
+from flask import Flask
 from telegram import Update, BotCommand
 from telegram.ext import (
     Application,
@@ -13,38 +17,84 @@ from telegram.ext import (
     ContextTypes,
 )
 
-from app import create_app, db
-from app.models import Bin
+from app import create_app
+from app.schema import init_db
+from app.lookup import find_bin, is_valid_lookup
+from app.metrics import HistogramVec, registry
 
-# Create Flask app for database access
-flask_app = create_app()
-with flask_app.app_context():
-    db.create_all()
-    config = flask_app.config.get("APP_CONFIG", {})
+# Flask app used for database access, set by ``run_bot``
+flask_app: Flask | None = None
 
 _application: Application | None = None
 _loop: asyncio.AbstractEventLoop | None = None
+_db_executor: ThreadPoolExecutor | None = None
 
+HANDLER_LATENCY = registry.register(
+    HistogramVec(
+        "telegram_handler_seconds",
+        "Time spent handling Telegram commands, including replies.",
+        ["handler"],
+    )
+)
+
+Handler = Callable[[Update, ContextTypes.DEFAULT_TYPE], Awaitable[None]]
+
+
+def timed(name: str) -> Callable[[Handler], Handler]:
+    """Record the latency of a command handler under ``name``."""
+
+    def decorator(handler: Handler) -> Handler:
+        histogram = HANDLER_LATENCY.labels(name)
+
+        @wraps(handler)
+        async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+            started = time.perf_counter()
+            try:
+                await handler(update, context)
+            finally:
+                histogram.observe(time.perf_counter() - started)
+
+        return wrapper
+
+    return decorator
+
+
+def handler_stats() -> Dict[str, Dict[str, float]]:
+    """Return latency summaries for every command handler seen so far."""
+    return {labels[0]: histogram.summary() for labels, histogram in HANDLER_LATENCY.items()}
 
-def build_message(record: Bin) -> str:
-    """Build a multi-line message for a BIN record."""
-    lines: List[str] = [f"BIN: {record.bin}"]
+
+def _find_bin_sync(bin_code: str) -> Optional[Dict[str, Any]]:
+    """Run a lookup in its own application context on a worker thread."""
+    with flask_app.app_context():
+        return find_bin(bin_code)
+
+
+async def find_bin_async(bin_code: str) -> Optional[Dict[str, Any]]:
+    """Look up ``bin_code`` without blocking the bot's event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, _find_bin_sync, bin_code)
+
+
+def build_message(record: Dict[str, Any]) -> str:
+    """Build a multi-line message for a serialized BIN record."""
+    lines: List[str] = [f"BIN: {record['bin']}"]
     mapping: List[Tuple[str, str | None]] = [
-        ("Category", record.category),
-        ("Reloadable", record.reloadable),
-        ("International", record.international),
+        ("Category", record.get("category")),
+        ("Reloadable", record.get("reloadable")),
+        ("International", record.get("international")),
     ]
-    if record.max_balance is not None:
-        mapping.append(("Max Balance", f"${record.max_balance}"))
+    if record.get("max_balance") is not None:
+        mapping.append(("Max Balance", f"${record['max_balance']}"))
     mapping.extend(
         [
-            ("Company", record.company),
-            ("Country", record.country),
-            ("Customer Service", record.customer_service),
-            ("Distributor", record.distributor),
-            ("Issuer", record.issuer),
-            ("Type", record.type),
-            ("Website", record.website_url),
+            ("Company", record.get("company")),
+            ("Country", record.get("country")),
+            ("Customer Service", record.get("customer_service")),
+            ("Distributor", record.get("distributor")),
+            ("Issuer", record.get("issuer")),
+            ("Type", record.get("type")),
+            ("Website", record.get("website_url")),
         ]
     )
     for key, value in mapping:
@@ -53,11 +103,13 @@ def build_message(record: Bin) -> str:
     return "\n".join(lines)
 
 
+@timed("start")
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Show help information."""
     await update.message.reply_text("Use /lookup <BIN> to get BIN details.")
 
 
+@timed("lookup")
 async def lookup_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Lookup a BIN and reply with its information."""
     if not context.args:
@@ -65,12 +117,11 @@ async def lookup_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return
 
     bin_code = context.args[0].strip()
-    if not bin_code.isdigit() or len(bin_code) != 6:
-        await update.message.reply_text("Please provide a valid 6 digit BIN.")
+    if not is_valid_lookup(bin_code):
+        await update.message.reply_text("Please provide a valid 6 to 8 digit BIN or card number.")
         return
 
-    with flask_app.app_context():
-        record = Bin.query.filter_by(bin=bin_code).first()
+    record = await find_bin_async(bin_code)
 
     if not record:
         await update.message.reply_text("BIN not found.")
@@ -80,12 +131,22 @@ async def lookup_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     await update.message.reply_text(message)
 
 
-def run_bot() -> None:
+def run_bot(app: Flask | None = None, stop_signals: Sequence[int] | None = None) -> None:
     """
     Entry point used by other modules.
+    Reuses ``app`` for database access, creating one only when run standalone.
     Creates a fresh event loop so it doesn’t conflict with Flask’s loop.
+    ``stop_signals`` may only be given when running in the main thread, e.g.
+    in the dedicated bot process started by ``serve.py``.
     """
-    global _application, _loop
+    global _application, _loop, _db_executor, flask_app
+
+    if app is None:
+        app = create_app()
+        with app.app_context():
+            init_db()
+    flask_app = app
+    config = app.config.get("APP_CONFIG", {})
 
     tg_cfg = config.get("telegram", {})
     if not tg_cfg.get("enabled"):
@@ -97,8 +158,18 @@ def run_bot() -> None:
         print("Telegram bot token not configured")
         return
 
+    # Lookups run on a bounded pool so a slow query never stalls other chats
+    _db_executor = ThreadPoolExecutor(
+        max_workers=int(tg_cfg.get("db_workers", 4)), thread_name_prefix="telegram-db"
+    )
+
     # Build the Application (async) but do NOT call asyncio.run()
-    _application = ApplicationBuilder().token(token).build()
+    _application = (
+        ApplicationBuilder()
+        .token(token)
+        .concurrent_updates(int(tg_cfg.get("concurrent_updates", 16)))
+        .build()
+    )
     _application.add_handler(CommandHandler("start", start_command))
     _application.add_handler(CommandHandler("lookup", lookup_command))
 
@@ -115,13 +186,15 @@ def run_bot() -> None:
     # Since set_my_commands is async, run it on our new loop:
     _loop.run_until_complete(_application.bot.set_my_commands(commands))
 
-    # Now run polling on that same loop:
+    # Now run polling on that same loop; run_polling drives the loop itself
     try:
-        _loop.run_until_complete(_application.run_polling(stop_signals=None))
+        _application.run_polling(stop_signals=stop_signals, close_loop=False)
     finally:
         _application = None
         _loop.close()
         _loop = None
+        _db_executor.shutdown(wait=True)
+        _db_executor = None
 
 
 def stop_bot() -> None:
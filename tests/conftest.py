@@ -0,0 +1,80 @@
+"""Shared fixtures: an app on a throwaway database per test."""
+
+from __future__ import annotations
+
+import copy
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import create_app, db, load_config  # noqa: E402
+from app.cache import bin_cache  # noqa: E402
+from app.lookup import writer_sync  # noqa: E402
+from app.prefix_index import prefix_index  # noqa: E402
+from app.presence import bin_presence  # noqa: E402
+from app import search  # noqa: E402
+
+
+def merge(base: dict, overrides: dict) -> dict:
+    """Return ``base`` with ``overrides`` applied recursively."""
+    result = copy.deepcopy(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(result.get(key), dict):
+            result[key] = merge(result[key], value)
+        else:
+            result[key] = value
+    return result
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Build apps on a database in ``tmp_path``; keyword overrides go into the config."""
+    created = []
+
+    def factory(**overrides):
+        config = merge(
+            load_config(),
+            {
+                "database": {"path": str(tmp_path / "bins.db")},
+                "snapshot": {"path": str(tmp_path / "bins.snapshot")},
+                "frontend": {"logo": {"favicon": "off"}},
+                "api": {"api_key": "test-key"},
+            },
+        )
+        app = create_app(merge(config, overrides))
+        writer_sync.version = None
+        prefix_index.invalidate()
+        bin_presence.invalidate()
+        bin_cache.clear()
+        search._fts_available = None
+        created.append(app)
+        return app
+
+    yield factory
+    for app in created:
+        with app.app_context():
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+
+
+@pytest.fixture
+def app(make_app):
+    """An app with an initialized, empty database, inside an app context."""
+    from app.schema import init_db
+
+    application = make_app()
+    with application.app_context():
+        init_db()
+        yield application
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+API_HEADERS = {"X-API-Key": "test-key"}
@@ -0,0 +1,76 @@
+"""Admin Panel pages."""
+
+from __future__ import annotations
+
+import re
+
+from sqlalchemy import text
+
+from app import db
+from app.schema import init_db
+
+
+def _submission_ids(html: str) -> list:
+    return [int(sub_id) for sub_id in re.findall(r'href="/admin/submissions/(\d+)"', html)]
+
+
+def _next_url(html: str):
+    match = re.search(r'<a class="button" href="([^"]+)">Next page</a>', html)
+    return match.group(1).replace("&amp;", "&") if match else None
+
+
+def test_submission_pages_cover_upgraded_rows_once(make_app):
+    app = make_app(admin={"enabled": True, "page_size": 3})
+    with app.app_context():
+        # A submissions table from before ``created_at`` existed
+        with db.engine.begin() as conn:
+            conn.execute(
+                text("CREATE TABLE submissions (id INTEGER PRIMARY KEY, bin VARCHAR(8) NOT NULL)")
+            )
+            for number in range(7):
+                conn.execute(text("INSERT INTO submissions (bin) VALUES (:bin)"), {"bin": f"41111{number}"})
+        init_db()
+        # Rows backfilled by earlier releases hold second precision text
+        with db.engine.begin() as conn:
+            for number in range(4):
+                conn.execute(
+                    text(
+                        "INSERT INTO submissions (bin, created_at) "
+                        "VALUES (:bin, '2024-01-01 10:00:00')"
+                    ),
+                    {"bin": f"52222{number}"},
+                )
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["admin_logged_in"] = True
+
+        seen = []
+        url = "/admin/submissions"
+        for _ in range(10):
+            html = client.get(url).get_data(as_text=True)
+            seen.extend(_submission_ids(html))
+            url = _next_url(html)
+            if url is None:
+                break
+        assert url is None
+        assert sorted(seen) == list(range(1, 12))
+
+
+def test_dashboard_search_without_read_pool(make_app):
+    app = make_app(
+        admin={"enabled": True},
+        database={"read_pool_size": 0, "write_timeout": 2},
+    )
+    with app.app_context():
+        init_db()
+        with db.engine.begin() as conn:
+            conn.execute(text("INSERT INTO bins (bin, issuer) VALUES ('411111', 'Test Bank')"))
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["admin_logged_in"] = True
+
+    # The search query holds the only writer connection while the
+    # statistics are read
+    response = client.post("/admin/", data={"action": "search", "bin": "411111"})
+    assert response.status_code == 200
+    assert "Test Bank" in response.get_data(as_text=True)
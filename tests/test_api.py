@@ -0,0 +1,94 @@
+"""Batch endpoints of the REST API."""
+
+from __future__ import annotations
+
+import io
+import json
+
+import pytest
+
+from conftest import API_HEADERS
+
+LINE = b"4111111111111111\n"
+
+
+def _post_chunked(client, path: str, body: bytes):
+    """POST ``body`` without a Content-Length, as a chunked upload arrives from the server."""
+    return client.post(
+        path,
+        input_stream=io.BytesIO(body),
+        headers={**API_HEADERS, "Transfer-Encoding": "chunked", "Content-Type": "text/plain"},
+        environ_overrides={"wsgi.input_terminated": True},
+    )
+
+
+@pytest.mark.parametrize("path", ["/api/bins/batch", "/api/pans/check"])
+def test_body_limit_covers_chunked_uploads(make_app, path):
+    from app.schema import init_db
+
+    app = make_app(api={"batch": {"max_body_bytes": 200}})
+    with app.app_context():
+        init_db()
+    client = app.test_client()
+
+    exact = LINE * 11 + b"\n" * 13
+    assert len(exact) == 200
+    assert _post_chunked(client, path, exact).status_code == 200
+    for response in (
+        _post_chunked(client, path, exact + b"\n"),
+        client.post(path, headers=API_HEADERS, json=["4111111111111111"] * 20),
+    ):
+        assert response.status_code == 413
+        assert response.json == {"error": "Request body too large"}
+
+
+def test_export_without_read_pool(make_app):
+    from sqlalchemy import text
+
+    from app import db
+    from app.schema import init_db
+
+    app = make_app(database={"read_pool_size": 0, "write_timeout": 2})
+    with app.app_context():
+        init_db()
+        with db.engine.begin() as conn:
+            conn.execute(
+                text("INSERT INTO bins (bin, issuer) VALUES (:bin, 'Test Bank')"),
+                [{"bin": str(400000 + number)} for number in range(2500)],
+            )
+    client = app.test_client()
+
+    for fmt in ("ndjson", "csv"):
+        response = client.get(f"/api/bins/export?format={fmt}", headers=API_HEADERS)
+        assert response.status_code == 200
+        lines = response.get_data(as_text=True).splitlines()
+        assert len(lines) == 2500 + (fmt == "csv")
+        assert "400000" in lines[fmt == "csv"]
+
+
+def test_rows_without_payload_are_encoded(make_app):
+    from sqlalchemy import text
+
+    from app import db
+    from app.schema import init_db
+
+    app = make_app(snapshot={"enabled": False})
+    with app.app_context():
+        init_db()
+        with db.engine.begin() as conn:
+            conn.execute(
+                text(
+                    "INSERT INTO bins (bin, range_start, range_end, issuer) "
+                    "VALUES (:bin, :bin * 100, :bin * 100 + 99, :issuer)"
+                ),
+                [{"bin": "411111", "issuer": "First"}, {"bin": "522222", "issuer": "Second"}],
+            )
+    client = app.test_client()
+
+    response = client.post("/api/bins/batch", headers=API_HEADERS, json=["411111", "522222"])
+    assert [line["data"]["issuer"] for line in map(json.loads, response.text.splitlines())] == [
+        "First",
+        "Second",
+    ]
+    response = client.get("/api/bins/changes", headers=API_HEADERS)
+    assert [change["data"]["issuer"] for change in response.json["changes"]] == ["First", "Second"]
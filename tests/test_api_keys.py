@@ -0,0 +1,38 @@
+"""API key limits shared by forked worker processes."""
+
+from __future__ import annotations
+
+import os
+
+from app.api_keys import ApiKeyStore
+
+
+def _consume_in_child(store: ApiKeyStore, key, times: int) -> None:
+    pid = os.fork()
+    if pid == 0:
+        try:
+            for _ in range(times):
+                store.consume(key)
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+
+
+def test_quota_and_bucket_are_shared_after_fork():
+    store = ApiKeyStore()
+    store.configure({"keys": [{"name": "partner", "key": "secret", "daily_quota": 5}]})
+    key = store.authenticate("secret")
+    _consume_in_child(store, key, 3)
+    assert store.consume(key) == (None, 0.0)
+    assert store.consume(key) == (None, 0.0)
+    assert store.consume(key)[0] == "Daily quota exceeded"
+    assert store.usage(key)["requests_today"] == 5
+
+    store.configure(
+        {"keys": [{"name": "partner", "key": "secret", "rate_per_second": 0.001, "burst": 2}]}
+    )
+    key = store.authenticate("secret")
+    _consume_in_child(store, key, 2)
+    reason, retry_after = store.consume(key)
+    assert reason == "Rate limit exceeded"
+    assert retry_after > 0
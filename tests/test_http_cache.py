@@ -0,0 +1,41 @@
+"""HTTP validators and pre-rendered pages."""
+
+from __future__ import annotations
+
+from app.prerender import prerender
+
+from conftest import API_HEADERS
+
+
+def _recreate(client, company: str) -> None:
+    client.delete("/api/bin/411111", headers=API_HEADERS)
+    record = {"bin": "411111", "company": company, "issuer": company, "country": "US"}
+    response = client.post("/api/bin", headers=API_HEADERS, json=record)
+    assert response.status_code == 201
+
+
+def test_recreated_bin_does_not_match_old_etag(client):
+    _recreate(client, "First Bank")
+    first = client.get("/api/bin/411111", headers=API_HEADERS)
+    assert client.get(
+        "/api/bin/411111", headers={**API_HEADERS, "If-None-Match": first.headers["ETag"]}
+    ).status_code == 304
+
+    _recreate(client, "Second Bank")
+    second = client.get(
+        "/api/bin/411111", headers={**API_HEADERS, "If-None-Match": first.headers["ETag"]}
+    )
+    assert second.status_code == 200
+    assert second.json["company"] == "Second Bank"
+    assert second.headers["ETag"] != first.headers["ETag"]
+    page = client.get("/bin/411111", headers={"If-None-Match": first.headers["ETag"]})
+    assert page.status_code == 200
+
+
+def test_prerender_picks_up_recreated_bin(client, tmp_path):
+    _recreate(client, "First Bank")
+    assert prerender(tmp_path / "pages")["rendered"] == 1
+    _recreate(client, "Second Bank")
+    result = prerender(tmp_path / "pages")
+    assert (result["rendered"], result["unchanged"]) == (1, 0)
+    assert "Second Bank" in (tmp_path / "pages" / "bin" / "411111.html").read_text(encoding="utf-8")
@@ -0,0 +1,67 @@
+"""Streaming importer."""
+
+from __future__ import annotations
+
+from app.importer import import_file, import_rows, normalize_row
+
+from conftest import API_HEADERS
+
+
+def test_explicit_ranges_are_mapped_to_eight_digit_keys():
+    row = normalize_row({"bin": "400115", "iin_start": "400115", "iin_end": "400119"})
+    assert (row["range_start"], row["range_end"]) == (40011500, 40011999)
+    row = normalize_row({"bin": "40011512", "range_start": 40011512, "range_end": 40011512})
+    assert (row["range_start"], row["range_end"]) == (40011512, 40011512)
+
+
+def test_ranges_not_covering_their_bin_are_rejected():
+    assert normalize_row({"bin": "400115", "iin_start": "400119", "iin_end": "400115"}) is None
+    assert normalize_row({"bin": "400115", "iin_start": "400116", "iin_end": "400119"}) is None
+
+
+def test_imported_range_is_found_end_to_end(client):
+    result = import_rows(
+        [
+            {"bin": "400115", "iin_start": "400115", "iin_end": "400119", "issuer": "Range Bank"},
+            {"bin": "510000", "iin_start": "510001", "iin_end": "510009"},
+        ]
+    )
+    assert (result["written"], result["skipped"]) == (1, 1)
+    for code in ("400115", "400119", "4001190000000000"):
+        response = client.get(f"/api/bin/{code}", headers=API_HEADERS)
+        assert response.status_code == 200, code
+        assert response.json["bin"] == "400115"
+    assert client.get("/api/bin/400120", headers=API_HEADERS).status_code == 404
+
+
+RANGES_CSV = """\
+iin_start,iin_end,number_length,number_luhn,scheme,brand,type,prepaid,country,bank_name,bank_logo,bank_url,bank_phone,bank_city
+400115,400119,16,true,visa,Traditional,debit,false,US,Range Bank,,www.rangebank.com,+18005551234,New York
+41111122,,16,true,visa,Classic,credit,true,GB,Narrow Bank,,,,
+34,,15,true,amex,,credit,,US,American Express,,www.americanexpress.com,,
+"""
+
+
+def test_binlist_ranges_csv_is_keyed_by_range_start(client, tmp_path):
+    path = tmp_path / "ranges.csv"
+    path.write_text(RANGES_CSV)
+    result = import_file(str(path))
+    assert (result["written"], result["skipped"]) == (3, 0)
+
+    expected = {
+        "4001170000000000": ("400115", "Range Bank", "US", "Debit"),
+        "4111112233334444": ("41111122", "Narrow Bank", "GB", "Prepaid"),
+        "341234": ("340000", "American Express", "US", "Credit"),
+    }
+    for number, (code, issuer, country, category) in expected.items():
+        response = client.get(f"/api/bin/{number}", headers=API_HEADERS)
+        assert response.status_code == 200, number
+        data = response.json
+        assert (data["bin"], data["issuer"], data["country"], data["category"]) == (
+            code,
+            issuer,
+            country,
+            category,
+        )
+    data = client.get("/api/bin/400115", headers=API_HEADERS).json
+    assert (data["website_url"], data["customer_service"]) == ("www.rangebank.com", "+18005551234")
@@ -0,0 +1,97 @@
+"""Buffered submission queue: group commits, retries and backpressure."""
+
+from __future__ import annotations
+
+from threading import Event
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+
+from app import db, ingest
+from app.ingest import SubmissionQueue
+from app.models import Submission
+
+REPORT = {"issuer": "Test Bank"}
+
+
+class FlakyEngine:
+    """Engine whose first ``failures`` transactions fail, optionally after ``gate`` opens."""
+
+    def __init__(self, engine, failures: int = 0, gate: Event | None = None) -> None:
+        self.engine = engine
+        self.failures = failures
+        self.gate = gate
+
+    def begin(self):
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.failures:
+            self.failures -= 1
+            raise OperationalError("INSERT", {}, Exception("database is locked"))
+        return self.engine.begin()
+
+
+def _stored() -> int:
+    db.session.remove()
+    return db.session.execute(select(func.count()).select_from(Submission)).scalar()
+
+
+def _queue(app, monkeypatch, engine=None, **options) -> SubmissionQueue:
+    """Replace the app's submission queue with a started one writing through ``engine``."""
+    queue = SubmissionQueue(**{"max_delay": 0.01, "retry_delay": 0.01, **options})
+    monkeypatch.setattr(ingest, "submission_queue", queue)
+    queue.start(app)
+    if engine is not None:
+        queue._engine = engine
+    return queue
+
+
+def test_duplicates_in_a_batch_are_stored_once(app):
+    queue = SubmissionQueue()
+    queue._engine = db.engine
+    values = {"bin": "411111", "issuer": "Test Bank", "created_at": None}
+    queue._write([values, {**values}, {**values, "bin": "522222"}])
+    assert (queue.written, queue.collapsed, queue.failed) == (2, 1, 0)
+    assert _stored() == 2
+
+
+def test_failed_commits_are_retried(app, monkeypatch):
+    queue = _queue(app, monkeypatch, FlakyEngine(db.engine, failures=2))
+    client = app.test_client()
+    assert client.post("/api/report/411111", json=REPORT).status_code == 202
+    queue.stop()
+    assert (queue.written, queue.retried, queue.failed) == (1, 2, 0)
+    assert _stored() == 1
+
+
+def test_batch_is_dropped_once_retries_run_out(app, monkeypatch):
+    queue = _queue(app, monkeypatch, FlakyEngine(db.engine, failures=10), max_retries=2)
+    client = app.test_client()
+    assert client.post("/api/report/411111", json=REPORT).status_code == 202
+    queue.stop()
+    assert (queue.written, queue.retried, queue.failed) == (0, 2, 1)
+    assert _stored() == 0
+
+
+def test_full_queue_answers_429(app, monkeypatch):
+    gate = Event()
+    queue = _queue(app, monkeypatch, FlakyEngine(db.engine, gate=gate), max_size=1, batch_size=1)
+    client = app.test_client()
+    # The writer holds one report while it waits on the gate, the queue one more
+    statuses = [
+        client.post(f"/api/report/41111{number}", json=REPORT).status_code for number in range(4)
+    ]
+    gate.set()
+    queue.stop()
+    assert statuses[0] == 202
+    assert statuses[-1] == 429
+    assert queue.accepted + queue.rejected == 4
+    assert queue.written == queue.accepted == _stored()
+
+
+def test_stopped_writer_answers_503(app, monkeypatch):
+    queue = _queue(app, monkeypatch)
+    queue.stop()
+    response = app.test_client().post("/api/report/411111", json=REPORT)
+    assert response.status_code == 503
+    assert queue.accepted == 0
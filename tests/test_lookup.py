@@ -0,0 +1,76 @@
+"""Shared lookup path: presence bitmap, prefix index and writer sync."""
+
+from __future__ import annotations
+
+from sqlalchemy import text
+
+from app import db
+from app.lookup import find_bin_entry, load_presence, writer_sync
+from app.models import Bin
+from app.prefix_index import prefix_index
+from app.presence import bin_presence
+from app.schema import init_db
+from app.snapshot import Snapshot, compile_snapshot
+
+
+def test_bitmap_built_before_fork_is_rebuilt_after_foreign_write(make_app):
+    app = make_app(snapshot={"enabled": False})
+    with app.app_context():
+        init_db()
+        # Built in the server master; the workers inherit it with a fresh WriterSync
+        load_presence()
+        assert find_bin_entry("888888") is None
+        writer_sync.version = None
+        with db.engine.begin() as conn:
+            conn.execute(
+                text(
+                    "INSERT INTO bins (bin, range_start, range_end) "
+                    "VALUES ('888888', 88888800, 88888899)"
+                )
+            )
+        assert bin_presence.excludes("888888") is True
+        writer_sync.version = None
+        assert find_bin_entry("888888") is not None
+
+
+def test_foreign_write_patches_the_prefix_index(make_app):
+    app = make_app(snapshot={"enabled": False})
+    with app.app_context():
+        init_db()
+        with db.engine.begin() as conn:
+            conn.execute(
+                text(
+                    "INSERT INTO bins (bin, range_start, range_end) "
+                    "VALUES ('411111', 41111100, 41111199)"
+                )
+            )
+        assert find_bin_entry("41111122").bin == "411111"
+        db.session.remove()
+        rebuilds = prefix_index.rebuilds, bin_presence.rebuilds
+        with db.engine.begin() as conn:
+            conn.execute(
+                text(
+                    "INSERT INTO bins (bin, range_start, range_end) "
+                    "VALUES ('41111122', 41111122, 41111122)"
+                )
+            )
+            conn.execute(text("DELETE FROM bins WHERE bin = '411111'"))
+        writer_sync.checked = 0
+        assert find_bin_entry("41111122").bin == "41111122"
+        assert find_bin_entry("41111133") is None
+        assert (prefix_index.rebuilds, bin_presence.rebuilds) == rebuilds
+
+
+def test_range_bounds_stay_out_of_responses(make_app, tmp_path):
+    app = make_app(snapshot={"enabled": False})
+    with app.app_context():
+        init_db()
+        db.session.add(Bin(bin="41111122", issuer="Test Bank"))
+        db.session.commit()
+        served = [find_bin_entry("4111112233").payload]
+        compile_snapshot(tmp_path / "check.snapshot")
+        snapshot = Snapshot(tmp_path / "check.snapshot")
+        served.append(snapshot.record(snapshot.match("4111112233"))[1])
+    for payload in served:
+        assert '"issuer":"Test Bank"' in payload
+        assert "range_" not in payload
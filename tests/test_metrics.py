@@ -0,0 +1,103 @@
+"""Metric samples merged across the processes of a prefork deployment."""
+
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app import monitoring
+from app.metrics import CallbackMetric, CounterVec, Registry, SampleFiles
+
+
+def _write_samples(path, families) -> None:
+    """Write ``(name, kind, samples)`` families the way another process would."""
+    path.write_text(
+        json.dumps(
+            {
+                "families": [
+                    {"name": name, "documentation": "Test.", "kind": kind, "samples": samples}
+                    for name, kind, samples in families
+                ]
+            }
+        )
+    )
+
+
+def test_render_merges_other_processes(tmp_path):
+    registry = Registry()
+    requests = registry.register(CounterVec("requests_total", "Requests.", ["endpoint"]))
+    registry.register(CallbackMetric("queue", "Queue depth.", ["stat"], lambda: [(("depth",), 3)]))
+    requests.inc("lookup", amount=2)
+    files = SampleFiles(registry)
+    files.configure(tmp_path)
+
+    # A worker that has exited
+    exited = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True)
+    dead_pid = int(exited.stdout)
+    _write_samples(
+        tmp_path / f"{dead_pid}.json",
+        [
+            ("requests_total", "counter", [["", {"endpoint": "lookup"}, 5]]),
+            ("queue", "gauge", [["", {"stat": "depth"}, 7]]),
+        ],
+    )
+    # The bot process, with a family no worker registers
+    bot = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        _write_samples(
+            tmp_path / f"{bot.pid}.json",
+            [("telegram_handler_seconds_count", "counter", [["", {"handler": "lookup"}, 4]])],
+        )
+        text = files.render()
+    finally:
+        bot.kill()
+        bot.wait()
+
+    assert text.count("# TYPE requests_total counter") == 1
+    assert 'requests_total{endpoint="lookup"} 7' in text
+    assert 'telegram_handler_seconds_count{handler="lookup"} 4' in text
+    assert 'queue{stat="depth",pid="' in text
+    assert f'pid="{dead_pid}"' not in text
+
+
+def test_failed_statements_leave_no_timing_behind():
+    engine = create_engine("sqlite://")
+    monitoring._instrument_engine(engine, "failing")
+    selects = monitoring.SQL_LATENCY.labels("failing", "select")
+    with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM missing"))
+        conn.execute(text("SELECT 1"))
+        assert not conn.info.get("metrics_started")
+    assert selects.count == 1
+
+
+def test_lifetime_totals_are_counters(client):
+    text = client.get("/metrics").get_data(as_text=True)
+    for name in ("submission_queue", "lookup_cache", "bin_snapshot", "bin_presence"):
+        assert f"# TYPE {name} gauge" in text
+        assert f"# TYPE {name}_total counter" in text
+    assert 'lookup_cache{stat="size"}' in text
+    assert 'lookup_cache_total{stat="hits"}' in text
+    assert 'lookup_cache{stat="hits"}' not in text
+    assert 'submission_queue{stat="depth"}' in text
+    assert 'submission_queue_total{stat="failed"}' in text
+
+
+def test_metrics_only_answer_allowed_networks(make_app):
+    remote = {"REMOTE_ADDR": "10.1.2.3"}
+    mapped = {"REMOTE_ADDR": "::ffff:127.0.0.1"}
+    client = make_app().test_client()
+    assert client.get("/metrics").status_code == 200
+    assert client.get("/metrics", environ_overrides=remote).status_code == 403
+    assert client.get("/metrics", environ_overrides=mapped).status_code == 200
+
+    client = make_app(metrics={"allowed_networks": ["10.0.0.0/8"]}).test_client()
+    assert client.get("/metrics", environ_overrides=remote).status_code == 200
+    assert client.get("/metrics").status_code == 403
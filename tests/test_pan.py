@@ -0,0 +1,71 @@
+"""Card number checks agree with a plain Python Luhn and brand lookup."""
+
+from __future__ import annotations
+
+import random
+from typing import Optional
+
+from app import pan
+
+
+def _luhn(digits: str) -> bool:
+    total = 0
+    for position, char in enumerate(reversed(digits)):
+        value = int(char)
+        if position % 2:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return total % 10 == 0
+
+
+def _brand(digits: str) -> Optional[str]:
+    prefix = int(digits[:6])
+    for brand, low, high in pan.BRAND_RANGES:
+        if low <= prefix <= high:
+            return brand
+    return None
+
+
+def _digits(rng: random.Random, count: int) -> str:
+    return "".join(rng.choice("0123456789") for _ in range(count))
+
+
+def _numbers():
+    rng = random.Random(23)
+    numbers = []
+    # Both ends of every brand range and the prefixes just outside them
+    for _, low, high in pan.BRAND_RANGES:
+        for prefix in (low - 1, low, high, high + 1):
+            for length in (12, 16, 19):
+                numbers.append(str(prefix) + _digits(rng, length - 6))
+    for _ in range(2000):
+        length = rng.randint(pan.PAN_MIN_DIGITS, pan.PAN_MAX_DIGITS)
+        numbers.append(_digits(rng, length))
+    # Valid by construction: fix the check digit of some of them
+    for number in numbers[:500:3]:
+        for digit in "0123456789":
+            candidate = number[:-1] + digit
+            if _luhn(candidate):
+                numbers.append(candidate)
+                break
+    return numbers
+
+
+def test_vectorized_checks_match_plain_python():
+    numbers = _numbers()
+    valid, brands = pan.check_numbers(numbers)
+    assert valid == [_luhn(number) for number in numbers]
+    assert brands == [_brand(number) for number in numbers]
+    assert any(valid) and not all(valid)
+    assert None in brands and len(set(brands)) > 5
+
+
+def test_known_card_numbers():
+    numbers = ["4111111111111111", "5500000000000004", "4111111111111112"]
+    assert pan.check_numbers(numbers) == (
+        [True, True, False],
+        ["visa", "mastercard", "visa"],
+    )
+    assert pan.check_numbers([]) == ([], [])
@@ -0,0 +1,49 @@
+"""Prefix index: single-BIN changes against a full rebuild."""
+
+from __future__ import annotations
+
+import random
+
+from app.prefix_index import PrefixIndex, key_range
+
+
+def _ranges(rng: random.Random, count: int):
+    """Nested ranges of 6-8 digit BINs under a few shared prefixes."""
+    ranges = {}
+    while len(ranges) < count:
+        code = rng.choice(["4111", "4112", "5500"]) + "".join(
+            rng.choice("0123") for _ in range(rng.choice([2, 3, 4]))
+        )
+        ranges[code] = key_range(code)
+    return ranges
+
+
+def test_put_and_discard_match_a_rebuilt_index():
+    rng = random.Random(7)
+    stored = _ranges(rng, 120)
+    patched = PrefixIndex()
+    patched.build((start, end, code) for code, (start, end) in stored.items())
+    candidates = list(_ranges(rng, 400).items())
+    for step in range(300):
+        code, (start, end) = rng.choice(candidates)
+        if code in stored and step % 2:
+            del stored[code]
+            patched.discard(code)
+        else:
+            stored[code] = (start, end)
+            patched.put(code, start, end)
+        assert not patched.dirty
+        rebuilt = PrefixIndex()
+        rebuilt.build((low, high, name) for name, (low, high) in stored.items())
+        for probe, _ in candidates[::7]:
+            assert patched.match(probe + "12") == rebuilt.match(probe + "12"), (step, probe)
+    assert len(patched) == len(stored)
+
+
+def test_changes_to_a_dirty_index_wait_for_the_rebuild():
+    index = PrefixIndex()
+    version = index.version
+    index.put("411111", *key_range("411111"))
+    assert len(index) == 0
+    index.build([], version)
+    assert index.dirty
@@ -0,0 +1,92 @@
+"""Whole-dataset reloads through the shadow table, and rolling them back."""
+
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import inspect, text
+
+from app import db, reload
+from app.reload import ReloadError, reload_bins, rollback_bins
+
+HEADER = "bin,issuer\n"
+
+
+def _dataset(tmp_path, name: str, rows: dict) -> str:
+    path = tmp_path / name
+    path.write_text(HEADER + "".join(f"{code},{issuer}\n" for code, issuer in rows.items()))
+    return str(path)
+
+
+def _query(sql: str) -> dict:
+    with db.engine.connect() as conn:
+        return dict(conn.execute(text(sql)).all())
+
+
+def _table(name: str = "bins") -> dict:
+    return _query(f"SELECT bin, issuer FROM {name}")
+
+
+def _versions() -> dict:
+    return _query("SELECT bin, version FROM bins")
+
+
+def test_reload_and_rollback(app, tmp_path):
+    first = {"411111": "First", "522222": "Second"}
+    second = {"411111": "First", "522222": "Changed", "633333": "Third"}
+    reload_bins(_dataset(tmp_path, "first.csv", first))
+    versions = _versions()
+
+    result = reload_bins(_dataset(tmp_path, "second.csv", second))
+    assert (result["written"], result["deleted"]) == (2, 0)
+    assert _table() == second
+    assert _table("bins_previous") == first
+    # Unchanged rows keep their version
+    assert _versions()["411111"] == versions["411111"]
+    assert not inspect(db.engine).has_table("bins_shadow")
+
+    result = rollback_bins()
+    assert (result["written"], result["deleted"]) == (1, 1)
+    assert _table() == first
+    assert _table("bins_previous") == second
+    assert not inspect(db.engine).has_table("bins_shadow")
+
+    rollback_bins()
+    assert _table() == second
+
+
+def test_refused_dataset_changes_nothing(app, tmp_path):
+    first = {"411111": "First", "522222": "Second"}
+    reload_bins(_dataset(tmp_path, "first.csv", first))
+    with pytest.raises(ReloadError):
+        reload_bins(_dataset(tmp_path, "small.csv", {"411111": "First"}), max_shrink=0.1)
+    assert _table() == first
+    assert _table("bins_previous") == {}
+
+
+def test_rollback_without_previous_dataset(app):
+    with pytest.raises(ReloadError):
+        rollback_bins()
+
+
+def test_failed_swap_keeps_the_previous_dataset(app, tmp_path, monkeypatch):
+    first = {"411111": "First"}
+    second = {"411111": "Second"}
+    reload_bins(_dataset(tmp_path, "first.csv", first))
+    reload_bins(_dataset(tmp_path, "second.csv", second))
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(reload, "upsert_statement", broken)
+    with pytest.raises(RuntimeError):
+        reload_bins(_dataset(tmp_path, "third.csv", {"411111": "Third"}))
+    assert _table() == second
+    assert _table("bins_previous") == first
+    with pytest.raises(RuntimeError):
+        rollback_bins()
+    assert _table() == second
+    assert _table("bins_previous") == first
+
+    monkeypatch.undo()
+    rollback_bins()
+    assert _table() == first
@@ -0,0 +1,54 @@
+"""Consensus review of pending submissions."""
+
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+from sqlalchemy import text
+
+from app import db, review
+from app.models import Bin, Submission
+
+
+def _submit(conn, bin_code: str, issuer: str) -> None:
+    conn.execute("INSERT INTO submissions (bin, issuer) VALUES (?, ?)", (bin_code, issuer))
+
+
+def test_approve_counts_under_the_write_lock(app, monkeypatch, tmp_path):
+    with db.engine.begin() as conn:
+        for _ in range(2):
+            conn.execute(text("INSERT INTO submissions (bin, issuer) VALUES ('411111', 'First Bank')"))
+    db.session.remove()
+
+    counted = review.consensus_for
+    other = sqlite3.connect(tmp_path / "bins.db", timeout=0)
+
+    def consensus_then_submit(bins):
+        results = counted(bins)
+        # Another worker storing a submission right after the votes were counted
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            with other:
+                _submit(other, "411111", "Second Bank")
+        return results
+
+    monkeypatch.setattr(review, "consensus_for", consensus_then_submit)
+    assert review.approve(["411111"]) == 1
+    with other:
+        _submit(other, "411111", "Second Bank")
+    other.close()
+
+    assert Bin.query.filter_by(bin="411111").one().issuer == "First Bank"
+    assert [row.issuer for row in Submission.query.filter_by(bin="411111")] == ["Second Bank"]
+
+
+def test_approve_leaves_unrelated_pending_work_alone(app):
+    with db.engine.begin() as conn:
+        conn.execute(text("INSERT INTO submissions (bin, issuer) VALUES ('411111', 'First Bank')"))
+    db.session.add(Bin(bin="522222", issuer="Unrelated"))
+    db.session.flush()
+
+    assert review.approve(["411111"]) == 1
+    db.session.remove()
+    assert Bin.query.filter_by(bin="522222").first() is None
+    assert Bin.query.filter_by(bin="411111").one().issuer == "First Bank"
@@ -0,0 +1,35 @@
+"""In-place upgrades of databases created by older versions."""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+
+from sqlalchemy import text
+
+from app import db
+from app.schema import init_db
+
+
+def test_upgrade_encodes_payloads_of_existing_rows(make_app, tmp_path):
+    # The original schema, before ranges, versions and payloads were stored
+    with sqlite3.connect(tmp_path / "bins.db") as conn:
+        conn.execute(
+            "CREATE TABLE bins (id INTEGER PRIMARY KEY AUTOINCREMENT, bin VARCHAR(8) NOT NULL "
+            "UNIQUE, category VARCHAR(50), reloadable VARCHAR(50), international VARCHAR(50), "
+            "max_balance INTEGER, company VARCHAR(100), country VARCHAR(100), "
+            "customer_service VARCHAR(100), distributor VARCHAR(100), issuer VARCHAR(100), "
+            "type VARCHAR(50), website_url VARCHAR(200))"
+        )
+        conn.execute("INSERT INTO bins (bin, issuer, max_balance) VALUES ('411111', 'Test Bank', 500)")
+    conn.close()
+
+    app = make_app()
+    with app.app_context():
+        init_db()
+        payload = db.session.execute(text("SELECT payload FROM bins")).scalar()
+    assert payload is not None
+    data = json.loads(payload)
+    assert data["bin"] == "411111"
+    assert (data["issuer"], data["max_balance"]) == ("Test Bank", 500)
+    assert "range_start" not in data
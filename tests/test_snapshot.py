@@ -0,0 +1,63 @@
+"""Compiled BIN snapshot: when a mapped snapshot may be served."""
+
+from __future__ import annotations
+
+from sqlalchemy import text
+
+from app import db
+from app.lookup import find_bin_entry, writer_sync
+from app.models import fill_payloads
+from app.schema import init_db
+from app.snapshot import bin_snapshot
+
+CONFIG = {"snapshot": {"rebuild_delay_ms": 60000}, "presence": {"enabled": False}}
+
+
+def _insert(bin_code: str) -> None:
+    start = int(bin_code.ljust(8, "0"))
+    with db.engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO bins (bin, range_start, range_end) VALUES (:bin, :start, :end)"),
+            {"bin": bin_code, "start": start, "end": start + 99},
+        )
+
+
+def test_snapshot_of_another_database_is_not_served(make_app, tmp_path):
+    app = make_app(**CONFIG)
+    with app.app_context():
+        init_db()
+        _insert("411111")
+        compiled = bin_snapshot.rebuild()
+        writer_sync.version = None
+        assert find_bin_entry("411111") is not None
+        assert bin_snapshot.current() is not None
+
+    # A fresh database at a new path reaches the same data version with other rows
+    other = make_app(database={"path": str(tmp_path / "other.db")}, **CONFIG)
+    with other.app_context():
+        init_db()
+        _insert("522222")
+        version = db.session.execute(
+            text("SELECT version FROM data_versions WHERE name = 'bins'")
+        ).scalar()
+        db.session.remove()
+        assert version == compiled["data_version"]
+        writer_sync.version = None
+        assert find_bin_entry("411111") is None
+        assert find_bin_entry("522222") is not None
+        # A rebuild from this database may already have replaced it
+        snapshot = bin_snapshot.current()
+        assert snapshot is None or snapshot.database_id != compiled["database_id"]
+
+
+def test_rows_without_payload_compile_without_a_read_pool(make_app):
+    app = make_app(database={"read_pool_size": 0, "write_timeout": 1}, **CONFIG)
+    with app.app_context():
+        init_db()
+        _insert("411111")
+        assert bin_snapshot.rebuild()["records"] == 1
+        code, payload, _, _ = bin_snapshot.current().record(0)
+        with db.engine.connect() as conn:
+            stored = fill_payloads(conn, {"411111": None})
+    assert code == "411111"
+    assert payload == stored["411111"]